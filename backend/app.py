@@ -1,6 +1,23 @@
+import os
+
+from dotenv import load_dotenv
 from flask import Flask
 # from flask_cors import CORS
 
+from models.data_store import configure_storage
+from services.ai_client import configure_ai_client
+from services.ai_gateway import configure_ai_gateway
+from services.jobs_service import configure_job_queue
+from services.suggestions_service import configure_revisions_cache
+from services.prompt_planner import configure_planner
+from services.pregeneration_service import configure_pregeneration
+from services.events_service import configure_events
+from services.lectures_service import configure_lecture_import, configure_lecture_responses
+from services.lecture_diff_service import configure_lecture_diffs
+from services.reactions_service import configure_reaction_batches
+from services.retention_service import configure_retention
+from utils import metrics
+
 from routes.health_routes import health_bp
 from routes.lectures_routes import lectures_bp
 from routes.student_routes import student_bp
@@ -8,10 +25,161 @@ from routes.teacher_routes import teacher_bp
 from routes.ai_routes import ai_bp
 
 
-def create_app():
+def create_app(config=None):
+    load_dotenv()
     app = Flask(__name__)
     # CORS(app)
 
+    # Storage: "memory" (default) or "sqlite"; either is served by one worker
+    # process (the change feed and SSE push are in memory)
+    app.config["STORAGE_BACKEND"] = os.getenv("STORAGE_BACKEND", "memory")
+    app.config["SQLITE_PATH"] = os.getenv("SQLITE_PATH", "lectures.db")
+    app.config["REACTION_BATCH_SIZE"] = 64
+    # In-memory reaction layout: "dict" rows or compact "columnar" arrays
+    app.config["REACTION_STORE"] = os.getenv("REACTION_STORE", "dict")
+    app.config["LECTURE_CACHE_SIZE"] = 128
+    # POST /reactions/batch: items per request, remembered idempotency keys
+    app.config["REACTION_BATCH_MAX_ITEMS"] = 500
+    app.config["REACTION_IDEMPOTENCY_MAX_KEYS"] = 10000
+    app.config["REACTION_IDEMPOTENCY_TTL_SECONDS"] = 24 * 3600
+    # Encoded GET /lectures/<id> bodies; gzip only above the size threshold
+    app.config["LECTURE_RESPONSE_CACHE_SIZE"] = 512
+    app.config["LECTURE_RESPONSE_GZIP_MIN_BYTES"] = 1024
+    # Streaming lecture import: section size cap and sections per store write
+    app.config["LECTURE_IMPORT_MAX_SECTION_CHARS"] = 4000
+    app.config["LECTURE_IMPORT_BATCH_SIZE"] = 50
+    # Section diffs between pairs of lecture versions
+    app.config["LECTURE_DIFF_CACHE_SIZE"] = 256
+    # Tiered retention (memory backend): periodically move addressed reactions
+    # and all but the newest old versions of a lecture to a compressed file
+    app.config["RETENTION_ENABLED"] = os.getenv("RETENTION", "0") == "1"
+    app.config["RETENTION_COLD_STORE_PATH"] = os.getenv("COLD_STORE_PATH", "cold_store.bin")
+    app.config["RETENTION_INTERVAL_SECONDS"] = 600.0
+    app.config["RETENTION_REACTION_MIN_AGE_SECONDS"] = 3600.0
+    app.config["RETENTION_KEEP_VERSIONS"] = 1
+    app.config["RETENTION_FRAME_CACHE_SIZE"] = 64
+    # Empty the cold store on startup instead of reopening what it archived
+    app.config["RETENTION_RESET_COLD_STORE"] = os.getenv("COLD_STORE_RESET", "0") == "1"
+    # Shared Anthropic client, built on the first model call
+    app.config["AI_API_KEY"] = os.getenv("API_KEY")
+    app.config["AI_TIMEOUT_SECONDS"] = 120.0
+    app.config["AI_CONNECT_TIMEOUT_SECONDS"] = 5.0
+    app.config["AI_MAX_CONNECTIONS"] = 20
+    app.config["AI_MAX_KEEPALIVE_CONNECTIONS"] = 10
+    app.config["AI_KEEPALIVE_EXPIRY_SECONDS"] = 30.0
+    # Retries are done by the AI gateway below, not by the SDK
+    app.config["AI_MAX_RETRIES"] = 0
+    # AI gateway: concurrency, admission, rate limit and retry policy
+    app.config["AI_MAX_CONCURRENT"] = 8
+    app.config["AI_MAX_CONCURRENT_PER_TEACHER"] = 2
+    app.config["AI_MAX_WAITING"] = 32
+    app.config["AI_QUEUE_TIMEOUT_SECONDS"] = 30.0
+    app.config["AI_RATE_PER_SECOND"] = 2.0
+    app.config["AI_RATE_BURST"] = 8
+    app.config["AI_RETRY_ATTEMPTS"] = 4
+    app.config["AI_RETRY_BASE_DELAY_SECONDS"] = 0.5
+    app.config["AI_RETRY_MAX_DELAY_SECONDS"] = 30.0
+    # Background AI jobs
+    app.config["AI_JOB_WORKERS"] = 2
+    app.config["AI_JOB_MAX_PENDING"] = 16
+    # Cache of model revisions keyed by prompt inputs
+    app.config["AI_CACHE_MAX_ENTRIES"] = 256
+    app.config["AI_CACHE_TTL_SECONDS"] = 3600
+    # Prompts above this many (estimated) tokens are split into parallel groups
+    app.config["AI_PROMPT_TOKEN_BUDGET"] = 60000
+    app.config["AI_FANOUT_CONCURRENCY"] = 4
+    # Opt-in background suggestions: generate for a lecture's new feedback once
+    # a section has this many unaddressed reactions or reactions stop arriving
+    app.config["AI_PREGENERATE_ENABLED"] = os.getenv("AI_PREGENERATE", "0") == "1"
+    app.config["AI_PREGENERATE_THRESHOLD"] = 5
+    app.config["AI_PREGENERATE_QUIET_SECONDS"] = 60.0
+    app.config["AI_PREGENERATE_COALESCE_SECONDS"] = 2.0
+    app.config["AI_PREGENERATE_MAX_CALLS_PER_HOUR"] = 20
+    # Teacher SSE push: per-connection queue size and idle heartbeat
+    app.config["EVENTS_QUEUE_SIZE"] = 256
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = 15
+    # Request/service/Anthropic metrics served at /metrics
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "0") == "1"
+    if config:
+        app.config.update(config)
+    configure_storage(
+        app.config["STORAGE_BACKEND"],
+        sqlite_path=app.config["SQLITE_PATH"],
+        reaction_batch_size=app.config["REACTION_BATCH_SIZE"],
+        lecture_cache_size=app.config["LECTURE_CACHE_SIZE"],
+        reaction_store=app.config["REACTION_STORE"],
+    )
+    configure_lecture_responses(
+        max_entries=app.config["LECTURE_RESPONSE_CACHE_SIZE"],
+        gzip_min_bytes=app.config["LECTURE_RESPONSE_GZIP_MIN_BYTES"],
+    )
+    configure_reaction_batches(
+        max_items=app.config["REACTION_BATCH_MAX_ITEMS"],
+        idempotency_max_keys=app.config["REACTION_IDEMPOTENCY_MAX_KEYS"],
+        idempotency_ttl=app.config["REACTION_IDEMPOTENCY_TTL_SECONDS"],
+    )
+    configure_lecture_import(
+        max_section_chars=app.config["LECTURE_IMPORT_MAX_SECTION_CHARS"],
+        batch_size=app.config["LECTURE_IMPORT_BATCH_SIZE"],
+    )
+    configure_lecture_diffs(max_entries=app.config["LECTURE_DIFF_CACHE_SIZE"])
+    # SQLite already keeps these rows on disk rather than in memory
+    configure_retention(
+        enabled=app.config["RETENTION_ENABLED"] and app.config["STORAGE_BACKEND"] == "memory",
+        path=app.config["RETENTION_COLD_STORE_PATH"],
+        interval_seconds=app.config["RETENTION_INTERVAL_SECONDS"],
+        reaction_min_age_seconds=app.config["RETENTION_REACTION_MIN_AGE_SECONDS"],
+        keep_versions=app.config["RETENTION_KEEP_VERSIONS"],
+        frame_cache_size=app.config["RETENTION_FRAME_CACHE_SIZE"],
+        reset=app.config["RETENTION_RESET_COLD_STORE"],
+    )
+    configure_ai_client(
+        api_key=app.config["AI_API_KEY"],
+        timeout=app.config["AI_TIMEOUT_SECONDS"],
+        connect_timeout=app.config["AI_CONNECT_TIMEOUT_SECONDS"],
+        max_connections=app.config["AI_MAX_CONNECTIONS"],
+        max_keepalive_connections=app.config["AI_MAX_KEEPALIVE_CONNECTIONS"],
+        keepalive_expiry=app.config["AI_KEEPALIVE_EXPIRY_SECONDS"],
+        max_retries=app.config["AI_MAX_RETRIES"],
+    )
+    configure_ai_gateway(
+        max_concurrent=app.config["AI_MAX_CONCURRENT"],
+        max_concurrent_per_teacher=app.config["AI_MAX_CONCURRENT_PER_TEACHER"],
+        max_waiting=app.config["AI_MAX_WAITING"],
+        queue_timeout=app.config["AI_QUEUE_TIMEOUT_SECONDS"],
+        rate_per_second=app.config["AI_RATE_PER_SECOND"],
+        burst=app.config["AI_RATE_BURST"],
+        max_attempts=app.config["AI_RETRY_ATTEMPTS"],
+        base_delay=app.config["AI_RETRY_BASE_DELAY_SECONDS"],
+        max_delay=app.config["AI_RETRY_MAX_DELAY_SECONDS"],
+    )
+    configure_job_queue(
+        max_workers=app.config["AI_JOB_WORKERS"],
+        max_pending=app.config["AI_JOB_MAX_PENDING"],
+    )
+    configure_revisions_cache(
+        max_entries=app.config["AI_CACHE_MAX_ENTRIES"],
+        ttl=app.config["AI_CACHE_TTL_SECONDS"],
+    )
+    configure_planner(
+        token_budget=app.config["AI_PROMPT_TOKEN_BUDGET"],
+        concurrency=app.config["AI_FANOUT_CONCURRENCY"],
+    )
+    configure_pregeneration(
+        enabled=app.config["AI_PREGENERATE_ENABLED"],
+        threshold=app.config["AI_PREGENERATE_THRESHOLD"],
+        quiet_seconds=app.config["AI_PREGENERATE_QUIET_SECONDS"],
+        coalesce_seconds=app.config["AI_PREGENERATE_COALESCE_SECONDS"],
+        max_calls_per_hour=app.config["AI_PREGENERATE_MAX_CALLS_PER_HOUR"],
+    )
+    configure_events(
+        max_queue=app.config["EVENTS_QUEUE_SIZE"],
+        heartbeat_interval=app.config["EVENTS_HEARTBEAT_SECONDS"],
+    )
+    metrics.configure_metrics(app.config["METRICS_ENABLED"])
+    if app.config["METRICS_ENABLED"]:
+        metrics.init_app(app)
+
     # Register blueprints (all prefixed with /api except health)
     app.register_blueprint(health_bp)
     app.register_blueprint(lectures_bp, url_prefix="/api")
@@ -0,0 +1,109 @@
+"""Memory and speed of the dict vs columnar reaction stores.
+
+Builds each store from the same synthetic reactions (created the way
+create_reaction creates them) and reports bytes per reaction measured
+with tracemalloc, plus insert/get/find timings.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_reaction_memory --reactions 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from models.columnar_reactions import ColumnarReactionRepository
+from models.data_store import REACTION_INDEXES
+from models.reaction_counters import REACTION_TYPES
+from models.repository import IndexedRepository
+from utils.id_utils import new_uuid
+from utils.time_utils import now_iso
+
+COMMENTS = ("", "", "", "", "typo here", "I'm lost at this step", "the sum is off by one")
+
+STORES = {
+    "dict": lambda rows: IndexedRepository(rows, REACTION_INDEXES),
+    "columnar": ColumnarReactionRepository,
+}
+
+
+def reactions(n, seed, lectures=20, sections=30, students=300):
+    rng = random.Random(seed)
+    for _ in range(n):
+        lecture = rng.randrange(lectures)
+        # Fresh strings per row, like the values parsed from request bodies
+        yield {
+            "id": new_uuid(),
+            "lectureId": f"lecture-{lecture}-v1",
+            "sectionId": f"section-{lecture}-{rng.randrange(sections)}",
+            "userId": f"student-{rng.randrange(students)}",
+            "addressed": False,
+            "type": rng.choice(REACTION_TYPES),
+            "comment": rng.choice(COMMENTS),
+            "createdAt": now_iso(),
+        }
+
+
+def run(name, n, seed):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    repo = STORES[name](reactions(n, seed))
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    sample = random.Random(seed).sample(repo.all(), 1000)
+    start = time.perf_counter()
+    for r in sample:
+        repo.get(r["id"])
+    get_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    start = time.perf_counter()
+    rows = repo.find(lectureId="lecture-0-v1")
+    find_lecture_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    unaddressed = repo.find(lectureId="lecture-0-v1", sectionId="section-0-0", addressed=False)
+    find_section_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for r in unaddressed:
+        repo.update(r, addressed=True)
+    address_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "reactions": len(repo),
+        "memory_mb": used / 2 ** 20,
+        "bytes_per_reaction": used / n,
+        "build_per_sec": n / build_seconds,
+        "get_us": get_us,
+        "find_lecture_ms": find_lecture_ms,
+        "find_lecture_rows": len(rows),
+        "find_section_unaddressed_ms": find_section_ms,
+        "address_section_ms": address_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reactions", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stores", nargs="+", choices=sorted(STORES), default=["dict", "columnar"])
+    args = parser.parse_args()
+
+    report = {name: run(name, args.reactions, args.seed) for name in args.stores}
+    if "dict" in report and "columnar" in report:
+        report["columnar_memory_ratio"] = (
+            report["columnar"]["memory_mb"] / report["dict"]["memory_mb"]
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
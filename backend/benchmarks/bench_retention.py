@@ -0,0 +1,154 @@
+"""Hot-set memory before and after a retention compaction.
+
+Seeds lectures with several published versions (each edits a few
+sections) and reactions spread over their versions, a share of them
+addressed, then runs retention_service.compact() and reports the hot-set
+bytes per tier before and after, the cold file size and how long history
+reads take once they page in from the cold store (first read and cached).
+Also checks that archived versions and reactions read back unchanged and
+that the reaction counters still verify; exits non-zero if not.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_retention --lectures 50 --versions 6 --reactions 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from models import data_store
+from models.reaction_counters import REACTION_TYPES, ReactionCounters
+from services import retention_service
+from services.reactions_service import get_reactions_for_lecture, verify_reaction_counters
+from utils.id_utils import new_uuid
+from utils.time_utils import now_iso
+
+
+def seed(args, rng):
+    """Returns the ids of every lecture version, oldest first per lecture."""
+    version_ids = []
+    for lec in range(args.lectures):
+        base_id = f"rt-{lec}"
+        sections = [
+            {"id": f"{base_id}-s{i}", "order": i + 1,
+             "text": f"Section {i} of lecture {base_id}. " * 40}
+            for i in range(args.sections)
+        ]
+        lecture = {
+            "id": f"{base_id}-v1", "baseLectureId": base_id, "version": 1,
+            "isCurrent": args.versions == 1, "title": f"Lecture {base_id}",
+            "teacherId": "teacher-1", "courseId": "course-1", "sections": sections,
+        }
+        data_store.lecture_store.add(lecture)
+        version_ids.append(lecture["id"])
+        for v in range(2, args.versions + 1):
+            edits = {
+                s["id"]: {**s, "text": f"{s['text']} (revised in v{v})"}
+                for s in rng.sample(lecture["sections"], args.edits)
+            }
+            lecture = data_store.lecture_store.add_version(
+                lecture,
+                {"id": f"{base_id}-v{v}", "version": v, "isCurrent": v == args.versions},
+                edits,
+            )
+            version_ids.append(lecture["id"])
+
+    def reactions():
+        for n in range(args.reactions):
+            lecture_id = rng.choice(version_ids)
+            yield {
+                "id": new_uuid(),
+                "lectureId": lecture_id,
+                "sectionId": f"{lecture_id.rsplit('-v', 1)[0]}-s{rng.randrange(args.sections)}",
+                "userId": f"student-{rng.randrange(300)}",
+                "type": rng.choice(REACTION_TYPES),
+                "createdAt": now_iso(),
+                "comment": rng.choice(("", "", "typo here", "lost at this step")),
+                "addressed": rng.random() < args.addressed,
+            }
+
+    data_store.reactions_repo.insert_many(reactions())
+    data_store.reaction_counters = ReactionCounters.rebuild(data_store.reactions_repo.all())
+    return version_ids
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--lectures", type=int, default=50)
+    parser.add_argument("--versions", type=int, default=6)
+    parser.add_argument("--sections", type=int, default=30)
+    parser.add_argument("--edits", type=int, default=3, help="sections edited per version")
+    parser.add_argument("--reactions", type=int, default=200000)
+    parser.add_argument("--addressed", type=float, default=0.7, help="share addressed")
+    parser.add_argument("--keep-versions", type=int, default=1)
+    parser.add_argument("--reaction-store", choices=("dict", "columnar"), default="dict")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    data_store.configure_storage("memory", reaction_store=args.reaction_store)
+    version_ids = seed(args, rng)
+    sample = rng.sample(version_ids, min(20, len(version_ids)))
+    expected_lectures = {lid: data_store.lecture_store.get(lid) for lid in sample}
+    expected_reactions = {
+        lid: sorted(r["id"] for r in get_reactions_for_lecture(lid)) for lid in sample
+    }
+
+    path = os.path.join(tempfile.mkdtemp(), "cold_store.bin")
+    retention_service.configure_retention(
+        enabled=True, path=path, interval_seconds=None,
+        reaction_min_age_seconds=0, keep_versions=args.keep_versions,
+    )
+    report = retention_service.compact()
+
+    failures = []
+    archived = [lid for lid in sample if data_store.lectures_repo.get(lid) is None]
+    history = {}
+    if archived:
+        lid = archived[0]
+        _, history["lecture_first_read_ms"] = timed_ms(lambda: data_store.lecture_store.get(lid))
+        _, history["lecture_cached_read_ms"] = timed_ms(lambda: data_store.lecture_store.get(lid))
+    _, history["reactions_first_read_ms"] = timed_ms(lambda: get_reactions_for_lecture(sample[0]))
+    _, history["reactions_cached_read_ms"] = timed_ms(lambda: get_reactions_for_lecture(sample[0]))
+
+    for lid in sample:
+        if data_store.lecture_store.get(lid) != expected_lectures[lid]:
+            failures.append(f"version {lid} differs after compaction")
+        if sorted(r["id"] for r in get_reactions_for_lecture(lid)) != expected_reactions[lid]:
+            failures.append(f"reactions of {lid} differ after compaction")
+    if not verify_reaction_counters(repair=False):
+        failures.append("reaction counters no longer match the stored reactions")
+
+    before, after = report["hotBytesBefore"], report["hotBytesAfter"]
+    print(json.dumps({
+        "params": vars(args),
+        "compaction": {k: report[k] for k in
+                       ("reactionsArchived", "versionsArchived", "blobsDropped", "seconds")},
+        "hot_bytes_before": before,
+        "hot_bytes_after": after,
+        "hot_bytes_saved_pct": round((1 - after["total"] / before["total"]) * 100, 1),
+        "cold_file_bytes": report["coldStore"]["fileBytes"],
+        "cold_compression_ratio": round(
+            report["coldStore"]["rawBytesAppended"] / max(report["coldStore"]["fileBytes"], 1), 1
+        ),
+        "history_reads": history,
+    }, indent=2))
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Import and boot time of the Flask app.
+
+Each repeat starts a fresh interpreter that imports app, calls
+create_app() and serves one non-AI request, timing each step. The report
+has the median and worst time per step, whether the anthropic stack was
+imported during boot (it should only load on the first model call), and
+the heaviest modules from python -X importtime. It is JSON, so two runs
+can be compared with --baseline.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --repeats 10 --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --max-regression 20
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+# Runs in the child interpreter; prints one JSON line of timings
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+booted = time.perf_counter()
+app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (booted - imported) * 1000,
+    "first_request_ms": (served - booted) * 1000,
+    "total_ms": (served - start) * 1000,
+    "anthropic_loaded": "anthropic" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+STEPS = ("import_ms", "create_app_ms", "first_request_ms", "total_ms")
+
+
+def boot_once(importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", BOOT_SCRIPT]
+    result = subprocess.run(
+        command, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def heaviest_imports(importtime_log, top):
+    """Top-level packages by cumulative import time, slowest first."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; only top-level ones carry their full cost
+        name = name[1:]
+        if not name.startswith(" "):
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0) + int(cumulative)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "cumulative_ms": us / 1000} for name, us in ranked]
+
+
+def compare(report, baseline, max_regression):
+    regressions = []
+    print(f"{'step':20} {'baseline ms':>12} {'now ms':>10} {'change':>8}", file=sys.stderr)
+    for step in STEPS:
+        before = baseline["steps"].get(step, {}).get("median")
+        now = report["steps"][step]["median"]
+        if not before:
+            continue
+        change = (now - before) / before * 100
+        print(f"{step:20} {before:12.1f} {now:10.1f} {change:+7.1f}%", file=sys.stderr)
+        if max_regression is not None and change > max_regression:
+            regressions.append(step)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="heaviest imports to list")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit non-zero if a step's median grows by more than this %%")
+    args = parser.parse_args()
+
+    boot_once()  # warm the filesystem and bytecode caches
+    runs = [boot_once()[0] for _ in range(args.repeats)]
+    _, importtime_log = boot_once(importtime=True)
+
+    report = {
+        "params": {"repeats": args.repeats},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "steps": {
+            step: {
+                "median": statistics.median(r[step] for r in runs),
+                "max": max(r[step] for r in runs),
+            }
+            for step in STEPS
+        },
+        "anthropic_loaded_at_boot": any(r["anthropic_loaded"] for r in runs),
+        "modules_loaded": runs[-1]["modules"],
+        "heaviest_imports": heaviest_imports(importtime_log, args.top),
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("startup regressions: " + ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
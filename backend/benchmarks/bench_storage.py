@@ -0,0 +1,89 @@
+"""Compare the in-memory and SQLite storage backends.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_storage --reactions 50000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from models import data_store
+from services.lectures_service import (
+    create_base_lecture,
+    create_new_lecture_version_with_multiple_sections,
+    get_lecture,
+)
+from services.reactions_service import (
+    create_reaction,
+    get_reactions_for_lecture,
+    get_reactions_for_section,
+    mark_reactions_addressed_for_section,
+)
+
+REACTION_TYPES = ("typo", "confused", "calculation_error")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run(n_reactions: int, n_sections: int, n_lookups: int):
+    lecture = create_base_lecture(
+        "Bench", [f"section {i}" for i in range(n_sections)], "teacher-1", "course-1"
+    )
+    section_ids = [s["id"] for s in lecture["sections"]]
+
+    def write_reactions():
+        for i in range(n_reactions):
+            create_reaction(
+                f"student-{i % 300}", lecture["id"], section_ids[i % n_sections],
+                REACTION_TYPES[i % 3], "",
+            )
+
+    def lookups():
+        for i in range(n_lookups):
+            get_lecture(lecture["id"])
+            get_reactions_for_section(section_ids[i % n_sections])
+
+    def publish():
+        for sid in section_ids[:10]:
+            mark_reactions_addressed_for_section(lecture["id"], sid)
+        return create_new_lecture_version_with_multiple_sections(
+            get_lecture(lecture["id"]),
+            [{"sectionId": sid, "suggestedText": "new"} for sid in section_ids[:10]],
+        )
+
+    results = {}
+    t, _ = _timed(write_reactions)
+    results["create_reaction_per_sec"] = n_reactions / t
+    t, _ = _timed(lookups)
+    results["lookup_pairs_per_sec"] = n_lookups / t
+    t, rows = _timed(lambda: get_reactions_for_lecture(lecture["id"]))
+    results["lecture_scan_ms"] = t * 1000
+    results["lecture_reactions"] = len(rows)
+    t, _ = _timed(publish)
+    results["address_and_publish_ms"] = t * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reactions", type=int, default=20000)
+    parser.add_argument("--sections", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    report = {"memory": run(args.reactions, args.sections, args.lookups)}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_store.configure_storage("sqlite", sqlite_path=os.path.join(tmp, "bench.db"))
+        report["sqlite"] = run(args.reactions, args.sections, args.lookups)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
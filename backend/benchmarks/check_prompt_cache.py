@@ -0,0 +1,92 @@
+"""Check that suggestion prompts keep a byte-identical cacheable prefix.
+
+Generates suggestions for one lecture several times through the stub
+Anthropic client, adding new feedback before every round (so the revisions
+cache never answers), for the whole-lecture prompt, the fanned-out group
+prompts and the streaming path. Checks that:
+
+- every request sends the prefix as a cache_control block
+- the prefix is byte-identical across rounds for the same lecture version
+  (and across the groups of one split), while the suffix changes
+- after the first round the prefix is a cache read, not a cache write
+
+Run from the backend directory (exits non-zero on failure):
+
+    python -m benchmarks.check_prompt_cache --rounds 5
+"""
+import argparse
+import sys
+
+from models import data_store
+from services import prompt_planner, suggestions_service
+from services.lectures_service import create_base_lecture
+from services.reactions_service import create_reaction
+from benchmarks.stub_anthropic import StubAnthropic
+
+
+def prompt_blocks(request):
+    blocks = request["messages"][0]["content"]
+    cached = [b for b in blocks if b.get("cache_control")]
+    return cached, blocks[-1]["text"]
+
+
+def run(mode, rounds, failures):
+    lecture = create_base_lecture(
+        f"Prompt cache ({mode})",
+        [f"Section {i}. " + "Some lecture text about sorting. " * 40 for i in range(12)],
+        "teacher-1", "course-1",
+    )
+    stub = StubAnthropic()
+    # A tiny budget forces the split into several group prompts
+    budget = 200 if mode == "fanout" else 60000
+    prompt_planner.configure_planner(token_budget=budget, concurrency=4)
+
+    prefixes, suffixes = set(), set()
+    for r in range(rounds):
+        for sec in lecture["sections"][:6]:
+            create_reaction("student-1", lecture["id"], sec["id"], "confused", f"round {r}")
+        first = len(stub.requests)
+        if mode == "stream":
+            events = list(suggestions_service.stream_suggestions_for_lecture(
+                lecture, lecture["sections"], model_client=stub))
+            if events[-1][0] != "done":
+                failures.append(f"{mode}: stream ended with {events[-1]}")
+        else:
+            suggestions_service.generate_suggestions_for_lecture(
+                lecture, lecture["sections"], model_client=stub)
+
+        for request in stub.requests[first:]:
+            cached, suffix = prompt_blocks(request)
+            if len(cached) != 1:
+                failures.append(f"{mode}: expected one cache_control block, got {len(cached)}")
+                continue
+            prefixes.add(cached[0]["text"].encode("utf-8"))
+            suffixes.add(suffix)
+
+    if len(prefixes) != 1:
+        failures.append(f"{mode}: {len(prefixes)} distinct prefixes across {stub.calls} calls")
+    if len(suffixes) < rounds:
+        failures.append(f"{mode}: suffix did not change between rounds")
+    if len(stub.prompt_cache) != 1:
+        failures.append(f"{mode}: {len(stub.prompt_cache)} cache writes, expected 1")
+    writes = len(stub.prompt_cache)
+    print(f"{mode}: {stub.calls} calls, {len(prefixes)} distinct prefix(es), "
+          f"{writes} cache write(s), {stub.calls - writes} cache read(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    data_store.configure_storage("memory")
+    failures = []
+    for mode in ("create", "fanout", "stream"):
+        run(mode, args.rounds, failures)
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
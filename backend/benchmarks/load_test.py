@@ -0,0 +1,551 @@
+"""Load test for every API blueprint with synthetic data.
+
+Builds the app with create_app(), fills models/data_store with synthetic
+courses, enrollments, multi-version lectures, reactions and pending
+suggestions, swaps the Anthropic client for a stub with simulated
+latency, then replays a weighted traffic mix from several threads.
+
+The report has throughput and p50/p95/p99 latency per route, status
+codes, and peak memory. It is written as JSON, so two runs can be
+compared with --baseline. tracemalloc slows every allocation, so use
+--no-tracemalloc when the run is for comparing latencies.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --reactions 1000000 --requests 20000 \
+        --output results.json
+    python -m benchmarks.load_test --baseline results.json --max-regression 20
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from app import create_app
+from models import data_store
+from models.reaction_counters import ReactionCounters
+from models.reaction_timeline import ReactionTimeline
+from services import ai_client
+from utils.id_utils import new_uuid
+from utils.time_utils import now_iso
+
+from benchmarks.stub_anthropic import StubAnthropic
+
+REACTION_TYPES = ("typo", "confused", "calculation_error")
+COMMENTS = (
+    "", "", "",
+    "typo in the second sentence",
+    "I don't understand this step",
+    "the example doesn't add up",
+    "could you explain this again?",
+    "calculation in the last line is wrong",
+    "what does this notation mean",
+)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def seed(args, rng):
+    """Fill data_store directly (bypassing the API) and return the ids used
+    to build requests."""
+    ctx = {"students": [], "teachers": [], "bases": [], "sections": {},
+           "pending": [], "cursors": {}, "lock": threading.Lock()}
+
+    teachers = [f"lt-teacher-{t}" for t in range(max(args.courses // 4, 1))]
+    data_store.users_repo.insert_many(
+        {"id": t, "name": t, "role": "teacher"} for t in teachers
+    )
+    ctx["teachers"] = teachers
+
+    for c in range(args.courses):
+        course_id = f"lt-course-{c}"
+        teacher_id = teachers[c % len(teachers)]
+        data_store.courses_repo.insert(
+            {"id": course_id, "name": f"Course {c}", "teacherId": teacher_id}
+        )
+        students = [f"lt-student-{c}-{s}" for s in range(args.students)]
+        data_store.users_repo.insert_many(
+            {"id": s, "name": s, "role": "student"} for s in students
+        )
+        data_store.enrollments_repo.insert_many(
+            {"userId": s, "courseId": course_id} for s in students
+        )
+        ctx["students"].extend((s, course_id) for s in students)
+
+        for lec in range(args.lectures):
+            base_id = f"lt-{c}-{lec}"
+            sections = [
+                {"id": f"{base_id}-s{i}", "order": i + 1,
+                 "text": f"Section {i} of lecture {base_id}. " * 20}
+                for i in range(args.sections)
+            ]
+            lecture = {
+                "id": f"{base_id}-v1", "baseLectureId": base_id, "version": 1,
+                "isCurrent": args.versions == 1, "title": f"Lecture {base_id}",
+                "teacherId": teacher_id, "courseId": course_id,
+                "sections": sections,
+            }
+            data_store.lecture_store.add(lecture)
+            for v in range(2, args.versions + 1):
+                edited = rng.choice(sections)
+                lecture = data_store.lecture_store.add_version(
+                    lecture,
+                    {"id": f"{base_id}-v{v}", "version": v,
+                     "isCurrent": v == args.versions},
+                    {edited["id"]: {**edited, "text": f"{edited['text']} (v{v})"}},
+                )
+            ctx["bases"].append((base_id, teacher_id))
+            ctx["sections"][base_id] = [s["id"] for s in sections]
+
+    current = {b: f"{b}-v{args.versions}" for b, _ in ctx["bases"]}
+    bases = [b for b, _ in ctx["bases"]]
+
+    def reactions():
+        for n in range(args.reactions):
+            base_id = rng.choice(bases)
+            yield {
+                "id": new_uuid(),
+                "lectureId": current[base_id],
+                "sectionId": rng.choice(ctx["sections"][base_id]),
+                "userId": rng.choice(ctx["students"])[0],
+                "type": rng.choice(REACTION_TYPES),
+                "createdAt": now_iso(),
+                "comment": rng.choice(COMMENTS),
+                "addressed": n % 5 == 0,
+            }
+
+    data_store.reactions_repo.insert_many(reactions())
+    if isinstance(data_store.reaction_counters, ReactionCounters):
+        data_store.reaction_counters = ReactionCounters.rebuild(data_store.reactions_repo.all())
+    data_store.reaction_timeline = ReactionTimeline.rebuild(data_store.reactions_repo.all())
+
+    for base_id in bases:
+        sections = data_store.lecture_store.get(current[base_id])["sections"]
+        for section in sections[:args.suggestions]:
+            suggestion = {
+                "id": new_uuid(), "lectureId": current[base_id],
+                "sectionId": section["id"], "originalText": section["text"],
+                "suggestedText": "Improved text",
+                "status": "pending", "createdAt": now_iso(),
+            }
+            data_store.suggestions_repo.insert(suggestion)
+            ctx["pending"].append(suggestion["id"])
+    rng.shuffle(ctx["pending"])
+    return ctx
+
+
+# ---------------------------------------------------------------------------
+# Traffic
+# ---------------------------------------------------------------------------
+
+def _current_id(base_id):
+    current = data_store.lecture_store.find(baseLectureId=base_id, isCurrent=True)
+    return current[0]["id"] if current else f"{base_id}-v1"
+
+
+def _pick_base(ctx, rng):
+    return rng.choice(ctx["bases"])
+
+
+def op_health(client, ctx, rng):
+    return client.get("/")
+
+
+def op_get_lecture(client, ctx, rng):
+    base_id, _ = _pick_base(ctx, rng)
+    return client.get(f"/api/lectures/{_current_id(base_id)}")
+
+
+def op_lecture_delta(client, ctx, rng):
+    base_id, _ = _pick_base(ctx, rng)
+    return client.get(f"/api/lectures/{_current_id(base_id)}/delta?since={base_id}-v1")
+
+
+def op_create_lecture(client, ctx, rng):
+    return client.post("/api/lectures", json={
+        "title": "New lecture", "teacherId": rng.choice(ctx["teachers"]),
+        "courseId": "lt-course-0", "sections": ["Intro", "Body", "Summary"],
+    })
+
+
+def op_recent_lectures(client, ctx, rng):
+    student, _ = rng.choice(ctx["students"])
+    return client.get(f"/api/student/{student}/lectures/recent")
+
+
+def op_student_comments(client, ctx, rng):
+    student, _ = rng.choice(ctx["students"])
+    base_id, _ = _pick_base(ctx, rng)
+    return client.get(f"/api/student/{student}/lectures/{_current_id(base_id)}/comments")
+
+
+def op_send_reaction(client, ctx, rng):
+    student, _ = rng.choice(ctx["students"])
+    base_id, _ = _pick_base(ctx, rng)
+    return client.post("/api/reactions", json={
+        "userId": student, "lectureId": _current_id(base_id),
+        "sectionId": rng.choice(ctx["sections"][base_id]),
+        "type": rng.choice(REACTION_TYPES), "comment": rng.choice(COMMENTS),
+    })
+
+
+def op_send_reaction_batch(client, ctx, rng):
+    student, _ = rng.choice(ctx["students"])
+    base_id, _ = _pick_base(ctx, rng)
+    lecture_id = _current_id(base_id)
+    return client.post("/api/reactions/batch", headers={"Idempotency-Key": new_uuid()}, json={
+        "reactions": [
+            {"userId": student, "lectureId": lecture_id,
+             "sectionId": rng.choice(ctx["sections"][base_id]),
+             "type": rng.choice(REACTION_TYPES), "comment": rng.choice(COMMENTS)}
+            for _ in range(rng.randint(10, 100))
+        ],
+    })
+
+
+def op_teacher_lectures(client, ctx, rng):
+    return client.get(f"/api/teacher/{rng.choice(ctx['teachers'])}/lectures")
+
+
+def _teacher_lecture_path(ctx, rng, suffix):
+    base_id, teacher_id = _pick_base(ctx, rng)
+    return f"/api/teacher/{teacher_id}/lectures/{_current_id(base_id)}/{suffix}"
+
+
+def op_teacher_comments(client, ctx, rng):
+    return client.get(_teacher_lecture_path(ctx, rng, "comments"))
+
+
+def op_changes(client, ctx, rng):
+    # Poll like a dashboard: continue from the cursor the previous poll of
+    # this lecture returned (none on the first poll)
+    path = _teacher_lecture_path(ctx, rng, "changes")
+    with ctx["lock"]:
+        cursor = ctx["cursors"].get(path)
+    query = f"?since={cursor}&limit=100" if cursor else "?limit=100"
+    response = client.get(path + query)
+    cursor = (response.get_json(silent=True) or {}).get("cursor")
+    if cursor:
+        with ctx["lock"]:
+            ctx["cursors"][path] = cursor
+    return response
+
+
+def op_reaction_counts(client, ctx, rng):
+    return client.get(_teacher_lecture_path(ctx, rng, "reaction-counts"))
+
+
+def op_feedback_timeline(client, ctx, rng):
+    return client.get(_teacher_lecture_path(ctx, rng, "feedback-timeline"))
+
+
+def op_feedback_clusters(client, ctx, rng):
+    return client.get(_teacher_lecture_path(ctx, rng, "feedback-clusters"))
+
+
+def _next_pending(ctx):
+    with ctx["lock"]:
+        return ctx["pending"].pop() if ctx["pending"] else new_uuid()
+
+
+def op_approve(client, ctx, rng):
+    return client.post(f"/api/teacher/suggestions/{_next_pending(ctx)}/approve")
+
+
+def op_reject(client, ctx, rng):
+    return client.post(f"/api/teacher/suggestions/{_next_pending(ctx)}/reject")
+
+
+def op_publish(client, ctx, rng):
+    return client.post(_teacher_lecture_path(ctx, rng, "publish"))
+
+
+def op_generate(client, ctx, rng):
+    base_id, _ = _pick_base(ctx, rng)
+    return client.post("/api/ai/generate-suggestions", json={"lectureId": _current_id(base_id)})
+
+
+def op_generate_stream(client, ctx, rng):
+    base_id, _ = _pick_base(ctx, rng)
+    response = client.post("/api/ai/generate-suggestions/stream",
+                           json={"lectureId": _current_id(base_id)})
+    response.get_data()  # drain the stream so its full duration is measured
+    return response
+
+
+def op_suggestion_job(client, ctx, rng):
+    base_id, _ = _pick_base(ctx, rng)
+    response = client.post("/api/ai/suggestion-jobs", json={"lectureId": _current_id(base_id)})
+    job = (response.get_json() or {}).get("job")
+    if job:
+        client.get(f"/api/ai/suggestion-jobs/{job['id']}")
+    return response
+
+
+def op_cache_stats(client, ctx, rng):
+    return client.get("/api/ai/cache-stats")
+
+
+# route label -> operation; the weights of each traffic mix are in MIXES
+OPERATIONS = {
+    "GET /": op_health,
+    "GET /api/lectures/<id>": op_get_lecture,
+    "GET /api/lectures/<id>/delta": op_lecture_delta,
+    "POST /api/lectures": op_create_lecture,
+    "GET /api/student/<id>/lectures/recent": op_recent_lectures,
+    "GET /api/student/<id>/lectures/<id>/comments": op_student_comments,
+    "POST /api/reactions": op_send_reaction,
+    "POST /api/reactions/batch": op_send_reaction_batch,
+    "GET /api/teacher/<id>/lectures": op_teacher_lectures,
+    "GET /api/teacher/<id>/lectures/<id>/comments": op_teacher_comments,
+    "GET /api/teacher/<id>/lectures/<id>/changes": op_changes,
+    "GET /api/teacher/<id>/lectures/<id>/reaction-counts": op_reaction_counts,
+    "GET /api/teacher/<id>/lectures/<id>/feedback-timeline": op_feedback_timeline,
+    "GET /api/teacher/<id>/lectures/<id>/feedback-clusters": op_feedback_clusters,
+    "POST /api/teacher/suggestions/<id>/approve": op_approve,
+    "POST /api/teacher/suggestions/<id>/reject": op_reject,
+    "POST /api/teacher/<id>/lectures/<id>/publish": op_publish,
+    "POST /api/ai/generate-suggestions": op_generate,
+    "POST /api/ai/generate-suggestions/stream": op_generate_stream,
+    "POST /api/ai/suggestion-jobs": op_suggestion_job,
+    "GET /api/ai/cache-stats": op_cache_stats,
+}
+
+MIXES = {
+    # A lecture in progress: students reading and reacting
+    "student": {
+        "GET /api/lectures/<id>": 35,
+        "GET /api/lectures/<id>/delta": 5,
+        "POST /api/reactions": 33,
+        "POST /api/reactions/batch": 2,
+        "GET /api/student/<id>/lectures/recent": 15,
+        "GET /api/student/<id>/lectures/<id>/comments": 10,
+    },
+    # A teacher reviewing feedback and suggestions
+    "teacher": {
+        "GET /api/teacher/<id>/lectures": 15,
+        "GET /api/teacher/<id>/lectures/<id>/comments": 20,
+        "GET /api/teacher/<id>/lectures/<id>/changes": 20,
+        "GET /api/teacher/<id>/lectures/<id>/reaction-counts": 15,
+        "GET /api/teacher/<id>/lectures/<id>/feedback-timeline": 5,
+        "GET /api/teacher/<id>/lectures/<id>/feedback-clusters": 5,
+        "POST /api/teacher/suggestions/<id>/approve": 8,
+        "POST /api/teacher/suggestions/<id>/reject": 4,
+        "POST /api/teacher/<id>/lectures/<id>/publish": 2,
+        "POST /api/ai/generate-suggestions": 3,
+        "POST /api/ai/suggestion-jobs": 3,
+        "GET /api/ai/cache-stats": 5,
+    },
+    # Everything, dominated by student traffic
+    "mixed": {
+        "GET /": 2,
+        "GET /api/lectures/<id>": 30,
+        "GET /api/lectures/<id>/delta": 3,
+        "POST /api/lectures": 1,
+        "POST /api/reactions": 30,
+        "GET /api/student/<id>/lectures/recent": 8,
+        "GET /api/student/<id>/lectures/<id>/comments": 6,
+        "GET /api/teacher/<id>/lectures": 3,
+        "GET /api/teacher/<id>/lectures/<id>/comments": 4,
+        "GET /api/teacher/<id>/lectures/<id>/changes": 5,
+        "GET /api/teacher/<id>/lectures/<id>/reaction-counts": 4,
+        "GET /api/teacher/<id>/lectures/<id>/feedback-timeline": 1,
+        "GET /api/teacher/<id>/lectures/<id>/feedback-clusters": 1,
+        "POST /api/teacher/suggestions/<id>/approve": 2,
+        "POST /api/teacher/suggestions/<id>/reject": 1,
+        "POST /api/teacher/<id>/lectures/<id>/publish": 0.5,
+        "POST /api/ai/generate-suggestions": 0.5,
+        "POST /api/ai/generate-suggestions/stream": 0.5,
+        "POST /api/ai/suggestion-jobs": 0.5,
+        "GET /api/ai/cache-stats": 1,
+    },
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_traffic(app, ctx, mix, n_requests, n_threads, base_seed):
+    labels = list(mix)
+    weights = [mix[label] for label in labels]
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    remaining = [n_requests]
+    lock = threading.Lock()
+
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(base_seed + n)
+        local = defaultdict(list)
+        local_status = defaultdict(Counter)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            label = rng.choices(labels, weights)[0]
+            start = time.perf_counter()
+            response = OPERATIONS[label](client, ctx, rng)
+            local[label].append(time.perf_counter() - start)
+            local_status[label][response.status_code] += 1
+        with lock:
+            for label, values in local.items():
+                latencies[label].extend(values)
+                statuses[label].update(local_status[label])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for label in labels:
+        values = sorted(latencies.get(label, ()))
+        if not values:
+            continue
+        routes[label] = {
+            "requests": len(values),
+            "throughput_rps": len(values) / elapsed,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "status": {str(code): n for code, n in sorted(statuses[label].items())},
+        }
+    every = sorted(v for values in latencies.values() for v in values)
+    total = {
+        "requests": len(every),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(every) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(every, 50) * 1000,
+        "p95_ms": percentile(every, 95) * 1000,
+        "p99_ms": percentile(every, 99) * 1000,
+    }
+    return total, routes
+
+
+def compare(report, baseline, max_regression):
+    """Print per-route p95 changes against a previous report; returns the
+    routes whose p95 got worse by more than max_regression percent."""
+    regressions = []
+    print(f"{'route':60} {'p95 before':>11} {'p95 now':>9} {'change':>8}", file=sys.stderr)
+    for label, now in report["routes"].items():
+        before = baseline.get("routes", {}).get(label)
+        if not before or not before["p95_ms"]:
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        print(f"{label:60} {before['p95_ms']:10.2f}  {now['p95_ms']:8.2f} {change:+7.1f}%",
+              file=sys.stderr)
+        if max_regression is not None and change > max_regression:
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--courses", type=int, default=8)
+    parser.add_argument("--students", type=int, default=50, help="per course")
+    parser.add_argument("--lectures", type=int, default=4, help="per course")
+    parser.add_argument("--sections", type=int, default=30, help="per lecture")
+    parser.add_argument("--versions", type=int, default=3, help="per lecture")
+    parser.add_argument("--reactions", type=int, default=100000)
+    parser.add_argument("--suggestions", type=int, default=10,
+                        help="pending suggestions per lecture")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="simulated Anthropic latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--metrics", action="store_true",
+                        help="run with METRICS_ENABLED to measure its overhead")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="skip tracemalloc (faster, reports RSS only)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit non-zero if any route's p95 grows by more than this %%")
+    args = parser.parse_args()
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "STORAGE_BACKEND": args.storage,
+            "SQLITE_PATH": os.path.join(tmp, "load_test.db"),
+            "METRICS_ENABLED": args.metrics,
+        })
+        ai_client.set_client(StubAnthropic(latency=args.latency))
+        rng = random.Random(args.seed)
+
+        start = time.perf_counter()
+        ctx = seed(args, rng)
+        seed_seconds = time.perf_counter() - start
+        seeded_memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+        if args.warmup:
+            run_traffic(app, ctx, MIXES[args.mix], args.warmup, args.threads, args.seed + 1000)
+        total, routes = run_traffic(
+            app, ctx, MIXES[args.mix], args.requests, args.threads, args.seed
+        )
+
+    memory = {"max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        memory.update({
+            "tracemalloc_seeded_mb": seeded_memory / 2 ** 20,
+            "tracemalloc_current_mb": current / 2 ** 20,
+            "tracemalloc_peak_mb": peak / 2 ** 20,
+        })
+        tracemalloc.stop()
+
+    report = {
+        "params": {k: v for k, v in vars(args).items()
+                   if k not in ("output", "baseline", "max_regression")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "seed_seconds": seed_seconds,
+        "total": total,
+        "memory": memory,
+        "routes": routes,
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("p95 regressions: " + ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
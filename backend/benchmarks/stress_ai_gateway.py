@@ -0,0 +1,158 @@
+"""Burst test for the AI gateway against a fault-injecting stub model.
+
+Many threads, spread over a few teachers, fire suggestion model calls at
+once through suggestions_service.request_revisions. The stub adds latency
+and fails a share of calls with 429 / 529 / 500 errors. Checks that:
+
+- running calls never exceed the global or per-teacher limit
+- model attempts never outrun the token bucket (rate * time + burst)
+- every call ends as a success, a fast GatewaySaturated rejection, or a
+  ModelUnavailable after its retries; nothing else escapes
+- injected errors were retried
+
+Run from the backend directory (exits non-zero on failure):
+
+    python -m benchmarks.stress_ai_gateway --calls 200 --error-rate 0.2
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from services import ai_gateway
+from services.ai_gateway import GatewaySaturated, ModelUnavailable
+from services.prompt_planner import Prompt
+from services.suggestions_service import request_revisions
+from benchmarks.stub_anthropic import StubAnthropic
+
+
+class TeacherTracker:
+    """Wraps the stub to count concurrent calls per teacher."""
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.lock = threading.Lock()
+        self.running = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.attempt_times = []
+
+    def client_for(self, teacher_id):
+        tracker = self
+
+        class Messages:
+            def create(self, **kwargs):
+                with tracker.lock:
+                    tracker.running[teacher_id] += 1
+                    tracker.peak[teacher_id] = max(tracker.peak[teacher_id],
+                                                   tracker.running[teacher_id])
+                    tracker.attempt_times.append(time.monotonic())
+                try:
+                    return tracker.stub.messages.create(**kwargs)
+                finally:
+                    with tracker.lock:
+                        tracker.running[teacher_id] -= 1
+
+        class Client:
+            messages = Messages()
+
+        return Client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--teachers", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument("--max-concurrent", type=int, default=6)
+    parser.add_argument("--max-per-teacher", type=int, default=2)
+    parser.add_argument("--max-waiting", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=100.0)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--attempts", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ai_gateway.configure_ai_gateway(
+        max_concurrent=args.max_concurrent,
+        max_concurrent_per_teacher=args.max_per_teacher,
+        max_waiting=args.max_waiting,
+        queue_timeout=30.0,
+        rate_per_second=args.rate,
+        burst=args.burst,
+        max_attempts=args.attempts,
+        base_delay=0.01,
+        max_delay=0.5,
+    )
+    stub = StubAnthropic(latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, retry_after=args.retry_after,
+                         seed=args.seed)
+    tracker = TeacherTracker(stub)
+    prompt = Prompt("Shared lecture prefix.\n", "SECTION 1 (ID: sec-1) FEEDBACK:\n")
+    outcomes = Counter()
+    unexpected = []
+    latencies = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.calls)
+
+    def worker(i):
+        teacher_id = f"teacher-{i % args.teachers}"
+        start_barrier.wait()
+        start = time.perf_counter()
+        try:
+            request_revisions(tracker.client_for(teacher_id), prompt, teacher_id)
+            outcome = "succeeded"
+        except GatewaySaturated:
+            outcome = "rejected"
+        except ModelUnavailable:
+            outcome = "unavailable"
+        except Exception as e:
+            outcome = "unexpected"
+            unexpected.append(repr(e))
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append((outcome, time.perf_counter() - start))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    rejected = sorted(s for o, s in latencies if o == "rejected")
+    report = {
+        "outcomes": dict(outcomes),
+        "attempts": stub.calls,
+        "injectedErrors": stub.errors,
+        "peakConcurrent": stub.max_in_flight,
+        "peakPerTeacher": max(tracker.peak.values(), default=0),
+        "elapsedSeconds": elapsed,
+        "maxRejectionMs": rejected[-1] * 1000 if rejected else None,
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if stub.max_in_flight > args.max_concurrent:
+        failures.append(f"{stub.max_in_flight} concurrent calls > {args.max_concurrent}")
+    if report["peakPerTeacher"] > args.max_per_teacher:
+        failures.append(f"{report['peakPerTeacher']} calls for one teacher > {args.max_per_teacher}")
+    allowed = args.rate * elapsed + args.burst + 1
+    if stub.calls > allowed:
+        failures.append(f"{stub.calls} attempts in {elapsed:.2f}s exceed the rate limit")
+    if unexpected:
+        failures.append(f"unexpected errors: {unexpected[:3]}")
+    if stub.errors and stub.calls <= args.calls - outcomes["rejected"]:
+        failures.append("injected errors were not retried")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Multi-threaded stress run for approve / reject / publish and reactions.
+
+Hammers one lecture from many threads through the Flask app and then
+checks that no update was lost:
+
+- every approved suggestion was published exactly once or is still queued
+  on the current version
+- each lecture has exactly one current version and versions are contiguous
+- every accepted reaction is stored and the reaction counters agree
+
+Run from the backend directory (exits non-zero on failure):
+
+    python -m benchmarks.stress_concurrency --threads 16 --suggestions 400
+"""
+import argparse
+import random
+import sys
+import threading
+from collections import Counter
+
+from app import create_app
+from models import data_store
+from services.changes_service import record_suggestion_change
+from services.reactions_service import verify_reaction_counters
+from utils.id_utils import new_uuid
+from utils.time_utils import now_iso
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--suggestions", type=int, default=400)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--reactions-per-thread", type=int, default=500)
+    args = parser.parse_args()
+
+    # Switch threads far more often than the default to provoke races
+    sys.setswitchinterval(1e-6)
+
+    app = create_app()
+    setup = app.test_client()
+    lecture = setup.post("/api/lectures", json={
+        "title": "Stress", "teacherId": "teacher-1", "courseId": "course-1",
+        "sections": [f"section {i}" for i in range(args.sections)],
+    }).get_json()
+    base_id = lecture["baseLectureId"]
+    section_ids = [s["id"] for s in lecture["sections"]]
+
+    suggestion_ids = []
+    for i in range(args.suggestions):
+        suggestion = {
+            "id": new_uuid(),
+            "lectureId": lecture["id"],
+            "sectionId": section_ids[i % len(section_ids)],
+            "originalText": "",
+            "suggestedText": f"text {i}",
+            "status": "pending",
+            "createdAt": now_iso(),
+        }
+        data_store.suggestions_repo.insert(suggestion)
+        record_suggestion_change(suggestion)
+        suggestion_ids.append(suggestion["id"])
+
+    results = Counter()
+    published = []
+    lock = threading.Lock()
+    work = list(suggestion_ids) * 2  # every suggestion is approved/rejected twice
+    random.shuffle(work)
+    work_lock = threading.Lock()
+
+    def current_lecture_id():
+        current = data_store.lecture_store.find(baseLectureId=base_id, isCurrent=True)
+        return current[0]["id"] if current else None
+
+    def worker(n):
+        client = app.test_client()
+        rng = random.Random(n)
+        sent = 0
+        while True:
+            with work_lock:
+                suggestion_id = work.pop() if work else None
+            if suggestion_id is None:
+                break
+            action = "approve" if rng.random() < 0.8 else "reject"
+            r = client.post(f"/api/teacher/suggestions/{suggestion_id}/{action}")
+            with lock:
+                results[f"{action}:{r.status_code}"] += 1
+            if rng.random() < 0.2:
+                r = client.post(f"/api/teacher/teacher-1/lectures/{current_lecture_id()}/publish")
+                with lock:
+                    results[f"publish:{r.status_code}"] += 1
+                    if r.status_code == 200:
+                        published.extend(s["id"] for s in r.get_json()["updatedSuggestions"])
+            for _ in range(rng.randint(0, 5)):
+                if sent >= args.reactions_per_thread:
+                    break
+                r = client.post("/api/reactions", json={
+                    "userId": f"student-{n}", "lectureId": current_lecture_id(),
+                    "sectionId": rng.choice(section_ids), "type": "confused",
+                    "comment": "",
+                })
+                sent += 1
+                with lock:
+                    results[f"reaction:{r.status_code}"] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    failures = []
+
+    versions = data_store.lecture_store.find(baseLectureId=base_id)
+    if sum(1 for v in versions if v["isCurrent"]) != 1:
+        failures.append("expected exactly one current version")
+    numbers = sorted(v["version"] for v in versions)
+    if numbers != list(range(1, len(numbers) + 1)):
+        failures.append(f"version numbers are not contiguous: {numbers}")
+
+    accepted = {s["id"] for s in data_store.suggestions_repo.all() if s["status"] == "accepted"}
+    # An update queued on a superseded version can never be published
+    current_id = current_lecture_id()
+    queued = [
+        u["suggestionId"] for u in data_store.approved_updates_repo.all()
+        if u["lectureId"] == current_id
+    ]
+    outcomes = Counter(published) + Counter(queued)
+    lost = accepted - set(outcomes)
+    duplicated = [sid for sid, n in outcomes.items() if n > 1]
+    if lost:
+        failures.append(f"{len(lost)} approved suggestions were lost")
+    if duplicated:
+        failures.append(f"{len(duplicated)} suggestions were published or queued twice")
+    stray = set(outcomes) - accepted
+    if stray:
+        failures.append(f"{len(stray)} published/queued suggestions are not accepted")
+
+    stored_reactions = sum(
+        len(data_store.reactions_repo.find(lectureId=v["id"])) for v in versions
+    )
+    if stored_reactions != results["reaction:201"]:
+        failures.append(
+            f"{results['reaction:201']} reactions accepted but {stored_reactions} stored"
+        )
+    if not verify_reaction_counters(repair=False):
+        failures.append("reaction counters disagree with stored reactions")
+
+    print(dict(sorted(results.items())))
+    print(f"versions={len(versions)} accepted={len(accepted)} "
+          f"published={len(published)} queued={len(queued)}")
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("OK: no lost or duplicated updates")
+
+
+if __name__ == "__main__":
+    main()
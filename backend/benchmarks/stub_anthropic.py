@@ -0,0 +1,170 @@
+"""Offline stand-in for anthropic.Anthropic used by benchmarks and local runs.
+
+It answers messages.create() after a configurable delay with a valid
+"revisions" payload for every section that has feedback in the prompt.
+Content blocks marked with cache_control are treated like Anthropic prompt
+caching: the text up to the marker is a cache write the first time and a
+cache read afterwards, and the usage reports it the same way.
+
+For testing retries and limits it can also add latency jitter and fail a
+share of calls with API-style errors (status_code plus response headers
+carrying retry-after, like anthropic.APIStatusError).
+"""
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+SECTION_ID_RE = re.compile(r"\(ID: ([^)]+)\) FEEDBACK")
+
+
+def _prompt_text(messages):
+    parts = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return "".join(parts)
+
+
+class StubAPIError(Exception):
+    """Looks like anthropic.APIStatusError to the AI gateway."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"stub API error {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def _cached_prefix(messages):
+    """Text up to and including the last block marked with cache_control."""
+    parts, prefix = [], None
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for block in content:
+            parts.append(block.get("text", ""))
+            if block.get("cache_control"):
+                prefix = "".join(parts)
+    return prefix
+
+
+def _message(prompt, text, cache_write=0, cache_read=0):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(
+            input_tokens=len(prompt) // 4 - cache_write - cache_read,
+            output_tokens=len(text) // 4,
+            cache_creation_input_tokens=cache_write,
+            cache_read_input_tokens=cache_read,
+        ),
+    )
+
+
+class _StubStream:
+    def __init__(self, prompt, text, chunk_size, chunk_delay, usage):
+        self._prompt = prompt
+        self._text = text
+        self._usage = usage
+        self._chunk_size = chunk_size
+        self._chunk_delay = chunk_delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        for i in range(0, len(self._text), self._chunk_size):
+            time.sleep(self._chunk_delay)
+            yield self._text[i:i + self._chunk_size]
+
+    def get_final_message(self):
+        return _message(self._prompt, self._text, *self._usage)
+
+
+class _StubMessages:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def _respond(self, model, messages, kwargs):
+        owner = self._owner
+        prefix = _cached_prefix(messages)
+        cache_write = cache_read = 0
+        with owner._lock:
+            owner.calls += 1
+            owner.requests.append({"model": model, "messages": messages, **kwargs})
+            failing = owner._rng.random() < owner.error_rate
+            if failing:
+                status = owner._rng.choice(owner.error_statuses)
+                owner.errors += 1
+            if prefix is not None and not failing:
+                if prefix in owner.prompt_cache:
+                    cache_read = len(prefix) // 4
+                else:
+                    owner.prompt_cache.add(prefix)
+                    cache_write = len(prefix) // 4
+        if failing:
+            time.sleep(owner.latency / 10)
+            raise StubAPIError(status, owner.retry_after if status in (429, 529) else None)
+        prompt = _prompt_text(messages)
+        section_ids = list(dict.fromkeys(SECTION_ID_RE.findall(prompt)))
+        body = json.dumps({
+            "revisions": [
+                {"sectionId": sid, "revisedText": f"Revised text for {sid}"}
+                for sid in section_ids
+            ]
+        })
+        return prompt, f"```json\n{body}\n```", (cache_write, cache_read)
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        owner = self._owner
+        with owner._lock:
+            owner.in_flight += 1
+            owner.max_in_flight = max(owner.max_in_flight, owner.in_flight)
+        try:
+            prompt, text, usage = self._respond(model, messages, kwargs)
+            time.sleep(owner.latency + owner._rng.uniform(0, owner.jitter))
+            return _message(prompt, text, *usage)
+        finally:
+            with owner._lock:
+                owner.in_flight -= 1
+
+    def stream(self, model, max_tokens, messages, **kwargs):
+        prompt, text, usage = self._respond(model, messages, kwargs)
+        chunk_size = 16
+        chunk_delay = self._owner.latency * chunk_size / max(len(text), 1)
+        return _StubStream(prompt, text, chunk_size, chunk_delay, usage)
+
+
+class StubAnthropic:
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_statuses=(429, 529, 500),
+                 retry_after=None,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rng = random.Random(seed)
+        self.requests = []
+        self.prompt_cache = set()
+        self._lock = threading.Lock()
+        self.messages = _StubMessages(self)
@@ -0,0 +1,58 @@
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+
+class ChangeLog:
+    """Monotonic sequence of entity changes, indexed by lecture.
+
+    Every insert or update of a tracked entity appends (seq, kind, id) to
+    the lecture's log. Readers ask for everything after a sequence number
+    and get each changed entity once, so polling costs are proportional to
+    the activity since the last poll rather than the size of the lecture.
+    Sequence numbers are per process (see data_store.configure_storage).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._seqs: Dict[str, List[int]] = {}
+        self._entries: Dict[str, List[Tuple[str, str]]] = {}
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def record(self, lecture_id: str, kind: str, entity_id: str) -> int:
+        with self._lock:
+            self._seq += 1
+            self._seqs.setdefault(lecture_id, []).append(self._seq)
+            self._entries.setdefault(lecture_id, []).append((kind, entity_id))
+            return self._seq
+
+    def since(self, lecture_id: str, seq: int, limit: int) -> Tuple[List[Tuple[str, str]], int, bool]:
+        """Distinct (kind, id) changed after seq, at most limit of them.
+
+        Returns (changes, next_seq, has_more); next_seq is the cursor to
+        pass on the next call.
+        """
+        with self._lock:
+            seqs = self._seqs.get(lecture_id, [])
+            entries = self._entries.get(lecture_id, [])
+            start = bisect.bisect_right(seqs, seq)
+            changed: Dict[Tuple[str, str], None] = {}
+            next_seq = seq
+            i = start
+            while i < len(seqs):
+                entry = entries[i]
+                if entry not in changed:
+                    if len(changed) >= limit:
+                        break
+                    changed[entry] = None
+                next_seq = seqs[i]
+                i += 1
+            has_more = i < len(seqs)
+            if not has_more:
+                # Nothing left for this lecture: jump to the global head
+                next_seq = max(next_seq, self._seq)
+            return list(changed), next_seq, has_more
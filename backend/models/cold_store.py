@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Tuple
+
+from utils.ttl_cache import TTLCache
+
+# Frame header: payload length, key length; then the key and the payload
+_HEADER = struct.Struct(">IH")
+
+
+class ColdStore:
+    """Append-only file of gzip-compressed record frames.
+
+    Each append writes one frame: a header, a key (e.g. "reactions:<lecture
+    id>") and the gzipped JSON list of records. Only the offset index
+    (key -> [(offset, length)]) stays in memory; records are read back
+    with one pread per frame, and the most recently read frames are kept
+    decoded in an LRU cache. Opening an existing file rebuilds the index
+    from the frame headers and truncates a frame left half-written by a
+    crash. reset=True starts from an empty file instead.
+    """
+
+    def __init__(self, path: str, cache_size: int = 64, reset: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._frames = TTLCache(max_entries=cache_size, ttl=None)
+        self._file = open(path, "w+b" if reset else "a+b")
+        self._size = self._scan()
+        self.records = 0
+        self.raw_bytes = 0
+
+    def _scan(self) -> int:
+        """Index the frames already in the file; returns the end of the last
+        complete one."""
+        file_size = os.fstat(self._file.fileno()).st_size
+        self._file.seek(0)
+        offset = 0
+        while True:
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            length, key_length = _HEADER.unpack(header)
+            key = self._file.read(key_length)
+            start = offset + _HEADER.size + key_length
+            if len(key) < key_length or start + length > file_size:
+                break
+            self._file.seek(length, os.SEEK_CUR)
+            self._index.setdefault(key.decode("utf-8"), []).append((start, length))
+            offset = start + length
+        self._file.truncate(offset)
+        return offset
+
+    def append(self, key: str, records: List[Dict[str, Any]]) -> None:
+        encoded = json.dumps(records, separators=(",", ":")).encode("utf-8")
+        payload = gzip.compress(encoded, compresslevel=6)
+        key_bytes = key.encode("utf-8")
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(_HEADER.pack(len(payload), len(key_bytes)) + key_bytes + payload)
+            self._file.flush()
+            start = self._size + _HEADER.size + len(key_bytes)
+            self._size = start + len(payload)
+            self._index.setdefault(key, []).append((start, len(payload)))
+            self.records += len(records)
+            self.raw_bytes += len(encoded)
+
+    def _frame(self, offset: int, length: int) -> List[Dict[str, Any]]:
+        records = self._frames.get(offset)
+        if records is None:
+            payload = os.pread(self._file.fileno(), length, offset)
+            records = json.loads(gzip.decompress(payload))
+            self._frames.set(offset, records)
+        return records
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        """Every record appended under key, oldest frame first."""
+        records: List[Dict[str, Any]] = []
+        for offset, length in list(self._index.get(key, ())):
+            records.extend(self._frame(offset, length))
+        return records
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def scan(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        """Every record whose key starts with prefix (bypasses the cache)."""
+        for key, frames in list(self._index.items()):
+            if key.startswith(prefix):
+                for offset, length in list(frames):
+                    payload = os.pread(self._file.fileno(), length, offset)
+                    yield from json.loads(gzip.decompress(payload))
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "keys": len(self._index),
+            "frames": sum(len(frames) for frames in self._index.values()),
+            "fileBytes": self._size,
+            "recordsAppended": self.records,
+            "rawBytesAppended": self.raw_bytes,
+            "frameCache": self._frames.stats(),
+        }
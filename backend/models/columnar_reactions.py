@@ -0,0 +1,327 @@
+import threading
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.reaction_counters import REACTION_TYPES
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+_ID_BYTES = 16
+# Fields stored as codes into a per-field string table, with an index each
+_INTERNED_FIELDS = ("lectureId", "sectionId", "userId")
+
+
+def _id_key(value: Any) -> Any:
+    """16 raw bytes for canonical uuid strings, the value itself otherwise."""
+    try:
+        parsed = uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        return value
+    return parsed.bytes if str(parsed) == value else value
+
+
+def _encode_timestamp(value: Any) -> Optional[int]:
+    """now_iso() string -> epoch microseconds, or None if it wouldn't
+    come back out of _decode_timestamp unchanged."""
+    if not isinstance(value, str) or not value.endswith("Z"):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1])
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        return None
+    micros = (parsed - _EPOCH) // _ONE_MICROSECOND
+    return micros if _decode_timestamp(micros) == value else None
+
+
+def _decode_timestamp(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat() + "Z"
+
+
+class _Interner:
+    """Two-way table between strings and small int codes (0 is None)."""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {None: 0}
+        self.values: List[Any] = [None]
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarReactionRepository:
+    """Reactions stored column by column instead of one dict per row.
+
+    Same interface as IndexedRepository (and the same dict rows at the
+    boundary), at a fraction of the memory:
+
+    - id: 16 raw bytes for uuid ids
+    - lectureId / sectionId / userId: 4-byte codes into shared string tables
+    - type: 1-byte enum over REACTION_TYPES
+    - createdAt: 8-byte epoch microseconds
+    - addressed: one bit
+    - comment: a reference (empty comments share one string)
+
+    Values that don't fit their column (a non-uuid id, an unknown type, an
+    extra field, ...) are kept as-is in a per-row overflow dict, so every
+    row reads back exactly as it was written. Rows are expected to be
+    complete reactions (as built by create_reaction), with an "id".
+
+    Reads build fresh dicts, so changes have to go through update().
+    Writes take the repository lock; readers only look at rows whose
+    index entries are already published.
+
+    delete() only marks a slot dead; compacted() builds a copy without the
+    dead slots once enough of them pile up (see data_store.compact_reactions).
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self._ids = bytearray()
+        self._codes = {field: array("I") for field in _INTERNED_FIELDS}
+        self._interners = {field: _Interner() for field in _INTERNED_FIELDS}
+        self._indexes: Dict[str, Dict[int, array]] = {f: {} for f in _INTERNED_FIELDS}
+        self._types = array("b")
+        self._created = array("q")
+        self._comments: List[Any] = []
+        self._addressed = bytearray()
+        self._live = bytearray()
+        self._overflow: Dict[int, Dict[str, Any]] = {}
+        self._by_id: Dict[Any, int] = {}
+        self._count = 0
+        self._live_count = 0
+        self._lock = threading.RLock()
+        # Set by compacted(): writes from then on go to the copy
+        self._forward: Optional["ColumnarReactionRepository"] = None
+        self.insert_many(rows)
+
+    # -- bitsets ------------------------------------------------------------
+
+    @staticmethod
+    def _bit(bits: bytearray, i: int) -> bool:
+        return bool(bits[i >> 3] & (1 << (i & 7)))
+
+    @staticmethod
+    def _set_bit(bits: bytearray, i: int, value: bool) -> None:
+        if value:
+            bits[i >> 3] |= 1 << (i & 7)
+        else:
+            bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    # -- encoding -----------------------------------------------------------
+
+    def _set_fields(self, i: int, fields: Dict[str, Any], is_new: bool) -> None:
+        overflow = self._overflow.get(i, {})
+        for field, value in fields.items():
+            overflow.pop(field, None)
+            if field == "id":
+                if not is_new:
+                    self._by_id.pop(self._id_key_at(i), None)
+                key = _id_key(value)
+                if isinstance(key, bytes):
+                    self._ids[i * _ID_BYTES:(i + 1) * _ID_BYTES] = key
+                else:
+                    overflow["id"] = value
+                self._by_id[key] = i
+            elif field in self._codes:
+                code = self._interners[field].code(value)
+                column = self._codes[field]
+                old = column[i]
+                if is_new or old != code:
+                    if not is_new:
+                        self._indexes[field][old].remove(i)
+                    column[i] = code
+                    self._indexes[field].setdefault(code, array("I")).append(i)
+            elif field == "type" and value in REACTION_TYPES:
+                self._types[i] = REACTION_TYPES.index(value)
+            elif field == "createdAt" and (micros := _encode_timestamp(value)) is not None:
+                self._created[i] = micros
+            elif field == "addressed" and isinstance(value, bool):
+                self._set_bit(self._addressed, i, value)
+            elif field == "comment":
+                self._comments[i] = value
+            else:
+                overflow[field] = value
+        if overflow:
+            self._overflow[i] = overflow
+        else:
+            self._overflow.pop(i, None)
+
+    def _id_key_at(self, i: int) -> Any:
+        overflow = self._overflow.get(i)
+        if overflow and "id" in overflow:
+            return overflow["id"]
+        return bytes(self._ids[i * _ID_BYTES:(i + 1) * _ID_BYTES])
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        row = {
+            "id": str(uuid.UUID(bytes=bytes(self._ids[i * _ID_BYTES:(i + 1) * _ID_BYTES]))),
+            "lectureId": self._interners["lectureId"].values[self._codes["lectureId"][i]],
+            "sectionId": self._interners["sectionId"].values[self._codes["sectionId"][i]],
+            "userId": self._interners["userId"].values[self._codes["userId"][i]],
+            "addressed": self._bit(self._addressed, i),
+            "type": REACTION_TYPES[self._types[i]],
+            "comment": self._comments[i],
+            "createdAt": _decode_timestamp(self._created[i]),
+        }
+        overflow = self._overflow.get(i)
+        if overflow:
+            row.update(overflow)
+        return row
+
+    def _position(self, row: Dict[str, Any]) -> Optional[int]:
+        i = self._by_id.get(_id_key(row.get("id")))
+        return i if i is not None and self._bit(self._live, i) else None
+
+    # -- repository interface -----------------------------------------------
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if self._forward is not None:
+                return self._forward.insert(row)
+            existing = self._position(row)
+            if existing is not None:
+                self.delete(row)
+            i = self._count
+            self._ids.extend(bytes(_ID_BYTES))
+            for column in self._codes.values():
+                column.append(0)
+            self._types.append(0)
+            self._created.append(0)
+            self._comments.append("")
+            if i % 8 == 0:
+                self._addressed.append(0)
+                self._live.append(0)
+            # Missing ids still get a code (None) so the indexes cover every row
+            fields = {f: None for f in _INTERNED_FIELDS}
+            fields.update(row)
+            self._set_fields(i, fields, is_new=True)
+            self._set_bit(self._live, i, True)
+            self._live_count += 1
+            self._count = i + 1
+        return row
+
+    def insert_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.insert(row) for row in rows]
+
+    def update(self, row: Dict[str, Any], **changes: Any) -> Dict[str, Any]:
+        with self._lock:
+            if self._forward is not None:
+                return self._forward.update(row, **changes)
+            i = self._position(row)
+            if i is not None:
+                self._set_fields(i, changes, is_new=False)
+        row.update(changes)
+        return row
+
+    def compare_and_update(self,
+                           row: Dict[str, Any],
+                           expected: Dict[str, Any],
+                           **changes: Any) -> bool:
+        with self._lock:
+            if self._forward is not None:
+                return self._forward.compare_and_update(row, expected, **changes)
+            i = self._position(row)
+            if i is None:
+                return False
+            stored = self._row(i)
+            if any(stored.get(f) != v for f, v in expected.items()):
+                return False
+            self._set_fields(i, changes, is_new=False)
+        row.update(changes)
+        return True
+
+    def delete(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._forward is not None:
+                return self._forward.delete(row)
+            i = self._position(row)
+            if i is None:
+                return
+            self._by_id.pop(self._id_key_at(i), None)
+            self._set_bit(self._live, i, False)
+            self._overflow.pop(i, None)
+            self._comments[i] = ""
+            self._live_count -= 1
+
+    def get(self, row_id: str) -> Optional[Dict[str, Any]]:
+        i = self._by_id.get(_id_key(row_id))
+        if i is None or not self._bit(self._live, i):
+            return None
+        return self._row(i)
+
+    def find(self, **criteria: Any) -> List[Dict[str, Any]]:
+        """Matching rows in insertion order; the smallest index bucket among
+        the criteria is the candidate set."""
+        if not criteria:
+            return self.all()
+        coded = {}
+        candidates = None
+        for field, value in criteria.items():
+            if field in self._codes:
+                code = self._interners[field].codes.get(value)
+                if code is None:
+                    return []
+                coded[field] = code
+                bucket = self._indexes[field].get(code, ())
+                if candidates is None or len(bucket) < len(candidates):
+                    candidates = bucket
+        # Slicing copies the bucket in one step, so concurrent inserts are safe
+        positions = range(self._count) if candidates is None else candidates[:]
+        rest = {f: v for f, v in criteria.items() if f not in coded}
+        columns = [(self._codes[f], code) for f, code in coded.items()]
+        result = []
+        for i in positions:
+            if not self._bit(self._live, i):
+                continue
+            if any(column[i] != code for column, code in columns):
+                continue
+            row = self._row(i)
+            if all(row.get(f) == v for f, v in rest.items()):
+                result.append(row)
+        return result
+
+    def values(self, field: str, **criteria: Any) -> List[Any]:
+        """Distinct values of a field, optionally restricted by criteria."""
+        if not criteria and field in self._indexes:
+            values = self._interners[field].values
+            return [
+                values[code] for code, bucket in list(self._indexes[field].items())
+                if any(self._bit(self._live, i) for i in bucket)
+            ]
+        seen: Dict[Any, None] = {}
+        for r in self.find(**criteria):
+            seen.setdefault(r.get(field))
+        return list(seen)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [self._row(i) for i in range(self._count) if self._bit(self._live, i)]
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    @property
+    def dead_ratio(self) -> float:
+        """Share of row slots that belong to deleted rows."""
+        return 1 - self._live_count / self._count if self._count else 0.0
+
+    def compacted(self) -> "ColumnarReactionRepository":
+        """A copy of the live rows without the dead slots, index entries and
+        strings only deleted rows used.
+
+        Writes that still reach this repository are forwarded to the copy,
+        so the caller can swap its reference without losing any; readers
+        holding this one keep seeing the rows as they were at the copy.
+        """
+        with self._lock:
+            if self._forward is not None:
+                return self._forward.compacted()
+            copy = ColumnarReactionRepository(self.all())
+            self._forward = copy
+        return copy
@@ -1,7 +1,16 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from utils.id_utils import new_uuid
 from utils.time_utils import now_iso
+from models.repository import IndexedRepository
+from models.columnar_reactions import ColumnarReactionRepository
+from models.reaction_counters import ReactionCounters
+from models.reaction_timeline import ReactionTimeline
+from models.lecture_store import LectureVersionStore
+from models.change_log import ChangeLog
+from models.cold_store import ColdStore
 # Simple in-memory "DB" for the hackathon.
+# The lists below are the seed rows; services read and write through the
+# indexed repositories at the bottom of this file.
 
 
 # Users
@@ -75,3 +84,158 @@ suggestions: List[Dict[str, Any]] = [{
 # Approved section updates waiting to be published
 # Each entry: { "lectureId": str, "sectionId": str, "suggestedText": str, "suggestionId": str }
 approved_section_updates: List[Dict[str, Any]] = []
+
+# Indexed repositories over the tables above
+users_repo = IndexedRepository(users, ("role",))
+courses_repo = IndexedRepository(courses, ("teacherId",))
+enrollments_repo = IndexedRepository(enrollments, ("userId", "courseId"))
+lectures_repo = IndexedRepository(
+    (), ("baseLectureId", "teacherId", "courseId", "isCurrent")
+)
+section_blobs_repo = IndexedRepository()
+REACTION_INDEXES = ("lectureId", "sectionId", "userId")
+reactions_repo = IndexedRepository(reactions, REACTION_INDEXES)
+suggestions_repo = IndexedRepository(suggestions, ("lectureId", "sectionId", "status"))
+approved_updates_repo = IndexedRepository(
+    approved_section_updates, ("lectureId", "suggestionId")
+)
+
+# Lecture versions share unchanged sections; lectures_repo holds metadata rows
+lecture_store = LectureVersionStore(lectures_repo, section_blobs_repo)
+for _lecture in lectures:
+    lecture_store.add(_lecture)
+
+# Per-lecture / per-section reaction counts, kept up to date by reactions_service
+reaction_counters = ReactionCounters(reactions_repo.all())
+
+# Per-minute / per-hour reaction buckets for the teacher heatmaps
+reaction_timeline = ReactionTimeline(reactions_repo.all())
+
+# Change sequence for reactions and suggestions (teacher "changes since" feed)
+change_log = ChangeLog()
+
+def compact_reactions(min_dead_ratio: float = 0.25) -> bool:
+    """Rebuild a columnar reactions_repo without the slots of deleted rows
+    once at least min_dead_ratio of its slots are dead. Returns whether it
+    was rebuilt (dict rows free their memory on delete already)."""
+    global reactions_repo
+    repo = reactions_repo
+    if not isinstance(repo, ColumnarReactionRepository) or repo.dead_ratio < min_dead_ratio:
+        return False
+    reactions_repo = repo.compacted()
+    return True
+
+
+# Addressed reactions and archived lecture versions moved out of memory by
+# services/retention_service; None until configure_cold_store
+cold_store: Optional[ColdStore] = None
+
+
+def configure_cold_store(path: Optional[str], cache_size: int = 64, reset: bool = False) -> None:
+    """Attach a cold store at path to the repositories (None detaches it).
+
+    An existing file is reopened and the versions archived in it are listed
+    again; reset=True empties it instead. Call after configure_storage.
+    """
+    global cold_store
+    if cold_store is not None:
+        cold_store.close()
+    cold_store = ColdStore(path, cache_size=cache_size, reset=reset) if path else None
+    lecture_store.cold = cold_store
+    if cold_store is not None:
+        lecture_store.restore_archived()
+
+
+def configure_storage(backend: str = "memory",
+                      sqlite_path: str = "lectures.db",
+                      reaction_batch_size: int = 64,
+                      lecture_cache_size: int = 128,
+                      reaction_store: str = "dict") -> None:
+    """Select the storage backend used by the services.
+
+    "memory" keeps the indexed in-process repositories above; with
+    reaction_store="columnar" the reactions are moved into a
+    ColumnarReactionRepository, which needs far less memory per reaction
+    (see benchmarks/bench_reaction_memory.py). "sqlite"
+    swaps every repository for a SQLite table in sqlite_path (seeded with
+    the rows above when the file is new) so state survives restarts. The
+    reaction timeline, change log, SSE subscribers and reaction idempotency
+    keys stay in memory, so only one process may serve a database: the
+    first to open it holds a lock and the others fail (see claim_database).
+    """
+    global users_repo, courses_repo, enrollments_repo, lectures_repo
+    global reactions_repo, suggestions_repo, approved_updates_repo
+    global section_blobs_repo, lecture_store, reaction_counters, reaction_timeline
+
+    if reaction_store not in ("dict", "columnar"):
+        raise ValueError(f"Unknown reaction store: {reaction_store}")
+    if backend == "memory":
+        lecture_store.cache_size = lecture_cache_size
+        is_columnar = isinstance(reactions_repo, ColumnarReactionRepository)
+        if reaction_store == "columnar" and not is_columnar:
+            reactions_repo = ColumnarReactionRepository(reactions_repo.all())
+        elif reaction_store == "dict" and is_columnar:
+            reactions_repo = IndexedRepository(reactions_repo.all(), REACTION_INDEXES)
+        return
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    from models.sqlite_store import (
+        SQLiteDatabase, SQLiteRepository, SQLiteReactionCounters, claim_database,
+    )
+
+    claim_database(sqlite_path)
+    db = SQLiteDatabase(sqlite_path)
+    repos = {
+        "users": SQLiteRepository(db, "users", ("role",), [("role",)]),
+        "courses": SQLiteRepository(db, "courses", ("teacherId",), [("teacherId",)]),
+        "enrollments": SQLiteRepository(
+            db, "enrollments", ("userId", "courseId"), [("userId",), ("courseId",)],
+            key_fields=("userId", "courseId"),
+        ),
+        "lectures": SQLiteRepository(
+            db, "lectures", ("baseLectureId", "teacherId", "courseId", "isCurrent"),
+            [("baseLectureId",), ("teacherId",), ("courseId", "isCurrent")],
+        ),
+        "section_blobs": SQLiteRepository(db, "section_blobs"),
+        "reactions": SQLiteRepository(
+            db, "reactions", ("lectureId", "sectionId", "userId", "type", "addressed"),
+            [("lectureId", "sectionId", "type", "addressed"),
+             ("sectionId",), ("userId", "lectureId")],
+            batch_size=reaction_batch_size,
+        ),
+        "suggestions": SQLiteRepository(
+            db, "suggestions", ("lectureId", "sectionId", "status"),
+            [("lectureId",), ("sectionId",)],
+        ),
+        "approved_updates": SQLiteRepository(
+            db, "approved_updates", ("lectureId", "suggestionId"), [("lectureId",)],
+            key_fields=("suggestionId",),
+        ),
+    }
+    seeds = {
+        "users": users, "courses": courses, "enrollments": enrollments,
+        "reactions": reactions, "suggestions": suggestions,
+        "approved_updates": approved_section_updates,
+    }
+    for name, rows in seeds.items():
+        if len(repos[name]) == 0 and rows:
+            repos[name].insert_many(rows)
+    store = LectureVersionStore(
+        repos["lectures"], repos["section_blobs"], cache_size=lecture_cache_size
+    )
+    if len(store) == 0:
+        for lecture in lectures:
+            store.add(lecture)
+
+    users_repo = repos["users"]
+    courses_repo = repos["courses"]
+    enrollments_repo = repos["enrollments"]
+    lectures_repo = repos["lectures"]
+    section_blobs_repo = repos["section_blobs"]
+    lecture_store = store
+    reactions_repo = repos["reactions"]
+    suggestions_repo = repos["suggestions"]
+    approved_updates_repo = repos["approved_updates"]
+    reaction_counters = SQLiteReactionCounters(reactions_repo)
+    reaction_timeline = ReactionTimeline(reactions_repo.all())
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.repository import IndexedRepository
+
+# Storage-only fields that never leave the store
+INTERNAL_FIELDS = ("sectionRefs",)
+
+
+def section_hash(section: Dict[str, Any]) -> str:
+    encoded = json.dumps(section, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class LectureVersionStore:
+    """Lecture versions stored as metadata rows plus shared section blobs.
+
+    Each section is stored once under the hash of its content; a lecture
+    version only keeps the ordered list of blob hashes ("sectionRefs").
+    Publishing a new version copies that list and interns just the edited
+    sections, so unchanged sections are shared by every version. Reads
+    rebuild the full lecture from the blobs and keep the rebuilt section
+    lists of recently read versions in an LRU cache.
+
+    With a cold store (models.cold_store.ColdStore) attached, archive()
+    moves old versions out of memory: the full version goes to the cold
+    store, only its metadata stays in archived_repo for listings, and
+    blobs no remaining version uses are dropped. Reads of an archived
+    version page it back in from the cold store.
+    """
+
+    def __init__(self, lectures_repo, blobs_repo, cache_size: int = 128):
+        self.lectures_repo = lectures_repo
+        self.blobs_repo = blobs_repo
+        self.cache_size = cache_size
+        self.cold = None
+        self.archived_repo = IndexedRepository((), ("baseLectureId", "teacherId", "courseId"))
+        self._sections_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Blob writes and blob collection in archive() are serialised; blobs
+        # interned for a version that doesn't exist yet are pinned
+        self._write_lock = threading.RLock()
+        self._pins: Counter = Counter()
+
+    def _intern(self, section: Dict[str, Any]) -> str:
+        ref = section_hash(section)
+        if self.blobs_repo.get(ref) is None:
+            self.blobs_repo.insert({"id": ref, "section": section})
+        return ref
+
+    @staticmethod
+    def _public(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in row.items() if k not in INTERNAL_FIELDS}
+
+    def _sections(self, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        lecture_id = row["id"]
+        with self._cache_lock:
+            sections = self._sections_cache.get(lecture_id)
+            if sections is not None:
+                self._sections_cache.move_to_end(lecture_id)
+                return sections
+        sections = [self._blob(ref) for ref in row["sectionRefs"]]
+        with self._cache_lock:
+            self._sections_cache[lecture_id] = sections
+            if len(self._sections_cache) > self.cache_size:
+                self._sections_cache.popitem(last=False)
+        return sections
+
+    def _blob(self, ref: str) -> Dict[str, Any]:
+        blob = self.blobs_repo.get(ref)
+        if blob is None:
+            raise KeyError(ref)
+        return blob["section"]
+
+    def _load(self, lecture_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(row, sections) of a version, paged in from the cold store if it
+        has been archived; (None, []) if there is no such version."""
+        row = self.lectures_repo.get(lecture_id)
+        if row is not None:
+            try:
+                return row, self._sections(row)
+            except KeyError:
+                pass  # archived (and its blobs dropped) while being read
+        if self.cold is not None and self.archived_repo.get(lecture_id) is not None:
+            record = self.cold.get(f"lecture:{lecture_id}")[-1]
+            return record["row"], record["sections"]
+        return None, []
+
+    def compare(self, old_id: str, new_id: str) -> Optional[Dict[str, Any]]:
+        """Sections that differ between two versions, matched by section id.
+
+        Returns {"changed": [(old, new)], "added": [new], "removed": [old],
+        "order": [section ids of the new version]}, or None if either
+        version is missing. Shared sections have the same blob hash, so only
+        the sections that differ are read.
+        """
+        old_row, old_sections = self._load(old_id)
+        new_row, new_sections = self._load(new_id)
+        if old_row is None or new_row is None:
+            return None
+        old = {s["id"]: (ref, s) for s, ref in zip(old_sections, old_row["sectionRefs"])}
+        new = {s["id"]: (ref, s) for s, ref in zip(new_sections, new_row["sectionRefs"])}
+        return {
+            "changed": [
+                (old[sid][1], section)
+                for sid, (ref, section) in new.items()
+                if sid in old and old[sid][0] != ref
+            ],
+            "added": [section for sid, (_, section) in new.items() if sid not in old],
+            "removed": [section for sid, (_, section) in old.items() if sid not in new],
+            "order": list(new),
+        }
+
+    def add(self, lecture: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a full lecture dict (with "sections") as a new version."""
+        row = {k: v for k, v in lecture.items() if k != "sections"}
+        with self._write_lock:
+            row["sectionRefs"] = [self._intern(s) for s in lecture["sections"]]
+            self.lectures_repo.insert(row)
+        return lecture
+
+    def intern_sections(self, sections: List[Dict[str, Any]]) -> List[str]:
+        """Store a batch of section blobs (one insert_many) and return their refs.
+
+        With add_refs this builds a version without holding all of its
+        sections at once.
+        """
+        refs = [section_hash(s) for s in sections]
+        new = {}
+        with self._write_lock:
+            for ref, section in zip(refs, sections):
+                if ref not in new and self.blobs_repo.get(ref) is None:
+                    new[ref] = {"id": ref, "section": section}
+            self.blobs_repo.insert_many(new.values())
+            self._pins.update(refs)
+        return refs
+
+    def add_refs(self, fields: Dict[str, Any], refs: List[str]) -> Dict[str, Any]:
+        """Store a version from fields and refs returned by intern_sections.
+
+        The version only becomes visible here, after all its blobs exist.
+        Returns the version metadata (without sections).
+        """
+        row = {**fields, "sectionRefs": list(refs)}
+        with self._write_lock:
+            self.lectures_repo.insert(row)
+            self._pins.subtract(refs)
+            self._pins += Counter()  # drop refs that are no longer pinned
+        return self._public(row)
+
+    def add_version(self,
+                    old_lecture: Dict[str, Any],
+                    fields: Dict[str, Any],
+                    section_updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Store a new version that shares every section not in section_updates.
+
+        section_updates maps a section id to its replacement section dict.
+        Returns the rebuilt lecture for the new version.
+        """
+        old_row = self.lectures_repo.get(old_lecture["id"])
+        old_sections = self._sections(old_row)
+        refs = list(old_row["sectionRefs"])
+        with self._write_lock:
+            for i, section in enumerate(old_sections):
+                if section["id"] in section_updates:
+                    refs[i] = self._intern(section_updates[section["id"]])
+            row = {**self._public(old_row), **fields, "sectionRefs": refs}
+            self.lectures_repo.insert(row)
+        return self.get(row["id"])
+
+    def get(self, lecture_id: str) -> Optional[Dict[str, Any]]:
+        row, sections = self._load(lecture_id)
+        if row is None:
+            return None
+        lecture = self._public(row)
+        lecture["sections"] = sections
+        return lecture
+
+    def get_metadata(self, lecture_id: str) -> Optional[Dict[str, Any]]:
+        """Version row without sections (no blob or cold store reads)."""
+        row = self.lectures_repo.get(lecture_id) or self.archived_repo.get(lecture_id)
+        return self._public(row) if row is not None else None
+
+    def update(self, lecture: Dict[str, Any], **changes: Any) -> Dict[str, Any]:
+        """Change metadata fields (e.g. isCurrent); sections are immutable."""
+        row = self.lectures_repo.get(lecture["id"])
+        self.lectures_repo.update(row, **changes)
+        lecture.update(changes)
+        return lecture
+
+    def compare_and_update(self,
+                           lecture: Dict[str, Any],
+                           expected: Dict[str, Any],
+                           **changes: Any) -> bool:
+        """update() that only applies if the stored row has the expected values."""
+        row = self.lectures_repo.get(lecture["id"])
+        if row is None or not self.lectures_repo.compare_and_update(row, expected, **changes):
+            return False
+        lecture.update(changes)
+        return True
+
+    def find(self, **criteria: Any) -> List[Dict[str, Any]]:
+        """Metadata rows (without sections) matching the criteria, archived
+        versions first."""
+        hot = [self._public(row) for row in self.lectures_repo.find(**criteria)]
+        # Archived versions are never current
+        if criteria.get("isCurrent") is True or len(self.archived_repo) == 0:
+            return hot
+        hot_ids = {row["id"] for row in hot}
+        archived = [
+            dict(row) for row in self.archived_repo.find(**criteria)
+            if row["id"] not in hot_ids
+        ]
+        return archived + hot
+
+    def archive(self, lecture_ids: List[str]) -> Dict[str, int]:
+        """Move the given non-current versions to the cold store.
+
+        Each version is appended to the cold store (with its sections)
+        before it leaves lectures_repo, and its metadata is in
+        archived_repo before that, so readers always find it somewhere.
+        Current versions and unknown ids are skipped. Returns the number of
+        versions archived and of blobs dropped.
+        """
+        moved = []
+        with self._write_lock:
+            for lecture_id in lecture_ids:
+                row = self.lectures_repo.get(lecture_id)
+                if row is None or row["isCurrent"]:
+                    continue
+                self.cold.append(
+                    f"lecture:{lecture_id}", [{"row": row, "sections": self._sections(row)}]
+                )
+                self.archived_repo.insert(self._public(row))
+                self.lectures_repo.delete(row)
+                with self._cache_lock:
+                    self._sections_cache.pop(lecture_id, None)
+                moved.append(row)
+            candidates = {ref for row in moved for ref in row["sectionRefs"]}
+            if candidates:
+                candidates -= set(self._pins)
+                for row in self.lectures_repo.all():
+                    candidates.difference_update(row["sectionRefs"])
+            for ref in candidates:
+                self.blobs_repo.delete(self.blobs_repo.get(ref))
+        return {"versions": len(moved), "blobs": len(candidates)}
+
+    def restore_archived(self) -> int:
+        """List the versions archived to the attached cold store by an
+        earlier process again (only their metadata is kept in memory).
+
+        Only history of lectures whose current version is still hot, and
+        older than it, comes back: with the memory backend the versions
+        published after the archived ones don't survive a restart. Versions
+        that are back in lectures_repo stay hot. Returns how many were
+        listed."""
+        current = {
+            row["baseLectureId"]: row["version"]
+            for row in self.lectures_repo.find(isCurrent=True)
+        }
+        restored = set()
+        for record in self.cold.scan("lecture:"):
+            row = record["row"]
+            if (row["version"] < current.get(row["baseLectureId"], 0)
+                    and self.lectures_repo.get(row["id"]) is None):
+                self.archived_repo.insert(self._public(row))
+                restored.add(row["id"])
+        return len(restored)
+
+    def __len__(self) -> int:
+        return len(self.lectures_repo) + len(self.archived_repo)
@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Dict, Iterable
+
+REACTION_TYPES = ("typo", "confused", "calculation_error")
+
+
+def empty_counts() -> Dict[str, Any]:
+    return {
+        "total": 0,
+        "unaddressed": 0,
+        "byType": {t: 0 for t in REACTION_TYPES},
+        "unaddressedByType": {t: 0 for t in REACTION_TYPES},
+    }
+
+
+class ReactionCounters:
+    """Aggregate reaction counts maintained incrementally.
+
+    Keeps lectureId -> sectionId -> counts and lectureId -> counts, where
+    counts holds the total, the unaddressed total and both broken down by
+    reaction type. Each create/address event touches a constant number of
+    counters, so reads never have to walk the raw reactions.
+    """
+
+    def __init__(self, reactions: Iterable[Dict[str, Any]] = ()):
+        self._lectures: Dict[str, Dict[str, Any]] = {}
+        self._sections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Increments are read-modify-write, so they share one short lock
+        self._lock = threading.Lock()
+        for r in reactions:
+            self.record_created(r)
+
+    def _bump(self, reaction: Dict[str, Any], field: str, delta: int) -> None:
+        lecture_id = reaction.get("lectureId")
+        section_id = reaction.get("sectionId")
+        if not lecture_id or not section_id:
+            return
+        rtype = reaction.get("type")
+        lecture_counts = self._lectures.setdefault(lecture_id, empty_counts())
+        section_counts = self._sections.setdefault(lecture_id, {}).setdefault(
+            section_id, empty_counts()
+        )
+        by_type = "byType" if field == "total" else "unaddressedByType"
+        with self._lock:
+            for counts in (lecture_counts, section_counts):
+                counts[field] += delta
+                counts[by_type][rtype] = counts[by_type].get(rtype, 0) + delta
+
+    def record_created(self, reaction: Dict[str, Any]) -> None:
+        self._bump(reaction, "total", 1)
+        if not reaction.get("addressed"):
+            self._bump(reaction, "unaddressed", 1)
+
+    def record_addressed(self, reaction: Dict[str, Any]) -> None:
+        """Call once when a reaction flips from unaddressed to addressed."""
+        self._bump(reaction, "unaddressed", -1)
+
+    def lecture_counts(self, lecture_id: str) -> Dict[str, Any]:
+        return self._lectures.get(lecture_id) or empty_counts()
+
+    def section_counts(self, lecture_id: str) -> Dict[str, Dict[str, Any]]:
+        return self._sections.get(lecture_id, {})
+
+    def lecture_ids(self):
+        return self._lectures.keys()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"lectures": self._lectures, "sections": self._sections}
+
+    @classmethod
+    def rebuild(cls, reactions: Iterable[Dict[str, Any]]) -> "ReactionCounters":
+        return cls(reactions)
@@ -0,0 +1,94 @@
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+from utils.time_utils import epoch_seconds, parse_iso
+
+# resolution -> (bucket width in seconds, buckets kept per lecture)
+RESOLUTIONS = {
+    "minute": (60, 24 * 60),    # one day of per-minute buckets
+    "hour": (3600, 30 * 24),    # thirty days of per-hour buckets
+}
+
+# One bucket: sectionId -> reaction type -> count
+Bucket = Dict[str, Dict[str, int]]
+
+
+class ReactionTimeline:
+    """Per-lecture reaction counts in rolling per-minute and per-hour buckets.
+
+    Each lecture has one fixed-size ring of buckets per resolution; a
+    bucket lives in slot (start // width) % size and is recycled when a
+    newer bucket needs the slot, so memory per lecture is bounded and a
+    reaction older than a ring's span is only counted in the coarser ring.
+    Recording touches one bucket per resolution, and a window query reads
+    at most one ring's worth of buckets, so neither depends on how many
+    reactions have been stored.
+    """
+
+    def __init__(self, reactions: Iterable[Dict[str, Any]] = ()):
+        # resolution -> lectureId -> slot -> (bucket start, bucket)
+        self._rings: Dict[str, Dict[str, Dict[int, Tuple[int, Bucket]]]] = {
+            resolution: {} for resolution in RESOLUTIONS
+        }
+        self._lock = threading.Lock()
+        for r in reactions:
+            self.record_created(r)
+
+    def record_created(self, reaction: Dict[str, Any]) -> None:
+        lecture_id = reaction.get("lectureId")
+        section_id = reaction.get("sectionId")
+        if not lecture_id or not section_id:
+            return
+        try:
+            created = epoch_seconds(parse_iso(reaction.get("createdAt")))
+        except ValueError:
+            return
+        rtype = reaction.get("type")
+        with self._lock:
+            for resolution, (width, size) in RESOLUTIONS.items():
+                start = created - created % width
+                ring = self._rings[resolution].setdefault(lecture_id, {})
+                slot = (start // width) % size
+                entry = ring.get(slot)
+                if entry is None or entry[0] < start:
+                    entry = ring[slot] = (start, {})
+                elif entry[0] > start:
+                    continue  # the slot already moved on past this bucket
+                counts = entry[1].setdefault(section_id, {})
+                counts[rtype] = counts.get(rtype, 0) + 1
+
+    def buckets(self,
+                lecture_id: str,
+                resolution: str,
+                start: int,
+                end: int) -> List[Tuple[int, Bucket]]:
+        """Non-empty buckets of a lecture starting in [start, end), oldest
+        first, as (bucket start in epoch seconds, counts) with copied counts."""
+        width, size = RESOLUTIONS[resolution]
+        first = start - start % width
+        if end <= first:
+            return []
+        last = (end - 1) - (end - 1) % width
+        # A ring never holds more than `size` buckets, so read at most that many
+        first = max(first, last - (size - 1) * width)
+        with self._lock:
+            ring = self._rings[resolution].get(lecture_id)
+            if not ring:
+                return []
+            if (last - first) // width + 1 > len(ring):
+                entries = [e for e in ring.values() if first <= e[0] <= last]
+                entries.sort(key=lambda e: e[0])
+            else:
+                entries = []
+                for bucket_start in range(first, last + 1, width):
+                    entry = ring.get((bucket_start // width) % size)
+                    if entry is not None and entry[0] == bucket_start:
+                        entries.append(entry)
+            return [
+                (bucket_start, {s: dict(c) for s, c in bucket.items()})
+                for bucket_start, bucket in entries
+            ]
+
+    @classmethod
+    def rebuild(cls, reactions: Iterable[Dict[str, Any]]) -> "ReactionTimeline":
+        return cls(reactions)
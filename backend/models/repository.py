@@ -0,0 +1,139 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class IndexedRepository:
+    """In-memory table of dict rows with hash indexes on selected fields.
+
+    Rows are stored in insertion order. Every indexed field maps
+    value -> {row key -> row}, so lookups by any indexed field are O(1)
+    plus the size of the result instead of a scan over every row.
+    All writes must go through insert/update/delete so the indexes stay
+    consistent with the rows.
+
+    Thread safety: insert is lock-free (each step is a single dict
+    operation, atomic under the GIL, and index buckets are never removed,
+    so a concurrent insert can't land in a detached bucket). update,
+    compare_and_update and delete take the repository lock. Readers copy a
+    bucket before filtering it.
+    """
+
+    def __init__(self,
+                 rows: Iterable[Dict[str, Any]] = (),
+                 indexed_fields: Tuple[str, ...] = ()):
+        self._indexed_fields = tuple(indexed_fields)
+        self._rows: Dict[Any, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[Any, Dict[Any, Dict[str, Any]]]] = {
+            field: {} for field in self._indexed_fields
+        }
+        self._lock = threading.RLock()
+        for row in rows:
+            self.insert(row)
+
+    @staticmethod
+    def _key(row: Dict[str, Any]) -> Any:
+        # Rows without an "id" (e.g. enrollments) are keyed by identity.
+        return row.get("id") or id(row)
+
+    def _index(self, key: Any, row: Dict[str, Any]) -> None:
+        for field in self._indexed_fields:
+            self._indexes[field].setdefault(row.get(field), {})[key] = row
+
+    def _unindex(self, key: Any, row: Dict[str, Any], fields: Iterable[str]) -> None:
+        for field in fields:
+            bucket = self._indexes[field].get(row.get(field))
+            if bucket is None:
+                continue
+            bucket.pop(key, None)
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(row)
+        self._rows[key] = row
+        if "id" in row:
+            self._by_id[row["id"]] = row
+        self._index(key, row)
+        return row
+
+    def insert_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.insert(row) for row in rows]
+
+    def update(self, row: Dict[str, Any], **changes: Any) -> Dict[str, Any]:
+        """Apply changes to a stored row in place and re-index changed fields."""
+        with self._lock:
+            key = self._key(row)
+            stored = self._rows.get(key, row)
+            moved = [f for f in self._indexed_fields
+                     if f in changes and changes[f] != stored.get(f)]
+            self._unindex(key, stored, moved)
+            stored.update(changes)
+            if row is not stored:
+                row.update(changes)
+            for field in moved:
+                self._indexes[field].setdefault(stored.get(field), {})[key] = stored
+            return stored
+
+    def compare_and_update(self,
+                           row: Dict[str, Any],
+                           expected: Dict[str, Any],
+                           **changes: Any) -> bool:
+        """Apply changes only if the stored row still has the expected values.
+
+        Returns False (and changes nothing) when another writer got there
+        first; this is the optimistic check used by publish/approve/reject.
+        """
+        with self._lock:
+            stored = self._rows.get(self._key(row))
+            if stored is None or any(stored.get(f) != v for f, v in expected.items()):
+                return False
+            self.update(row, **changes)
+            return True
+
+    def delete(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            key = self._key(row)
+            stored = self._rows.pop(key, None)
+            if stored is None:
+                return
+            if "id" in stored:
+                self._by_id.pop(stored["id"], None)
+            self._unindex(key, stored, self._indexed_fields)
+
+    def get(self, row_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(row_id)
+
+    def find(self, **criteria: Any) -> List[Dict[str, Any]]:
+        """Return rows matching every field=value pair, in insertion order.
+
+        The smallest matching index bucket is used as the candidate set and
+        the remaining criteria are checked against it.
+        """
+        if not criteria:
+            return self.all()
+        candidates: Optional[Dict[Any, Dict[str, Any]]] = None
+        for field, value in criteria.items():
+            if field in self._indexes:
+                bucket = self._indexes[field].get(value, {})
+                if candidates is None or len(bucket) < len(candidates):
+                    candidates = bucket
+        # list() copies the bucket in one step so concurrent inserts are safe
+        rows = list(candidates.values() if candidates is not None else self._rows.values())
+        return [
+            r for r in rows
+            if all(r.get(f) == v for f, v in criteria.items())
+        ]
+
+    def values(self, field: str, **criteria: Any) -> List[Any]:
+        """Distinct values of an indexed field, optionally restricted by criteria."""
+        if not criteria:
+            return [value for value, bucket in list(self._indexes[field].items()) if bucket]
+        seen: Dict[Any, None] = {}
+        for r in self.find(**criteria):
+            seen.setdefault(r.get(field))
+        return list(seen)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._rows.values())
+
+    def __len__(self) -> int:
+        return len(self._rows)
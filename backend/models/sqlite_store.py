@@ -0,0 +1,322 @@
+import fcntl
+import json
+import sqlite3
+import threading
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+from models.reaction_counters import empty_counts
+
+# Lock files held by this process, by database path (see claim_database)
+_claims: Dict[str, IO] = {}
+
+
+def claim_database(path: str) -> None:
+    """Take an exclusive lock on path + ".lock" for this process.
+
+    The rows live in SQLite, but the change feed, SSE push, reaction
+    timeline and batch idempotency keys are kept in the serving process,
+    so a second worker would hand out its own cursors and miss the
+    other's events. Raises RuntimeError if another process holds the lock;
+    claiming again from the same process is a no-op.
+    """
+    if path in _claims:
+        return
+    lock_file = open(path + ".lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(
+            f"{path} is already served by another process; run a single worker "
+            "(the change feed, SSE push and idempotency keys are per process)"
+        ) from None
+    _claims[path] = lock_file
+
+
+class SQLiteDatabase:
+    """Shared SQLite file with one connection per thread.
+
+    The database runs in WAL mode so readers in other threads are not
+    blocked by the writer. Repositories that buffer
+    writes register themselves here and a background thread flushes them
+    every flush_interval seconds.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._buffered: List["SQLiteRepository"] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        conn = self.connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=30,
+                isolation_level=None,  # transactions are managed explicitly
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def register_buffered(self, repo: "SQLiteRepository") -> None:
+        self._buffered.append(repo)
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        for repo in self._buffered:
+            repo.flush()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+
+
+class SQLiteRepository:
+    """SQLite-backed table with the same interface as IndexedRepository.
+
+    Each row is stored as a JSON document next to a few extracted columns
+    that carry the SQL indexes. When batch_size > 1, inserts are buffered
+    and committed together in one transaction (grouped commit) once the
+    buffer fills up, the flush interval passes, or a read needs them.
+    """
+
+    def __init__(self,
+                 db: SQLiteDatabase,
+                 table: str,
+                 columns: Tuple[str, ...] = (),
+                 indexes: Iterable[Tuple[str, ...]] = (),
+                 key_fields: Tuple[str, ...] = ("id",),
+                 batch_size: int = 1):
+        self._db = db
+        self._table = table
+        self._columns = tuple(columns)
+        self._key_fields = tuple(key_fields)
+        self._batch_size = batch_size
+        self._pending: List[Tuple[Any, ...]] = []
+        self._lock = threading.Lock()
+        self._sql: Dict[Any, str] = {}
+
+        column_defs = "".join(f", {c}" for c in self._columns)
+        conn = db.connection()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(key TEXT PRIMARY KEY, data TEXT NOT NULL{column_defs})"
+        )
+        for cols in indexes:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(cols)} "
+                f"ON {table} ({', '.join(cols)})"
+            )
+
+        placeholders = ", ".join("?" * (len(self._columns) + 2))
+        self._insert_sql = (
+            f"INSERT OR REPLACE INTO {table} "
+            f"(key, data{column_defs}) VALUES ({placeholders})"
+        )
+        assignments = "".join(f", {c} = ?" for c in self._columns)
+        self._update_sql = f"UPDATE {table} SET data = ?{assignments} WHERE key = ?"
+        self._delete_sql = f"DELETE FROM {table} WHERE key = ?"
+        self._get_sql = f"SELECT data FROM {table} WHERE key = ?"
+        if batch_size > 1:
+            db.register_buffered(self)
+
+    def _key(self, row: Dict[str, Any]) -> str:
+        return ":".join(str(row.get(f)) for f in self._key_fields)
+
+    def _params(self, row: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (json.dumps(row),) + tuple(row.get(c) for c in self._columns)
+
+    def _select_sql(self, fields: Tuple[str, ...], select: str = "data") -> str:
+        # Statements are memoised per criteria shape so sqlite3's statement
+        # cache can reuse the compiled (prepared) statement.
+        sql = self._sql.get((select, fields))
+        if sql is None:
+            where = " AND ".join(f"{f} = ?" for f in fields)
+            sql = f"SELECT {select} FROM {self._table}"
+            if where:
+                sql += f" WHERE {where}"
+            if select == "data":
+                sql += " ORDER BY rowid"
+            self._sql[(select, fields)] = sql
+        return sql
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            conn = self._db.connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(self._insert_sql, pending)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        params = (self._key(row),) + self._params(row)
+        if self._batch_size > 1:
+            with self._lock:
+                self._pending.append(params)
+                full = len(self._pending) >= self._batch_size
+            if full:
+                self.flush()
+        else:
+            self._db.connection().execute(self._insert_sql, params)
+        return row
+
+    def insert_many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = list(rows)
+        self.flush()
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                self._insert_sql,
+                [(self._key(r),) + self._params(r) for r in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def update(self, row: Dict[str, Any], **changes: Any) -> Dict[str, Any]:
+        self.flush()
+        key = self._key(row)
+        row.update(changes)
+        self._db.connection().execute(self._update_sql, self._params(row) + (key,))
+        return row
+
+    def compare_and_update(self,
+                           row: Dict[str, Any],
+                           expected: Dict[str, Any],
+                           **changes: Any) -> bool:
+        """Conditional UPDATE on the indexed columns; safe across processes."""
+        self.flush()
+        fields = tuple(expected)
+        sql = self._sql.get(("cas", fields))
+        if sql is None:
+            sql = self._update_sql + "".join(f" AND {f} = ?" for f in fields)
+            self._sql[("cas", fields)] = sql
+        new_row = {**row, **changes}
+        cursor = self._db.connection().execute(
+            sql,
+            self._params(new_row) + (self._key(row),) + tuple(expected[f] for f in fields),
+        )
+        if cursor.rowcount != 1:
+            return False
+        row.update(changes)
+        return True
+
+    def delete(self, row: Dict[str, Any]) -> None:
+        self.flush()
+        self._db.connection().execute(self._delete_sql, (self._key(row),))
+
+    def get(self, row_id: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        found = self._db.connection().execute(self._get_sql, (row_id,)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def find(self, **criteria: Any) -> List[Dict[str, Any]]:
+        self.flush()
+        sql_fields = tuple(f for f in criteria if f in self._columns)
+        sql = self._select_sql(sql_fields)
+        cursor = self._db.connection().execute(sql, [criteria[f] for f in sql_fields])
+        rows = [json.loads(data) for (data,) in cursor]
+        rest = {f: v for f, v in criteria.items() if f not in self._columns}
+        if rest:
+            rows = [r for r in rows if all(r.get(f) == v for f, v in rest.items())]
+        return rows
+
+    def values(self, field: str, **criteria: Any) -> List[Any]:
+        self.flush()
+        fields = tuple(criteria)
+        sql = self._select_sql(fields, select=f"DISTINCT {field}")
+        cursor = self._db.connection().execute(sql, [criteria[f] for f in fields])
+        return [value for (value,) in cursor]
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self.find()
+
+    def __len__(self) -> int:
+        self.flush()
+        sql = self._select_sql((), select="COUNT(*)")
+        return self._db.connection().execute(sql).fetchone()[0]
+
+
+class SQLiteReactionCounters:
+    """ReactionCounters computed with grouped queries on the reactions table.
+
+    Counts are derived from the (lectureId, sectionId, type, addressed)
+    index instead of being kept in process memory, so every worker process
+    sees the same numbers. The record_* hooks only need to make sure
+    buffered reactions are visible.
+    """
+
+    def __init__(self, reactions_repo: SQLiteRepository):
+        self._repo = reactions_repo
+
+    def record_created(self, reaction: Dict[str, Any]) -> None:
+        pass
+
+    def record_addressed(self, reaction: Dict[str, Any]) -> None:
+        pass
+
+    def _grouped(self, lecture_id: Optional[str] = None):
+        self._repo.flush()
+        sql = (
+            "SELECT lectureId, sectionId, type, addressed, COUNT(*) FROM reactions"
+            + (" WHERE lectureId = ?" if lecture_id is not None else "")
+            + " GROUP BY lectureId, sectionId, type, addressed"
+        )
+        params = (lecture_id,) if lecture_id is not None else ()
+        return self._repo._db.connection().execute(sql, params)
+
+    def _aggregate(self, lecture_id: Optional[str] = None):
+        lectures: Dict[str, Dict[str, Any]] = {}
+        sections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for lec_id, sec_id, rtype, addressed, n in self._grouped(lecture_id):
+            if not lec_id or not sec_id:
+                continue
+            targets = (
+                lectures.setdefault(lec_id, empty_counts()),
+                sections.setdefault(lec_id, {}).setdefault(sec_id, empty_counts()),
+            )
+            for counts in targets:
+                counts["total"] += n
+                counts["byType"][rtype] = counts["byType"].get(rtype, 0) + n
+                if not addressed:
+                    counts["unaddressed"] += n
+                    counts["unaddressedByType"][rtype] = (
+                        counts["unaddressedByType"].get(rtype, 0) + n
+                    )
+        return lectures, sections
+
+    def lecture_counts(self, lecture_id: str) -> Dict[str, Any]:
+        return self._aggregate(lecture_id)[0].get(lecture_id) or empty_counts()
+
+    def section_counts(self, lecture_id: str) -> Dict[str, Dict[str, Any]]:
+        return self._aggregate(lecture_id)[1].get(lecture_id, {})
+
+    def lecture_ids(self):
+        return [lec_id for lec_id in self._repo.values("lectureId") if lec_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        lectures, sections = self._aggregate()
+        return {"lectures": lectures, "sections": sections}
@@ -1,11 +1,40 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 
-from services.suggestions_service import generate_suggestions_for_lecture, count_comments_by_lecture_and_section
+from services import suggestions_service
+from services.suggestions_service import (
+    generate_suggestions_for_lecture,
+    stream_suggestions_for_lecture,
+    count_comments_by_section,
+)
 from services.lectures_service import get_section, get_lecture
+from services.ai_gateway import GatewaySaturated, ModelUnavailable, get_gateway
+from services.pregeneration_service import get_pregeneration_stats
+from services.jobs_service import JobQueueFull, submit_suggestion_job, get_job, cancel_job
+from utils.sse import format_sse
 
 ai_bp = Blueprint("ai", __name__)
 
 
+def _sections_with_comments(lecture):
+    section_counts = count_comments_by_section(lecture["id"])
+    return [
+        sec for sec in (get_section(lecture, sid) for sid in section_counts)
+        if sec
+    ]
+
+
+def _saturated_response(e):
+    """429 telling the client where it would have queued and when to retry."""
+    response = jsonify({
+        "error": "Too many suggestion requests, try again later",
+        "queuePosition": e.queue_position,
+        "retryAfter": e.retry_after,
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(int(e.retry_after))
+    return response
+
+
 # Not in the original list, but this is where you plug Claude:
 # body: { "lectureId": "lec1-v1" }
 @ai_bp.post("/ai/generate-suggestions")
@@ -17,10 +46,86 @@ def generate_suggestions():
 
     if not lecture:
         return jsonify({"error": "Lecture not found"}), 404
-    
-    map = count_comments_by_lecture_and_section()
 
-    sections = map[lecture_id].keys()
-    
-    created = generate_suggestions_for_lecture(lecture, sections)
-    return jsonify({"createdSuggestions": created})
\ No newline at end of file
+    sections = _sections_with_comments(lecture)
+
+    try:
+        created = generate_suggestions_for_lecture(lecture, sections)
+    except GatewaySaturated as e:
+        return _saturated_response(e)
+    except ModelUnavailable:
+        return jsonify({"error": "The model is unavailable, try again later"}), 503
+    return jsonify({"createdSuggestions": created})
+
+
+# Streaming version: each suggestion is sent as an SSE "suggestion" event
+# as soon as the model finishes writing it, then a "done" (or "error") event.
+# body: { "lectureId": "lec1-v1" }
+@ai_bp.post("/ai/generate-suggestions/stream")
+def generate_suggestions_stream():
+    data = request.get_json(force=True)
+    lecture = get_lecture(data.get("lectureId"))
+    if not lecture:
+        return jsonify({"error": "Lecture not found"}), 404
+
+    sections = _sections_with_comments(lecture)
+
+    def events():
+        for event, payload in stream_suggestions_for_lecture(lecture, sections):
+            yield format_sse(event, payload)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Background version of generate-suggestions; poll the returned job id.
+# body: { "lectureId": "lec1-v1" }
+@ai_bp.post("/ai/suggestion-jobs")
+def create_suggestion_job():
+    data = request.get_json(force=True)
+    lecture = get_lecture(data.get("lectureId"))
+    if not lecture:
+        return jsonify({"error": "Lecture not found"}), 404
+
+    try:
+        job, created = submit_suggestion_job(lecture, _sections_with_comments(lecture))
+    except JobQueueFull:
+        return jsonify({"error": "Too many suggestion jobs pending, try again later"}), 503
+
+    return jsonify({"job": job, "deduplicated": not created}), 202
+
+
+@ai_bp.get("/ai/suggestion-jobs/<job_id>")
+def get_suggestion_job(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job})
+
+
+@ai_bp.delete("/ai/suggestion-jobs/<job_id>")
+def cancel_suggestion_job(job_id):
+    job = cancel_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job})
+
+
+@ai_bp.get("/ai/cache-stats")
+def get_cache_stats():
+    return jsonify(suggestions_service.revisions_cache.stats())
+
+
+# Running / waiting model calls and the gateway limits
+@ai_bp.get("/ai/gateway-stats")
+def get_gateway_stats():
+    return jsonify(get_gateway().stats())
+
+
+# Background pre-generation: pending lectures and calls used this hour
+@ai_bp.get("/ai/pregeneration-stats")
+def get_pregeneration_stats_route():
+    return jsonify(get_pregeneration_stats())
@@ -1,4 +1,7 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+
+from services.retention_service import get_retention_stats
+from utils import metrics
 
 health_bp = Blueprint("health", __name__)
 
@@ -6,3 +9,18 @@ health_bp = Blueprint("health", __name__)
 @health_bp.get("/")
 def health():
     return jsonify({"status": "ok", "message": "Lecture feedback API running"})
+
+
+# Prometheus scrape endpoint (only when METRICS_ENABLED is set)
+@health_bp.get("/metrics")
+def get_metrics():
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.registry.render(),
+                    content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Cold store size and the hot-set memory before/after the last compaction
+@health_bp.get("/retention-stats")
+def retention_stats():
+    return jsonify(get_retention_stats())
@@ -1,17 +1,86 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 
-from services.lectures_service import get_lecture, create_base_lecture
+from services.lecture_diff_service import UnrelatedLectureVersions
+from services.lectures_service import (
+    create_base_lecture,
+    get_lecture_delta_response,
+    get_lecture_response,
+    get_lecture_status,
+    import_lecture,
+)
+from utils.sse import format_sse
 
 lectures_bp = Blueprint("lectures", __name__)
 
+# A version's body never changes, so clients and proxies may keep it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Bytes read from an uploaded file at a time by the streaming import
+IMPORT_CHUNK_BYTES = 64 * 1024
+
 
 # getLecContent —> get lecture with ID
+# The body is pre-encoded and cached per version (strong ETag, 304s, gzip).
+# isCurrent is not in it, nor in any header of this immutable response: it
+# is served by GET /lectures/<id>/status, which is never cached.
 @lectures_bp.get("/lectures/<lecture_id>")
 def get_lecture_content(lecture_id):
-    lecture = get_lecture(lecture_id)
-    if not lecture:
+    encoded = get_lecture_response(lecture_id)
+    if not encoded:
+        return jsonify({"error": "Lecture not found"}), 404
+
+    return _encoded_response(encoded)
+
+
+def _encoded_response(encoded):
+    """Immutable pre-encoded body with its ETag, gzip and 304 handling.
+
+    Only headers that can never change for this body belong here.
+    """
+    use_gzip = encoded.compressible and "gzip" in request.accept_encodings
+    # The gzip bytes are a different representation, so they get their own tag
+    etag = encoded.etag + "-gz" if use_gzip else encoded.etag
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+    else:
+        body = encoded.gzipped() if use_gzip else encoded.body
+        response = Response(body, mimetype="application/json", headers=headers)
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    return response
+
+
+# getLecDelta —> only the sections that changed since the version the client
+# already has (?since=<lecture version id>), cached per pair of versions
+@lectures_bp.get("/lectures/<lecture_id>/delta")
+def get_lecture_content_delta(lecture_id):
+    since_id = request.args.get("since")
+    if not since_id:
+        return jsonify({"error": "Missing since"}), 400
+    try:
+        encoded = get_lecture_delta_response(since_id, lecture_id)
+    except UnrelatedLectureVersions:
+        return jsonify({"error": "Versions belong to different lectures"}), 400
+    if not encoded:
+        return jsonify({"error": "Lecture not found"}), 404
+
+    return _encoded_response(encoded)
+
+
+# Mutable state of a version (is it still current, and which one is)
+@lectures_bp.get("/lectures/<lecture_id>/status")
+def get_lecture_content_status(lecture_id):
+    status = get_lecture_status(lecture_id)
+    if not status:
         return jsonify({"error": "Lecture not found"}), 404
-    return jsonify(lecture)
+    response = jsonify(status)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 # OPTIONAL: upload/create new lecture (version 1) – useful for teacher UI.
@@ -29,3 +98,46 @@ def create_lecture():
 
     lecture = create_base_lecture(title, sections, teacher_id, course_id)
     return jsonify(lecture), 201
+
+
+# importLecture —> create a lecture from a large markdown/plain-text file.
+# The file is the raw request body, or the "file" part of a multipart form;
+# title, teacherId and courseId come from the query string (or form).
+# Responds with SSE: "progress" events while sections are written, then a
+# "lecture" event with the new version (or an "error" event).
+@lectures_bp.post("/lectures/import")
+def import_lecture_file():
+    upload = request.files.get("file")
+    params = request.form if upload else request.args
+    title = params.get("title")
+    teacher_id = params.get("teacherId")
+    course_id = params.get("courseId")
+    if not title or not teacher_id or not course_id:
+        return jsonify({"error": "Missing fields"}), 400
+    try:
+        max_section_chars = int(params["maxSectionChars"]) if "maxSectionChars" in params else None
+    except ValueError:
+        return jsonify({"error": "Invalid maxSectionChars"}), 400
+    if max_section_chars is not None and max_section_chars < 1:
+        return jsonify({"error": "Invalid maxSectionChars"}), 400
+
+    stream = upload.stream if upload else request.stream
+
+    def chunks():
+        while True:
+            chunk = stream.read(IMPORT_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+    def events():
+        for event, payload in import_lecture(
+            chunks(), title, teacher_id, course_id, max_section_chars
+        ):
+            yield format_sse(event, payload)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
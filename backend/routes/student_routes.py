@@ -1,11 +1,18 @@
 from flask import Blueprint, request, jsonify
 
-from models.data_store import courses, enrollments, lectures
-from services.lectures_service import get_lecture, get_section
+from services.courses_service import get_course_ids_for_user
+from services.lectures_service import (
+    get_lecture,
+    get_section,
+    get_current_lectures_for_courses,
+)
 from services.reactions_service import (
     get_reactions_by_user_and_lecture,
     create_reaction,
+    create_reactions_batch,
+    IdempotencyKeyReused,
 )
+from services import reactions_service
 
 student_bp = Blueprint("student", __name__)
 
@@ -13,9 +20,7 @@ student_bp = Blueprint("student", __name__)
 # getLecture —> gets most recent lecture (current versions) for student
 @student_bp.get("/student/<user_id>/lectures/recent")
 def get_recent_lectures(user_id):
-    enrolled_courses = {
-        e["courseId"] for e in enrollments if e["userId"] == user_id
-    }
+    enrolled_courses = get_course_ids_for_user(user_id)
 
     current_lectures = [
         {
@@ -25,8 +30,7 @@ def get_recent_lectures(user_id):
             "version": lec["version"],
             "courseId": lec["courseId"],
         }
-        for lec in lectures
-        if lec["courseId"] in enrolled_courses and lec["isCurrent"]
+        for lec in get_current_lectures_for_courses(enrolled_courses)
     ]
     return jsonify(current_lectures)
 
@@ -65,3 +69,40 @@ def send_reaction():
 
     reaction = create_reaction(user_id, lecture_id, section_id, rtype, comment)
     return jsonify(reaction), 201
+
+
+# sendReactionBatch —> many buffered reactions in one request.
+# body: { "reactions": [{userId, lectureId, sectionId, type, comment, createdAt?}, ...] }
+# An Idempotency-Key header (or "idempotencyKey" in the body) makes retries
+# of the same batch return the first result instead of storing it twice.
+# 201 when every item was stored, 207 when some failed, 400 when none did.
+@student_bp.post("/reactions/batch")
+def send_reaction_batch():
+    data = request.get_json(force=True)
+    items = data.get("reactions") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "reactions must be a non-empty list"}), 400
+    if len(items) > reactions_service.BATCH_MAX_ITEMS:
+        return jsonify({
+            "error": f"At most {reactions_service.BATCH_MAX_ITEMS} reactions per batch"
+        }), 413
+
+    key = request.headers.get("Idempotency-Key") or data.get("idempotencyKey")
+    if key is not None and (not isinstance(key, str) or not key):
+        return jsonify({"error": "idempotencyKey must be a non-empty string"}), 400
+    try:
+        result, replayed = create_reactions_batch(items, key)
+    except IdempotencyKeyReused:
+        return jsonify({"error": "Idempotency key was already used for a different batch"}), 422
+
+    if not result["errors"]:
+        status = 201
+    elif result["created"]:
+        status = 207
+    else:
+        status = 400
+    response = jsonify(result)
+    response.status_code = status
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
@@ -1,13 +1,34 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 
-from models.data_store import lectures, approved_section_updates
-from services.lectures_service import get_lecture, create_new_lecture_version_with_multiple_sections
+from services.lectures_service import (
+    get_lecture,
+    get_lecture_status,
+    get_lectures_for_teacher,
+    create_new_lecture_version_with_multiple_sections,
+    lecture_lock,
+    StaleLectureVersion,
+)
 from services.reactions_service import (
     get_reactions_for_lecture,
+    get_reaction_counts_for_lecture,
+    get_feedback_timeline,
     mark_reactions_addressed_for_section,
 )
-from services.suggestions_service import get_suggestion_by_id
-from models.data_store import suggestions  # to keep list in sync
+from services.changes_service import get_changes_since
+from services.lecture_diff_service import get_lecture_diff, UnrelatedLectureVersions
+from services.events_service import subscribe_to_lecture
+from services.feedback_clustering import get_feedback_clusters_for_lecture
+from services.suggestions_service import (
+    get_suggestion_by_id,
+    get_suggestions_for_lecture,
+    update_suggestion,
+    transition_suggestion,
+    queue_approved_update,
+    get_approved_updates_for_lecture,
+    remove_approved_updates,
+    remove_approved_update_for_suggestion,
+    has_approved_update,
+)
 
 teacher_bp = Blueprint("teacher", __name__)
 
@@ -24,8 +45,7 @@ def get_lecture_all(teacher_id):
             "title": lec["title"],
             "courseId": lec["courseId"],
         }
-        for lec in lectures
-        if lec["teacherId"] == teacher_id
+        for lec in get_lectures_for_teacher(teacher_id)
     ]
     return jsonify(teacher_lectures)
 
@@ -38,14 +58,114 @@ def get_comments_by_lecture_teacher(teacher_id, lecture_id):
         return jsonify({"error": "Lecture not found for this teacher"}), 404
 
     lecture_reactions = get_reactions_for_lecture(lecture_id)
-    lecture_suggestions = [
-        s for s in suggestions if s["lectureId"] == lecture_id
-    ]
+    lecture_suggestions = get_suggestions_for_lecture(lecture_id)
     return jsonify(
         {"reactions": lecture_reactions, "suggestions": lecture_suggestions}
     )
 
 
+# getChangesSince —> only reactions/suggestions that changed after ?since=<cursor>
+# (omit since for the first page); pass the returned cursor on the next poll
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/changes")
+def get_lecture_changes(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    try:
+        limit = int(request.args.get("limit", 100))
+        changes = get_changes_since(lecture_id, request.args.get("since"), limit)
+    except ValueError:
+        return jsonify({"error": "Invalid since cursor or limit"}), 400
+
+    return jsonify(changes)
+
+
+# streamLectureEvents —> SSE push of new reactions and suggestion changes.
+# Each event's id is a changes-feed cursor; an "overflow" event means some
+# events were dropped and the client should resync via /changes.
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/events")
+def stream_lecture_events(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    return Response(
+        stream_with_context(subscribe_to_lecture(lecture_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# getLectureDiff —> changed/added/removed sections and word-level diffs from
+# ?from=<version id> (default: the previous version) to this version
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/diff")
+def get_lecture_version_diff(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    from_id = request.args.get("from") or f"{lecture['baseLectureId']}-v{lecture['version'] - 1}"
+    try:
+        diff = get_lecture_diff(from_id, lecture_id)
+    except UnrelatedLectureVersions:
+        return jsonify({"error": "Versions belong to different lectures"}), 400
+    if diff is None:
+        return jsonify({"error": "Version to compare against not found"}), 404
+
+    return jsonify(diff)
+
+
+# getReactionCounts —> per-section reaction counts by type and addressed state
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/reaction-counts")
+def get_reaction_counts(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    return jsonify(get_reaction_counts_for_lecture(lecture_id))
+
+
+# getFeedbackTimeline —> reactions per time bucket and section, plus the top
+# sections for one reaction type. Query: from/to (ISO timestamps, default the
+# last hour), resolution (minute|hour, picked from the window if omitted),
+# top (default 5), type (reaction type to rank by, default confused)
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/feedback-timeline")
+def get_feedback_timeline_for_lecture(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    try:
+        timeline = get_feedback_timeline(
+            lecture_id,
+            start=request.args.get("from"),
+            end=request.args.get("to"),
+            resolution=request.args.get("resolution"),
+            top=int(request.args.get("top", 5)),
+            rank_type=request.args.get("type", "confused"),
+        )
+    except ValueError as exc:
+        return jsonify({"error": f"Invalid timeline query: {exc}"}), 400
+
+    return jsonify(timeline)
+
+
+# getFeedbackClusters —> near-duplicate comments grouped per section and type
+# ?includeAddressed=true also clusters feedback that was already addressed
+@teacher_bp.get("/teacher/<teacher_id>/lectures/<lecture_id>/feedback-clusters")
+def get_feedback_clusters(teacher_id, lecture_id):
+    lecture = get_lecture(lecture_id)
+    if not lecture or lecture["teacherId"] != teacher_id:
+        return jsonify({"error": "Lecture not found for this teacher"}), 404
+
+    include_addressed = request.args.get("includeAddressed") == "true"
+    return jsonify({
+        "lectureId": lecture_id,
+        "sections": get_feedback_clusters_for_lecture(lecture_id, include_addressed),
+    })
+
+
 # approveSuggestion —> add to approved list (don't create lecture yet)
 @teacher_bp.post("/teacher/suggestions/<suggestion_id>/approve")
 def approve_suggestion(suggestion_id):
@@ -57,17 +177,17 @@ def approve_suggestion(suggestion_id):
     if not lecture:
         return jsonify({"error": "Lecture not found"}), 404
 
-    # Add to approved section updates list
-    approved_update = {
-        "lectureId": suggestion["lectureId"],
-        "sectionId": suggestion["sectionId"],
-        "suggestedText": suggestion["suggestedText"],
-        "suggestionId": suggestion_id,
-    }
-    approved_section_updates.append(approved_update)
+    with lecture_lock(lecture):
+        # A suggestion for a superseded version could never be published
+        if not get_lecture_status(suggestion["lectureId"])["isCurrent"]:
+            return jsonify({"error": "Suggestion is for a superseded lecture version"}), 409
+
+        # update suggestion record; only a pending suggestion can be approved
+        if not transition_suggestion(suggestion, ("pending",), status="accepted"):
+            return jsonify({"error": "Suggestion is no longer pending"}), 409
 
-    # update suggestion record
-    suggestion["status"] = "accepted"
+        # Add to approved section updates list
+        queue_approved_update(suggestion)
 
     return jsonify({"suggestion": suggestion, "message": "Suggestion approved and queued for publishing"})
 
@@ -83,10 +203,16 @@ def reject_suggestion(suggestion_id):
     if not lecture:
         return jsonify({"error": "Lecture not found"}), 404
 
-    suggestion["status"] = "rejected"
-    mark_reactions_addressed_for_section(
-        suggestion["lectureId"], suggestion["sectionId"]
-    )
+    with lecture_lock(lecture):
+        # An approved-but-unpublished suggestion can still be rejected
+        queued = has_approved_update(suggestion_id)
+        from_statuses = ("pending", "accepted") if queued else ("pending",)
+        if not transition_suggestion(suggestion, from_statuses, status="rejected"):
+            return jsonify({"error": "Suggestion was already rejected or published"}), 409
+        remove_approved_update_for_suggestion(suggestion_id)
+        mark_reactions_addressed_for_section(
+            suggestion["lectureId"], suggestion["sectionId"]
+        )
 
     return jsonify({"suggestion": suggestion})
 
@@ -98,43 +224,41 @@ def publish_lecture(teacher_id, lecture_id):
     if not lecture or lecture["teacherId"] != teacher_id:
         return jsonify({"error": "Lecture not found for this teacher"}), 404
 
-    # Get all approved section updates for this lecture
-    lecture_updates = [
-        update for update in approved_section_updates
-        if update["lectureId"] == lecture_id
-    ]
+    with lecture_lock(lecture):
+        # Get all approved section updates for this lecture
+        lecture_updates = get_approved_updates_for_lecture(lecture_id)
 
-    if not lecture_updates:
-        return jsonify({"error": "No approved section updates found for this lecture"}), 400
+        if not lecture_updates:
+            return jsonify({"error": "No approved section updates found for this lecture"}), 400
 
-    # Prepare section updates in the format expected by the function
-    section_updates = [
-        {"sectionId": update["sectionId"], "suggestedText": update["suggestedText"]}
-        for update in lecture_updates
-    ]
+        # Prepare section updates in the format expected by the function
+        section_updates = [
+            {"sectionId": update["sectionId"], "suggestedText": update["suggestedText"]}
+            for update in lecture_updates
+        ]
 
-    # Create new lecture version with all approved sections updated
-    new_lecture = create_new_lecture_version_with_multiple_sections(
-        lecture,
-        section_updates
-    )
+        # Create new lecture version with all approved sections updated
+        try:
+            new_lecture = create_new_lecture_version_with_multiple_sections(
+                get_lecture(lecture_id),
+                section_updates
+            )
+        except StaleLectureVersion:
+            return jsonify({"error": "This lecture version was already superseded"}), 409
 
-    # Update all suggestions with the new lecture ID and mark reactions as addressed
-    updated_suggestions = []
-    for update in lecture_updates:
-        suggestion = get_suggestion_by_id(update["suggestionId"])
-        if suggestion:
-            suggestion["lectureId"] = new_lecture["id"]
-            updated_suggestions.append(suggestion)
-        
-        # Mark reactions as addressed for this section
-        mark_reactions_addressed_for_section(lecture_id, update["sectionId"])
-
-    # Remove the processed updates from the approved list
-    approved_section_updates[:] = [
-        update for update in approved_section_updates
-        if update["lectureId"] != lecture_id
-    ]
+        # Update all suggestions with the new lecture ID and mark reactions as addressed
+        updated_suggestions = []
+        for update in lecture_updates:
+            suggestion = get_suggestion_by_id(update["suggestionId"])
+            if suggestion:
+                update_suggestion(suggestion, lectureId=new_lecture["id"])
+                updated_suggestions.append(suggestion)
+
+            # Mark reactions as addressed for this section
+            mark_reactions_addressed_for_section(lecture_id, update["sectionId"])
+
+        # Remove the processed updates from the approved list
+        remove_approved_updates(lecture_updates)
 
     return jsonify({
         "newLecture": new_lecture,
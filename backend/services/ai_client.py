@@ -0,0 +1,98 @@
+import atexit
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Pool and timeouts for the shared client (see configure_ai_client)
+_settings: Dict[str, Any] = {
+    "api_key": None,
+    "timeout": 120.0,
+    "connect_timeout": 5.0,
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "max_retries": 2,
+}
+_client: Any = None
+_owned = False  # True when _client was built here (and must be closed here)
+_lock = threading.Lock()
+
+
+def configure_ai_client(api_key: Optional[str] = None,
+                        timeout: float = 120.0,
+                        connect_timeout: float = 5.0,
+                        max_connections: int = 20,
+                        max_keepalive_connections: int = 10,
+                        keepalive_expiry: float = 30.0,
+                        max_retries: int = 2) -> None:
+    """Set up the shared Anthropic client; nothing is imported or built yet.
+
+    The client is created by the first get_client() call. api_key falls
+    back to the API_KEY environment variable. A client built with older
+    settings is closed.
+    """
+    _settings.update(
+        api_key=api_key,
+        timeout=timeout,
+        connect_timeout=connect_timeout,
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+        max_retries=max_retries,
+    )
+    close_client()
+
+
+def _build_client() -> Any:
+    # anthropic pulls in httpx and pydantic, so only pay for it on first use
+    import anthropic
+    import httpx
+
+    http_client = anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=_settings["max_connections"],
+            max_keepalive_connections=_settings["max_keepalive_connections"],
+            keepalive_expiry=_settings["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(_settings["timeout"], connect=_settings["connect_timeout"]),
+    )
+    return anthropic.Anthropic(
+        api_key=_settings["api_key"] or os.getenv("API_KEY"),
+        http_client=http_client,
+        max_retries=_settings["max_retries"],
+    )
+
+
+def get_client() -> Any:
+    """The shared, connection-pooled Anthropic client (built on first call)."""
+    global _client, _owned
+    client = _client
+    if client is None:
+        with _lock:
+            if _client is None:
+                _client = _build_client()
+                _owned = True
+            client = _client
+    return client
+
+
+def set_client(client: Any) -> None:
+    """Use client (e.g. benchmarks.stub_anthropic.StubAnthropic) instead."""
+    global _client, _owned
+    close_client()
+    with _lock:
+        _client = client
+        _owned = False
+
+
+def close_client() -> None:
+    """Close the pooled connections of a client built by get_client()."""
+    global _client, _owned
+    with _lock:
+        client, owned = _client, _owned
+        _client, _owned = None, False
+    if client is not None and owned:
+        client.close()
+
+
+atexit.register(close_client)
@@ -0,0 +1,272 @@
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from utils.metrics import record_gateway_event
+from utils.rate_limit import TokenBucket
+
+T = TypeVar("T")
+
+# Provider statuses worth retrying: timeout, conflict, rate limit, 5xx, overloaded
+RETRYABLE_STATUSES = (408, 409, 429, 500, 502, 503, 504, 529)
+# Transport errors carry no status; matched by class name so this module
+# doesn't have to import anthropic
+RETRYABLE_ERROR_NAMES = ("APIConnectionError", "APITimeoutError")
+
+
+class GatewaySaturated(Exception):
+    """Too many model calls are already waiting; try again after retry_after."""
+
+    def __init__(self, queue_position: int, retry_after: float):
+        super().__init__(f"AI gateway saturated (queue position {queue_position})")
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+
+class ModelUnavailable(Exception):
+    """A model call failed and could not (or can no longer) be retried."""
+
+    def __init__(self, cause: BaseException, attempts: int):
+        super().__init__(f"Model call failed after {attempts} attempt(s): {cause}")
+        self.cause = cause
+        self.attempts = attempts
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def is_api_error(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) is not None or is_retryable(exc)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """The provider's retry-after(-ms) header on an API error, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class AIGateway:
+    """Admission control, concurrency limits, rate limiting and retries for
+    model calls.
+
+    A call first gets a place in the wait queue (or GatewaySaturated right
+    away when max_waiting calls are already waiting), then a slot of its
+    teacher and a global slot (at most max_concurrent and
+    max_concurrent_per_teacher running), then a rate-limit token. Retryable
+    failures are retried up to max_attempts times with full-jitter
+    exponential backoff, waiting at least the provider's retry-after. The
+    slot is held across retries so a struggling teacher can't take more.
+    A request that fans out into several calls is admitted once, with
+    teacher_slots().
+    """
+
+    def __init__(self,
+                 max_concurrent: int = 8,
+                 max_concurrent_per_teacher: int = 2,
+                 max_waiting: int = 32,
+                 queue_timeout: float = 30.0,
+                 rate_per_second: Optional[float] = 2.0,
+                 burst: int = 8,
+                 max_attempts: int = 4,
+                 base_delay: float = 0.5,
+                 max_delay: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_teacher = max_concurrent_per_teacher
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._global = threading.BoundedSemaphore(max_concurrent)
+        self._teachers: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        # Moving average of call time, for the retry-after of rejections
+        self._avg_call_seconds = 5.0
+
+    def _teacher_semaphore(self, teacher_id: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._teachers.get(teacher_id)
+            if semaphore is None:
+                semaphore = self._teachers[teacher_id] = threading.BoundedSemaphore(
+                    self.max_concurrent_per_teacher
+                )
+            return semaphore
+
+    def _saturated(self, position: int) -> GatewaySaturated:
+        retry_after = max(1.0, math.ceil(
+            self._avg_call_seconds * position / max(self.max_concurrent, 1)
+        ))
+        record_gateway_event("rejected")
+        return GatewaySaturated(position, retry_after)
+
+    def _admit(self, semaphores: List[threading.BoundedSemaphore]) -> None:
+        """Acquire semaphores in order while holding a place in the wait
+        queue; GatewaySaturated if the queue is full or queue_timeout runs
+        out (nothing stays acquired then)."""
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                raise self._saturated(self._waiting + 1)
+            self._waiting += 1
+            position = self._waiting
+        deadline = time.monotonic() + self.queue_timeout
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                if not semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                    raise self._saturated(position)
+                acquired.append(semaphore)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    @contextmanager
+    def teacher_slots(self, teacher_id: Optional[str], wanted: int = 1) -> Iterator[int]:
+        """Admit one request of a teacher that may make several calls.
+
+        Waits in the queue (like slot()) for one of the teacher's slots,
+        then takes up to wanted - 1 more that are free right now, without
+        waiting. Yields how many calls the request may run at once; run
+        them with call(..., admitted=True), which waits for a global slot
+        without a timeout, so a request that got in is never rejected half
+        way through.
+        """
+        teacher = self._teacher_semaphore(teacher_id or "")
+        self._admit([teacher])
+        held = 1
+        while held < wanted and teacher.acquire(blocking=False):
+            held += 1
+        try:
+            yield held
+        finally:
+            for _ in range(held):
+                teacher.release()
+
+    @contextmanager
+    def slot(self, teacher_id: Optional[str], admitted: bool = False) -> Iterator[None]:
+        """Hold a running slot (global and per teacher) for one model call.
+
+        With admitted=True the caller already holds a teacher slot from
+        teacher_slots() and only a global slot is taken.
+        """
+        teacher = self._teacher_semaphore(teacher_id or "")
+        if admitted:
+            self._global.acquire()
+        else:
+            # Teacher first: a call stuck behind its own teacher's limit must
+            # not sit on a global slot other teachers could use
+            self._admit([teacher, self._global])
+        with self._lock:
+            self._running += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._running -= 1
+                self._avg_call_seconds = 0.8 * self._avg_call_seconds + 0.2 * elapsed
+            self._global.release()
+            if not admitted:
+                teacher.release()
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Delay before retry number attempt (1-based) after exc."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def throttle(self) -> None:
+        """Wait for a rate-limit token; every attempt takes one."""
+        self._bucket.acquire()
+
+    def sleep(self, delay: float) -> None:
+        """Wait out a retry backoff (with the sleep the gateway was given)."""
+        self._sleep(delay)
+
+    def next_delay(self, attempt: int, exc: BaseException, operation: str) -> Optional[float]:
+        """Backoff before retrying after attempt number attempt failed with
+        exc, or None if it shouldn't be retried."""
+        if not is_retryable(exc):
+            return None
+        if attempt >= self.max_attempts:
+            record_gateway_event("exhausted", operation)
+            return None
+        record_gateway_event("retried", operation)
+        return self.backoff(attempt, exc)
+
+    def retrying(self, operation: str, fn: Callable[[], T]) -> T:
+        """fn() with retries; call inside slot(). API errors that end the
+        retries are raised as ModelUnavailable."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.throttle()
+            try:
+                return fn()
+            except Exception as exc:
+                delay = self.next_delay(attempt, exc, operation)
+                if delay is None:
+                    if is_api_error(exc):
+                        raise ModelUnavailable(exc, attempt) from exc
+                    raise
+                self.sleep(delay)
+
+    def call(self,
+             teacher_id: Optional[str],
+             operation: str,
+             fn: Callable[[], T],
+             admitted: bool = False) -> T:
+        """Run fn() as one admitted, rate-limited model call with retries."""
+        with self.slot(teacher_id, admitted):
+            return self.retrying(operation, fn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._running,
+                "waiting": self._waiting,
+                "maxConcurrent": self.max_concurrent,
+                "maxConcurrentPerTeacher": self.max_concurrent_per_teacher,
+                "maxWaiting": self.max_waiting,
+                "avgCallSeconds": self._avg_call_seconds,
+            }
+
+
+gateway = AIGateway()
+
+
+def configure_ai_gateway(**settings: Any) -> None:
+    """Replace the gateway; settings are AIGateway's keyword arguments."""
+    global gateway
+    gateway = AIGateway(**settings)
+
+
+def get_gateway() -> AIGateway:
+    return gateway
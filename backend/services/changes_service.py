@@ -0,0 +1,56 @@
+from typing import Any, Dict, Optional
+
+from models import data_store
+from services.events_service import publish_lecture_event
+
+MAX_PAGE_SIZE = 500
+
+
+def _record(lecture_id: str, kind: str, row: Dict[str, Any]) -> None:
+    seq = data_store.change_log.record(lecture_id, kind, row["id"])
+    publish_lecture_event(lecture_id, kind, row, seq)
+
+
+def record_reaction_change(reaction: Dict[str, Any]) -> None:
+    """Log the change for the changes feed and push it to subscribed teachers."""
+    _record(reaction["lectureId"], "reaction", reaction)
+
+
+def record_suggestion_change(suggestion: Dict[str, Any],
+                             previous_lecture_id: Optional[str] = None) -> None:
+    """Record a suggestion change; if it moved to another lecture version the
+    old lecture's feed hears about it too."""
+    _record(suggestion["lectureId"], "suggestion", suggestion)
+    if previous_lecture_id and previous_lecture_id != suggestion["lectureId"]:
+        _record(previous_lecture_id, "suggestion", suggestion)
+
+
+def parse_cursor(cursor: Optional[str]) -> int:
+    """Cursors are opaque to clients; raises ValueError for a bad one."""
+    if not cursor:
+        return 0
+    seq = int(cursor)
+    if seq < 0:
+        raise ValueError("cursor must not be negative")
+    return seq
+
+
+def get_changes_since(lecture_id: str, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    """Reactions and suggestions of a lecture that changed after cursor,
+    in their current state, plus the cursor for the next poll."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    changes, next_seq, has_more = data_store.change_log.since(
+        lecture_id, parse_cursor(cursor), limit
+    )
+    repos = {
+        "reaction": data_store.reactions_repo,
+        "suggestion": data_store.suggestions_repo,
+    }
+    result: Dict[str, Any] = {"reactions": [], "suggestions": []}
+    for kind, entity_id in changes:
+        row = repos[kind].get(entity_id)
+        if row is not None:
+            result[f"{kind}s"].append(row)
+    result["cursor"] = str(next_seq)
+    result["hasMore"] = has_more
+    return result
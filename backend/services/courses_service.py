@@ -0,0 +1,7 @@
+from typing import List
+
+from models import data_store
+
+
+def get_course_ids_for_user(user_id: str) -> List[str]:
+    return [e["courseId"] for e in data_store.enrollments_repo.find(userId=user_id)]
@@ -0,0 +1,146 @@
+import queue
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional, Set
+
+from utils.sse import format_sse
+
+
+class Subscription:
+    """One client's bounded queue of encoded events.
+
+    When the client falls behind and the queue is full, the oldest events
+    are dropped and counted; the client then gets a single "overflow" event
+    telling it to resync from the changes feed instead of the lost events.
+    Its cursor is the seq just before the oldest dropped event, so the
+    resync covers every one of them.
+    """
+
+    def __init__(self, topic: str, max_queue: int):
+        self.topic = topic
+        self._events: deque = deque()
+        self._max_queue = max_queue
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.dropped = 0
+        # Cursor for the next overflow event (None while nothing was dropped)
+        self._resync_seq: Optional[int] = None
+
+    def push(self, encoded: str, seq: int) -> None:
+        with self._lock:
+            if len(self._events) >= self._max_queue:
+                dropped_seq, _ = self._events.popleft()
+                self.dropped += 1
+                if self._resync_seq is None:
+                    self._resync_seq = dropped_seq - 1
+            self._events.append((seq, encoded))
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def drain(self, timeout: float) -> Optional[list]:
+        """Wait up to timeout for events; None means nothing arrived."""
+        if not self._wakeup.wait(timeout):
+            return None
+        with self._lock:
+            self._wakeup.clear()
+            events = [encoded for _, encoded in self._events]
+            self._events.clear()
+            dropped, self.dropped = self.dropped, 0
+            resync_seq, self._resync_seq = self._resync_seq, None
+        if dropped:
+            events.insert(0, format_sse("overflow", {"dropped": dropped, "cursor": str(resync_seq)}))
+        return events
+
+
+class EventBroker:
+    """In-process pub/sub with one topic per lecture.
+
+    publish() only puts the event on a queue, so the write path that calls
+    it (e.g. create_reaction) never waits on subscribers. A dispatcher
+    thread encodes each event once and fans the encoded text out to every
+    subscription on its topic.
+    """
+
+    def __init__(self, max_queue: int = 256, heartbeat_interval: float = 15.0):
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self._inbox: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None:
+            with self._lock:
+                if self._dispatcher is None:
+                    self._dispatcher = threading.Thread(
+                        target=self._dispatch_loop, name="event-dispatcher", daemon=True
+                    )
+                    self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            topic, event, data, seq = self._inbox.get()
+            subscribers = self._topics.get(topic)
+            if not subscribers:
+                continue
+            encoded = f"id: {seq}\n" + format_sse(event, data)
+            for sub in list(subscribers):
+                sub.push(encoded, seq)
+
+    def publish(self, topic: str, event: str, data: Any, seq: int = 0) -> None:
+        if topic in self._topics:
+            self._inbox.put((topic, event, data, seq))
+
+    def subscribe(self, topic: str) -> Subscription:
+        self._ensure_dispatcher()
+        sub = Subscription(topic, self.max_queue)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subscribers = self._topics.get(sub.topic)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._topics[sub.topic]
+
+    def stream(self, sub: Subscription) -> Iterator[str]:
+        """SSE text for a subscription, with heartbeat comments when idle."""
+        try:
+            yield format_sse("subscribed", {"topic": sub.topic})
+            while True:
+                events = sub.drain(self.heartbeat_interval)
+                if events is None:
+                    yield ": heartbeat\n\n"
+                else:
+                    yield from events
+        finally:
+            self.unsubscribe(sub)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(subs) for subs in self._topics.values())
+
+
+broker = EventBroker()
+
+
+def configure_events(max_queue: int = 256, heartbeat_interval: float = 15.0) -> None:
+    broker.max_queue = max_queue
+    broker.heartbeat_interval = heartbeat_interval
+
+
+def lecture_topic(lecture_id: str) -> str:
+    return f"lecture:{lecture_id}"
+
+
+def publish_lecture_event(lecture_id: str, event: str, data: Any, seq: int = 0) -> None:
+    broker.publish(lecture_topic(lecture_id), event, data, seq)
+
+
+def subscribe_to_lecture(lecture_id: str) -> Iterator[str]:
+    return broker.stream(broker.subscribe(lecture_topic(lecture_id)))
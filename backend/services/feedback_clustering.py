@@ -0,0 +1,206 @@
+import re
+import zlib
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Any, Dict, List, Tuple
+
+from services.reactions_service import get_reactions_for_lecture
+
+# MinHash with one-permutation hashing: every shingle hash lands in one of
+# NUM_BINS bins and each bin keeps its minimum, so a signature costs one
+# sort of the shingles. Signatures are split into bands for LSH.
+NUM_BINS = 8
+ROWS_PER_BAND = 2
+SIMILARITY_THRESHOLD = 0.5
+# Members of each LSH bucket a new text is compared with (the newest ones)
+BUCKET_COMPARISONS = 4
+# Distinct texts per section and type that are compared at all
+MAX_CLUSTERED_TEXTS = 10000
+_BIN_MASK = NUM_BINS - 1  # NUM_BINS must be a power of two
+_EMPTY_BIN_OFFSETS = [(b + 1) << 64 for b in range(NUM_BINS)]
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+# normalize_comments joins the comments with a separator that is neither a
+# word character nor whitespace, so these leave it in place
+_SEPARATOR = "\x00"
+_BATCH_NON_WORD_RE = re.compile(r"[^\w\s\x00]+")
+# Only whitespace that isn't already a single space: rewriting every space
+# costs more than the rest of the normalisation
+_SPACES_RE = re.compile(r"[^\S ]\s*|\s\s+")
+
+
+def normalize_comment(comment: str) -> str:
+    return " ".join(_NON_WORD_RE.sub(" ", comment.lower()).split())
+
+
+def normalize_comments(comments: List[str]) -> List[str]:
+    """normalize_comment of every comment, with one regex pass over all of
+    them instead of several calls per comment."""
+    blob = _SEPARATOR.join(comments)
+    if blob.count(_SEPARATOR) != len(comments) - 1:
+        # A comment contains the separator itself
+        return list(map(normalize_comment, comments))
+    blob = _SPACES_RE.sub(" ", _BATCH_NON_WORD_RE.sub(" ", blob.lower()))
+    return list(map(str.strip, blob.split(_SEPARATOR)))
+
+
+class _TokenHashes(dict):
+    """token -> crc32 of the token, computed once per token.
+
+    hash() of a str is salted per process, but hash() of ints and tuples
+    of ints is not, so shingles are hashed as tuples of these values: the
+    same comments cluster the same way in every worker and after restarts.
+    """
+
+    def __missing__(self, token: str) -> int:
+        value = self[token] = zlib.crc32(token.encode("utf-8"))
+        return value
+
+
+def _shingles(text: str, tokens: _TokenHashes) -> frozenset:
+    """Hashed word bigrams, or character trigrams for very short comments."""
+    words = text.split()
+    if len(words) >= 3:
+        hashes = list(map(tokens.__getitem__, words))
+        return frozenset(map(hash, zip(hashes, hashes[1:])))
+    # Short comments: character 3-grams so "typo" and "typo!!" still meet
+    padded = f" {text} "
+    return frozenset(hash((tokens[padded[i:i + 3]],)) for i in range(max(len(padded) - 2, 1)))
+
+
+def _signature(shingles: frozenset) -> Tuple[int, ...]:
+    ordered = sorted(shingles, reverse=True)
+    # dict() keeps the last, i.e. smallest, hash per bin
+    bins = dict(zip(map(_BIN_MASK.__and__, ordered), ordered))
+    # Densify: an empty bin takes the overall minimum plus a per-bin offset,
+    # so short comments don't all collide on their empty bins
+    fills = map(ordered[-1].__add__, _EMPTY_BIN_OFFSETS)
+    return tuple(map(bins.get, range(NUM_BINS), fills))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def _similar(a: frozenset, b: frozenset) -> bool:
+    # Jaccard can't reach the threshold when the sizes differ too much
+    if min(len(a), len(b)) < SIMILARITY_THRESHOLD * max(len(a), len(b)):
+        return False
+    return _jaccard(a, b) >= SIMILARITY_THRESHOLD
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def cluster_comments(reactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group near-duplicate comments of one section and type.
+
+    Exact duplicates (after normalising case, punctuation and spacing) are
+    collapsed first. Of the resulting texts, the MAX_CLUSTERED_TEXTS most
+    frequent are compared: those with too few shingles in common with the
+    others to be similar to any of them stay on their own, the rest are
+    bucketed with MinHash LSH and merged with the newest members of their
+    buckets whose shingle sets have Jaccard similarity of at least
+    SIMILARITY_THRESHOLD. Texts past the cap stay as their exact-duplicate
+    clusters. Texts are ranked and bucketed in a fixed order, so the
+    clusters don't depend on the order of the reactions. Reactions without
+    a comment form one cluster with an empty representative. Clusters are
+    returned largest first as {"representative", "count", "reactionIds"}.
+
+    The cap bounds the LSH work, so 100k comments take about 1 s on one
+    slow core whether or not they repeat, most of it normalising the
+    comments and building the clusters.
+    """
+    by_text: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    comments = normalize_comments([r.get("comment") or "" for r in reactions])
+    for text, r in zip(comments, reactions):
+        by_text[text].append(r)
+
+    # Most frequent first (ties by text), so neither the texts that get
+    # compared nor the order they are bucketed in depends on the order of
+    # the reactions. Past MAX_CLUSTERED_TEXTS, texts stay as their
+    # exact-duplicate clusters.
+    ranked = sorted(by_text)
+    ranked.sort(key=lambda text: len(by_text[text]), reverse=True)
+    compared = ranked[:MAX_CLUSTERED_TEXTS]
+    tokens = _TokenHashes()
+    shingle_sets = [_shingles(text, tokens) for text in compared]
+    # Similar texts have at least SIMILARITY_THRESHOLD of their shingles in
+    # common, so a text with fewer shingles that other texts also have
+    # can't be similar to anything and skips the signature
+    counts = Counter(chain.from_iterable(shingle_sets))
+    shared = {shingle for shingle, count in counts.items() if count > 1}
+    uf = _UnionFind(len(compared))
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    for i, shingles in enumerate(shingle_sets):
+        if not compared[i] or len(shingles & shared) < SIMILARITY_THRESHOLD * len(shingles):
+            continue
+        sig = _signature(shingles)
+        candidates = set()
+        for band in range(0, NUM_BINS, ROWS_PER_BAND):
+            bucket = buckets.setdefault((band, sig[band:band + ROWS_PER_BAND]), [])
+            candidates.update(bucket[-BUCKET_COMPARISONS:])
+            bucket.append(i)
+        root = i
+        for j in candidates:
+            other = uf.find(j)
+            if other != root and _similar(shingles, shingle_sets[j]):
+                uf.union(other, root)
+                root = other
+
+    groups: Dict[int, List[str]] = defaultdict(list)
+    for i, text in enumerate(compared):
+        groups[uf.find(i)].append(text)
+
+    clusters = []
+    for members in chain(groups.values(), ([text] for text in ranked[MAX_CLUSTERED_TEXTS:])):
+        # Representative: the most frequently written original comment,
+        # i.e. the first member in ranked order
+        if len(members) == 1:
+            member_reactions = by_text[members[0]]
+        else:
+            member_reactions = [r for text in members for r in by_text[text]]
+        clusters.append({
+            "representative": member_reactions[0].get("comment") or "",
+            "count": len(member_reactions),
+            "reactionIds": [r["id"] for r in member_reactions],
+        })
+    clusters.sort(key=lambda c: -c["count"])
+    return clusters
+
+
+def cluster_feedback(reactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """sectionId -> reaction type -> clusters."""
+    grouped: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+    for r in reactions:
+        grouped[r["sectionId"]][r["type"]].append(r)
+    return {
+        section_id: {rtype: cluster_comments(rs) for rtype, rs in by_type.items()}
+        for section_id, by_type in grouped.items()
+    }
+
+
+def get_feedback_clusters_for_lecture(lecture_id: str,
+                                      include_addressed: bool = False
+                                      ) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    reactions = get_reactions_for_lecture(lecture_id, include_archived=include_addressed)
+    if not include_addressed:
+        reactions = [r for r in reactions if not r["addressed"]]
+    return cluster_feedback(reactions)
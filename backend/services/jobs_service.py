@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.suggestions_service import generate_suggestions_for_lecture
+from utils.id_utils import new_uuid
+from utils.time_utils import now_iso
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds max_pending unfinished jobs."""
+
+
+class JobQueue:
+    """Background jobs on a bounded thread pool.
+
+    Jobs are plain dicts (id, status, timestamps, result/error) that can be
+    polled by id. A job submitted with a dedupe_key that matches a queued or
+    running job returns that job instead of starting a new one. Finished
+    jobs are kept (up to max_finished) so clients can still fetch results.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, max_finished: int = 256):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="ai-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._active_by_key: Dict[str, str] = {}
+        self._futures: Dict[str, Any] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+    def submit(self,
+               job_type: str,
+               fn: Callable[[threading.Event], Any],
+               dedupe_key: Optional[str] = None,
+               **info: Any) -> Tuple[Dict[str, Any], bool]:
+        """Queue fn(cancel_event). Returns (job, created)."""
+        with self._lock:
+            if dedupe_key and dedupe_key in self._active_by_key:
+                return self._jobs[self._active_by_key[dedupe_key]], False
+            active = sum(1 for j in self._jobs.values() if j["status"] in ACTIVE_STATUSES)
+            if active >= self.max_pending:
+                raise JobQueueFull(f"{active} jobs already pending")
+
+            job = {
+                "id": new_uuid(),
+                "type": job_type,
+                "status": "queued",
+                "createdAt": now_iso(),
+                "startedAt": None,
+                "finishedAt": None,
+                "result": None,
+                "error": None,
+                **info,
+            }
+            cancel_event = threading.Event()
+            self._jobs[job["id"]] = job
+            self._cancel_events[job["id"]] = cancel_event
+            if dedupe_key:
+                self._active_by_key[dedupe_key] = job["id"]
+            self._futures[job["id"]] = self._executor.submit(
+                self._run, job, fn, cancel_event, dedupe_key
+            )
+            return job, True
+
+    def _run(self, job, fn, cancel_event, dedupe_key) -> None:
+        with self._lock:
+            if cancel_event.is_set():
+                return
+            job["status"] = "running"
+            job["startedAt"] = now_iso()
+        try:
+            result = fn(cancel_event)
+            status, error = ("cancelled" if cancel_event.is_set() else "succeeded"), None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        with self._lock:
+            job.update(status=status, result=result, error=error, finishedAt=now_iso())
+            self._finish(job, dedupe_key)
+
+    def _finish(self, job: Dict[str, Any], dedupe_key: Optional[str]) -> None:
+        if dedupe_key and self._active_by_key.get(dedupe_key) == job["id"]:
+            del self._active_by_key[dedupe_key]
+        self._futures.pop(job["id"], None)
+        self._cancel_events.pop(job["id"], None)
+        finished = [j for j in self._jobs.values() if j["status"] not in ACTIVE_STATUSES]
+        for old in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[old["id"]]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a job. Queued jobs never start; running jobs finish their
+        model call but their results are discarded."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return job
+            self._cancel_events[job_id].set()
+            if job["status"] == "queued":
+                self._futures[job_id].cancel()
+                job.update(status="cancelled", finishedAt=now_iso())
+                dedupe_key = next(
+                    (k for k, v in self._active_by_key.items() if v == job_id), None
+                )
+                self._finish(job, dedupe_key)
+            else:
+                job["cancelRequested"] = True
+            return job
+
+    def list(self) -> List[Dict[str, Any]]:
+        return list(self._jobs.values())
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+job_queue = JobQueue()
+
+
+def configure_job_queue(max_workers: int = 2, max_pending: int = 16) -> None:
+    global job_queue
+    job_queue.shutdown(wait=False)
+    job_queue = JobQueue(max_workers=max_workers, max_pending=max_pending)
+
+
+def submit_suggestion_job(lecture: Dict[str, Any],
+                          sections: List[Dict[str, Any]],
+                          model_client: Any = None) -> Tuple[Dict[str, Any], bool]:
+    """Run generate_suggestions_for_lecture in the background.
+
+    Only one generation job per lecture runs at a time; concurrent requests
+    for the same lecture get the job that is already queued or running.
+    """
+    def run(cancel_event: threading.Event):
+        created = generate_suggestions_for_lecture(
+            lecture, sections, model_client=model_client, cancel_event=cancel_event
+        )
+        if created is None:
+            raise RuntimeError("Could not parse suggestions from the model response")
+        return created
+
+    return job_queue.submit(
+        "generate-suggestions", run,
+        dedupe_key=f"generate-suggestions:{lecture['id']}",
+        lectureId=lecture["id"],
+    )
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return job_queue.get(job_id)
+
+
+def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return job_queue.cancel(job_id)
@@ -0,0 +1,92 @@
+import difflib
+import re
+from typing import Any, Dict, List, Optional
+
+from models import data_store
+from utils.metrics import timed
+from utils.ttl_cache import TTLCache
+
+# Words and the whitespace between them, so the ops rebuild the exact text
+_TOKEN_RE = re.compile(r"\s+|\S+")
+
+# Diffs by (from version id, to version id); versions are immutable, so no TTL
+lecture_diffs = TTLCache(max_entries=256, ttl=None)
+
+
+class UnrelatedLectureVersions(Exception):
+    """The two versions don't share a baseLectureId."""
+
+
+def configure_lecture_diffs(max_entries: int = 256) -> None:
+    global lecture_diffs
+    lecture_diffs = TTLCache(max_entries=max_entries, ttl=None)
+
+
+def word_diff(old_text: str, new_text: str) -> List[Dict[str, str]]:
+    """Word-level edit script from old_text to new_text.
+
+    Each op is {"op": "equal" | "delete" | "insert", "text": ...}; the
+    equal+delete texts concatenate to old_text and equal+insert to new_text.
+    """
+    old_tokens = _TOKEN_RE.findall(old_text or "")
+    new_tokens = _TOKEN_RE.findall(new_text or "")
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append({"op": "equal", "text": "".join(old_tokens[i1:i2])})
+            continue
+        if i2 > i1:
+            ops.append({"op": "delete", "text": "".join(old_tokens[i1:i2])})
+        if j2 > j1:
+            ops.append({"op": "insert", "text": "".join(new_tokens[j1:j2])})
+    return ops
+
+
+def _build_diff(from_id: str, to_id: str) -> Optional[Dict[str, Any]]:
+    store = data_store.lecture_store
+    old = store.get_metadata(from_id)
+    new = store.get_metadata(to_id)
+    if old is None or new is None:
+        return None
+    if old["baseLectureId"] != new["baseLectureId"]:
+        raise UnrelatedLectureVersions(from_id, to_id)
+    changes = store.compare(from_id, to_id)
+    return {
+        "baseLectureId": new["baseLectureId"],
+        "fromLectureId": from_id,
+        "fromVersion": old["version"],
+        "toLectureId": to_id,
+        "toVersion": new["version"],
+        "changed": [
+            {
+                "sectionId": new_section["id"],
+                "order": new_section.get("order"),
+                "oldText": old_section.get("text", ""),
+                "newText": new_section.get("text", ""),
+                "wordDiff": word_diff(old_section.get("text", ""), new_section.get("text", "")),
+            }
+            for old_section, new_section in changes["changed"]
+        ],
+        "added": changes["added"],
+        "removed": changes["removed"],
+        "sectionOrder": changes["order"],
+    }
+
+
+@timed("get_lecture_diff")
+def get_lecture_diff(from_id: str, to_id: str) -> Optional[Dict[str, Any]]:
+    """Changed, added and removed sections from one version to another.
+
+    Returns None if either version doesn't exist and raises
+    UnrelatedLectureVersions if they belong to different lectures. Results
+    are cached per (from, to) pair; publishing fills in the pair for the
+    version it supersedes.
+    """
+    key = (from_id, to_id)
+    diff = lecture_diffs.get(key)
+    if diff is None:
+        diff = _build_diff(from_id, to_id)
+        if diff is not None:
+            lecture_diffs.set(key, diff)
+    return diff
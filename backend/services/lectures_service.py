@@ -1,11 +1,131 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 
-from models.data_store import lectures
+from models import data_store
+from services.lecture_diff_service import get_lecture_diff
 from utils.id_utils import new_uuid
+from utils.locks import KeyedLocks
+from utils.metrics import timed
+from utils.response_cache import EncodedBody, ResponseCache
+from utils.section_splitter import SectionSplitter
 
+# One lock stripe per logical lecture (all versions share baseLectureId)
+lecture_locks = KeyedLocks()
 
+
+# Fields of a lecture version that change after it is created. They are left
+# out of the cached GET /lectures/<id> body (see get_lecture_response).
+MUTABLE_LECTURE_FIELDS = ("isCurrent",)
+
+# Encoded lecture bodies by version id, and deltas by (since id, version id)
+lecture_responses = ResponseCache(max_entries=512, gzip_min_bytes=1024)
+lecture_deltas = ResponseCache(max_entries=512, gzip_min_bytes=1024)
+
+
+def configure_lecture_responses(max_entries: int = 512, gzip_min_bytes: int = 1024) -> None:
+    global lecture_responses, lecture_deltas
+    lecture_responses = ResponseCache(max_entries=max_entries, gzip_min_bytes=gzip_min_bytes)
+    lecture_deltas = ResponseCache(max_entries=max_entries, gzip_min_bytes=gzip_min_bytes)
+
+
+# Streaming import: longest section before a forced split, sections per store write
+IMPORT_MAX_SECTION_CHARS = 4000
+IMPORT_BATCH_SIZE = 50
+
+
+def configure_lecture_import(max_section_chars: int = 4000, batch_size: int = 50) -> None:
+    global IMPORT_MAX_SECTION_CHARS, IMPORT_BATCH_SIZE
+    IMPORT_MAX_SECTION_CHARS = max_section_chars
+    IMPORT_BATCH_SIZE = batch_size
+
+
+class StaleLectureVersion(Exception):
+    """The lecture version being edited is no longer the current one."""
+
+
+def lecture_lock(lecture: Dict[str, Any]):
+    """Lock serialising approve/reject/publish for every version of a lecture."""
+    return lecture_locks.get(lecture["baseLectureId"])
+
+
+@timed("get_lecture")
 def get_lecture(lecture_id: str) -> Optional[Dict[str, Any]]:
-    return next((lec for lec in lectures if lec["id"] == lecture_id), None)
+    return data_store.lecture_store.get(lecture_id)
+
+
+def get_lecture_response(lecture_id: str) -> Optional[EncodedBody]:
+    """The lecture version encoded as JSON, without its mutable fields.
+
+    Everything else about a version (title, sections, ...) is fixed once it
+    is created, so the encoded bytes are cached per version id and never
+    need invalidating.
+    """
+    def build():
+        lecture = get_lecture(lecture_id)
+        if lecture is None:
+            return None
+        return {k: v for k, v in lecture.items() if k not in MUTABLE_LECTURE_FIELDS}
+    return lecture_responses.get_or_encode(lecture_id, build)
+
+
+def get_lecture_delta_response(since_id: str, lecture_id: str) -> Optional[EncodedBody]:
+    """What a client holding version since_id needs to rebuild lecture_id.
+
+    The body is the version's fields (as in get_lecture_response) with
+    "sections" replaced by the new or changed sections, the ids of removed
+    sections and the new section order. Returns None if either version is
+    missing; raises UnrelatedLectureVersions across lectures.
+    """
+    def build():
+        diff = get_lecture_diff(since_id, lecture_id)
+        if diff is None:
+            return None
+        lecture = data_store.lecture_store.get_metadata(lecture_id)
+        delta = {k: v for k, v in lecture.items() if k not in MUTABLE_LECTURE_FIELDS}
+        changed_ids = {c["sectionId"] for c in diff["changed"]}
+        delta.update({
+            "sinceLectureId": since_id,
+            "changedSections": [
+                s for s in get_lecture(lecture_id)["sections"] if s["id"] in changed_ids
+            ],
+            "addedSections": diff["added"],
+            "removedSectionIds": [s["id"] for s in diff["removed"]],
+            "sectionOrder": diff["sectionOrder"],
+        })
+        return delta
+    return lecture_deltas.get_or_encode((since_id, lecture_id), build)
+
+
+def get_lecture_status(lecture_id: str) -> Optional[Dict[str, Any]]:
+    """The mutable state of a version and the id of its current version."""
+    lecture = data_store.lecture_store.get_metadata(lecture_id)
+    if lecture is None:
+        return None
+    if lecture["isCurrent"]:
+        current_id = lecture["id"]
+    else:
+        current = data_store.lecture_store.find(
+            baseLectureId=lecture["baseLectureId"], isCurrent=True
+        )
+        current_id = current[0]["id"] if current else None
+    return {
+        "id": lecture["id"],
+        "baseLectureId": lecture["baseLectureId"],
+        "version": lecture["version"],
+        "isCurrent": lecture["isCurrent"],
+        "currentLectureId": current_id,
+    }
+
+
+def get_lectures_for_teacher(teacher_id: str) -> List[Dict[str, Any]]:
+    """Lecture versions (metadata only, no sections) owned by a teacher."""
+    return data_store.lecture_store.find(teacherId=teacher_id)
+
+
+def get_current_lectures_for_courses(course_ids: List[str]) -> List[Dict[str, Any]]:
+    current = []
+    for course_id in course_ids:
+        current.extend(data_store.lecture_store.find(courseId=course_id, isCurrent=True))
+    return current
 
 
 def get_section(lecture: Dict[str, Any], section_id: str) -> Optional[Dict[str, Any]]:
@@ -35,35 +155,71 @@ def create_base_lecture(title: str,
         "courseId": course_id,
         "sections": section_objs,
     }
-    lectures.append(lecture)
+    data_store.lecture_store.add(lecture)
     return lecture
 
 
+def import_lecture(chunks: Iterable[bytes],
+                   title: str,
+                   teacher_id: str,
+                   course_id: str,
+                   max_section_chars: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """Create a version-1 lecture from a markdown or plain-text document
+    read as a stream of byte chunks.
+
+    Sections are cut by SectionSplitter and written IMPORT_BATCH_SIZE at a
+    time, so only the current batch and the section refs stay in memory.
+    Yields ("progress", {"bytesRead", "sections"}) after each batch, then
+    ("lecture", metadata with "sectionCount"), or ("error", message) if the
+    document has no text. The lecture only appears once it is complete.
+    """
+    splitter = SectionSplitter(max_section_chars or IMPORT_MAX_SECTION_CHARS)
+    store = data_store.lecture_store
+    refs: List[str] = []
+    batch: List[Dict[str, Any]] = []
+    bytes_read = 0
+
+    def add(texts):
+        for text in texts:
+            batch.append({"id": new_uuid(), "order": len(refs) + len(batch) + 1, "text": text})
+
+    def flush():
+        refs.extend(store.intern_sections(batch))
+        batch.clear()
+        return "progress", {"bytesRead": bytes_read, "sections": len(refs)}
+
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        add(splitter.feed(chunk))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield flush()
+    add(splitter.close())
+    if batch:
+        yield flush()
+    if not refs:
+        yield "error", "The document has no text to import"
+        return
+
+    base_id = new_uuid()
+    lecture = store.add_refs({
+        "id": f"{base_id}-v1",
+        "baseLectureId": base_id,
+        "version": 1,
+        "isCurrent": True,
+        "title": title,
+        "teacherId": teacher_id,
+        "courseId": course_id,
+    }, refs)
+    yield "lecture", {**lecture, "sectionCount": len(refs)}
+
+
 def create_new_lecture_version(old_lecture: Dict[str, Any],
                                section_id: str,
                                new_text: str) -> Dict[str, Any]:
     """Clone old lecture into a new version with updated section text."""
-    old_lecture["isCurrent"] = False
-    base_id = old_lecture["baseLectureId"]
-    new_version = old_lecture["version"] + 1
-    new_lecture_id = f"{base_id}-v{new_version}"
-
-    new_sections = []
-    for s in old_lecture["sections"]:
-        if s["id"] == section_id:
-            new_sections.append({"id": s["id"], "order": s["order"], "text": new_text})
-        else:
-            new_sections.append(dict(s))
-
-    new_lecture = {
-        **old_lecture,
-        "id": new_lecture_id,
-        "version": new_version,
-        "isCurrent": True,
-        "sections": new_sections,
-    }
-    lectures.append(new_lecture)
-    return new_lecture
+    return create_new_lecture_version_with_multiple_sections(
+        old_lecture, [{"sectionId": section_id, "suggestedText": new_text}]
+    )
 
 
 def create_new_lecture_version_with_multiple_sections(
@@ -72,6 +228,9 @@ def create_new_lecture_version_with_multiple_sections(
 ) -> Dict[str, Any]:
     """
     Clone old lecture into a new version with multiple sections updated.
+
+    Only the updated sections are stored again; the new version shares every
+    other section with the old one (see LectureVersionStore).
     
     Args:
         old_lecture: The current lecture to clone
@@ -79,8 +238,15 @@ def create_new_lecture_version_with_multiple_sections(
     
     Returns:
         The new lecture version with all sections updated
+
+    Raises:
+        StaleLectureVersion: old_lecture was already superseded (optimistic
+            check, so two publishers can never both fork the same version)
     """
-    old_lecture["isCurrent"] = False
+    if not data_store.lecture_store.compare_and_update(
+        old_lecture, {"isCurrent": True}, isCurrent=False
+    ):
+        raise StaleLectureVersion(old_lecture["id"])
     base_id = old_lecture["baseLectureId"]
     new_version = old_lecture["version"] + 1
     new_lecture_id = f"{base_id}-v{new_version}"
@@ -88,24 +254,17 @@ def create_new_lecture_version_with_multiple_sections(
     # Create a map of sectionId -> new text for quick lookup
     updates_map = {update["sectionId"]: update["suggestedText"] for update in section_updates}
 
-    new_sections = []
-    for s in old_lecture["sections"]:
-        if s["id"] in updates_map:
-            new_sections.append({
-                "id": s["id"],
-                "order": s["order"],
-                "text": updates_map[s["id"]]
-            })
-        else:
-            new_sections.append(dict(s))
-
-    new_lecture = {
-        **old_lecture,
-        "id": new_lecture_id,
-        "version": new_version,
-        "isCurrent": True,
-        "sections": new_sections,
+    new_sections = {
+        s["id"]: {"id": s["id"], "order": s["order"], "text": updates_map[s["id"]]}
+        for s in old_lecture["sections"]
+        if s["id"] in updates_map
     }
-    lectures.append(new_lecture)
+
+    new_lecture = data_store.lecture_store.add_version(
+        old_lecture,
+        {"id": new_lecture_id, "version": new_version, "isCurrent": True},
+        new_sections,
+    )
+    # Students on the old version refresh through this delta, so build it now
+    get_lecture_delta_response(old_lecture["id"], new_lecture_id)
     return new_lecture
-    
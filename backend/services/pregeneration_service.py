@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from models import data_store
+from services.lectures_service import get_lecture, get_section
+
+HOUR_SECONDS = 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+class PregenerationScheduler:
+    """Debounced background generation of suggestions from new reactions.
+
+    Every new reaction marks its section as pending for its lecture. A
+    lecture's pending sections are generated together, in one suggestion
+    job, once either
+
+    - a pending section has at least threshold unaddressed reactions (after
+      coalesce_seconds, so the rest of a burst joins the same call), or
+    - the lecture has been quiet for quiet_seconds since its last reaction.
+
+    At most max_calls_per_hour jobs are started per sliding hour; when the
+    cap is reached lectures stay pending until a call ages out. A lecture
+    whose job can't be queued (job queue full), or that already has a
+    generation job running (which may have been planned before these
+    sections had feedback), stays pending and is retried after
+    quiet_seconds. One daemon thread does the waiting, started on the
+    first reaction.
+    """
+
+    def __init__(self,
+                 threshold: int = 5,
+                 quiet_seconds: float = 60.0,
+                 coalesce_seconds: float = 2.0,
+                 max_calls_per_hour: int = 20,
+                 submit: Optional[Callable[[Dict[str, Any], List[Dict[str, Any]]], Any]] = None):
+        self.threshold = threshold
+        self.quiet_seconds = quiet_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self.max_calls_per_hour = max_calls_per_hour
+        self._submit = submit
+        self._cond = threading.Condition()
+        # lectureId -> {"sections": set, "last": time, "due": time or None}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._calls: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.triggered = 0
+
+    def note_reaction(self, reaction: Dict[str, Any]) -> None:
+        lecture_id = reaction["lectureId"]
+        section_id = reaction["sectionId"]
+        counts = data_store.reaction_counters.section_counts(lecture_id).get(section_id)
+        over_threshold = counts is not None and counts["unaddressed"] >= self.threshold
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.setdefault(
+                lecture_id, {"sections": set(), "last": now, "due": None}
+            )
+            entry["sections"].add(section_id)
+            entry["last"] = now
+            if over_threshold and entry["due"] is None:
+                entry["due"] = now + self.coalesce_seconds
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="ai-pregenerate", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _deadline(self, entry: Dict[str, Any]) -> float:
+        quiet = entry["last"] + self.quiet_seconds
+        return min(entry["due"], quiet) if entry["due"] is not None else quiet
+
+    def _take_due(self, now: float) -> Dict[str, set]:
+        """Pop the lectures whose deadline passed, within the hourly cap.
+        Call with the lock held."""
+        while self._calls and self._calls[0] <= now - HOUR_SECONDS:
+            self._calls.popleft()
+        due = sorted(
+            (self._deadline(e), lecture_id)
+            for lecture_id, e in self._pending.items()
+            if self._deadline(e) <= now
+        )
+        # Calls are only counted once a job was created (see _trigger)
+        budget = self.max_calls_per_hour - len(self._calls)
+        return {
+            lecture_id: self._pending.pop(lecture_id)["sections"]
+            for _, lecture_id in due[:max(budget, 0)]
+        }
+
+    def _wait_timeout(self, now: float) -> Optional[float]:
+        if not self._pending:
+            return None
+        wake = min(self._deadline(e) for e in self._pending.values())
+        if len(self._calls) >= self.max_calls_per_hour:
+            wake = max(wake, self._calls[0] + HOUR_SECONDS)
+        return max(wake - now, 0.01)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                taken = self._take_due(now)
+                if not taken:
+                    self._cond.wait(self._wait_timeout(now))
+                    continue
+            for lecture_id, section_ids in taken.items():
+                self._trigger(lecture_id, section_ids)
+
+    def _trigger(self, lecture_id: str, section_ids: set) -> None:
+        lecture = get_lecture(lecture_id)
+        if not lecture or not lecture["isCurrent"]:
+            return
+        counts = data_store.reaction_counters.section_counts(lecture_id)
+        sections = [
+            section for section in (get_section(lecture, sid) for sid in section_ids)
+            if section and counts.get(section["id"], {}).get("unaddressed", 0) > 0
+        ]
+        if not sections:
+            return
+        submit = self._submit
+        if submit is None:
+            # Imported here: jobs_service -> suggestions_service -> reactions_service
+            # imports this module
+            from services.jobs_service import submit_suggestion_job as submit
+        try:
+            _, created = submit(lecture, sections)
+        except Exception:
+            logger.exception("Error scheduling background suggestions for %s", lecture_id)
+            created = False
+        with self._cond:
+            if created:
+                self._calls.append(time.monotonic())
+                self.triggered += 1
+                return
+            # Deduplicated against a running job (or not queued): try again
+            # once it had time to finish
+            entry = self._pending.setdefault(
+                lecture_id, {"sections": set(), "last": time.monotonic(), "due": None}
+            )
+            entry["sections"] |= section_ids
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "enabled": True,
+                "pendingLectures": len(self._pending),
+                "callsLastHour": sum(1 for t in self._calls if t > now - HOUR_SECONDS),
+                "maxCallsPerHour": self.max_calls_per_hour,
+                "threshold": self.threshold,
+                "quietSeconds": self.quiet_seconds,
+                "triggered": self.triggered,
+            }
+
+
+# None while pre-generation is off (the default), so reactions pay nothing
+scheduler: Optional[PregenerationScheduler] = None
+
+
+def configure_pregeneration(enabled: bool = False,
+                            threshold: int = 5,
+                            quiet_seconds: float = 60.0,
+                            coalesce_seconds: float = 2.0,
+                            max_calls_per_hour: int = 20) -> None:
+    global scheduler
+    if scheduler is not None:
+        scheduler.stop()
+    scheduler = PregenerationScheduler(
+        threshold=threshold,
+        quiet_seconds=quiet_seconds,
+        coalesce_seconds=coalesce_seconds,
+        max_calls_per_hour=max_calls_per_hour,
+    ) if enabled else None
+
+
+def note_reaction(reaction: Dict[str, Any]) -> None:
+    """Tell the scheduler about a new reaction (no-op when disabled)."""
+    if scheduler is not None:
+        scheduler.note_reaction(reaction)
+
+
+def get_pregeneration_stats() -> Dict[str, Any]:
+    return scheduler.stats() if scheduler is not None else {"enabled": False}
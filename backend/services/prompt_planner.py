@@ -0,0 +1,229 @@
+from typing import Any, Dict, List, NamedTuple
+
+from services.feedback_clustering import cluster_comments
+from utils.metrics import timed
+
+# Rough chars-per-token ratio for English prose; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+OUTLINE_SNIPPET_CHARS = 160
+
+# Prompt budget (input tokens) above which the lecture is split into groups,
+# and how many group requests may run at once.
+prompt_token_budget = 60000
+fanout_concurrency = 4
+
+INTRO = "You are helping a professor improve their lecture content based on student feedback.\n\n"
+DIVIDER = "\n" + "=" * 80 + "\n\n"
+
+TASK_INSTRUCTIONS = """
+        TASK:
+        For each section that has feedback, provide a revised version. Return your response as a JSON array with this structure:
+
+        {
+        "revisions": [
+            {
+            "sectionId": "sec-1",
+            "revisedText": "The complete revised text for this section"
+            },
+            {
+            "sectionId": "sec-2",
+            "revisedText": "The complete revised text for this section"
+            }
+        ]
+        }
+
+        Guidelines:
+        1. Only revise sections that have student feedback
+        2. Fix typos and calculation errors mentioned
+        3. Add clarification where students are confused
+        4. Maintain consistency across all sections
+        5. Keep the same general structure and flow
+        6. Preserve technical accuracy
+
+        Return ONLY valid JSON, no other text.
+    """
+
+# Closes the feedback suffix, since the task itself is now in the prefix
+RESPONSE_REMINDER = "\nRevise the sections above following the TASK. Return ONLY valid JSON, no other text.\n"
+
+
+class Prompt(NamedTuple):
+    """A prompt split for Anthropic prompt caching.
+
+    prefix only depends on the lecture version (instructions, title and
+    lecture text), so it is byte-identical on every regeneration and is
+    sent as a cache_control block; suffix carries the current feedback.
+    """
+    prefix: str
+    suffix: str
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+    def messages(self) -> List[Dict[str, Any]]:
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": self.prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": self.suffix},
+            ],
+        }]
+
+
+def configure_planner(token_budget: int = 60000, concurrency: int = 4) -> None:
+    global prompt_token_budget, fanout_concurrency
+    prompt_token_budget = token_budget
+    fanout_concurrency = concurrency
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_lecture_content(lecture: Dict[str, Any]) -> str:
+    """Every section once, tagged with its ID."""
+    parts = ["FULL LECTURE CONTENT:\n"]
+    for i, sec in enumerate(lecture["sections"], 1):
+        parts.append(f"\n--- Section {i} (ID: {sec['id']}) ---\n{sec['text']}\n")
+    return "".join(parts)
+
+
+def format_lecture_outline(lecture: Dict[str, Any]) -> str:
+    """Shared summary of the whole lecture used when it is split into groups."""
+    parts = ["LECTURE OUTLINE (opening of every section, for context):\n"]
+    for i, sec in enumerate(lecture["sections"], 1):
+        snippet = " ".join(sec["text"].split())
+        if len(snippet) > OUTLINE_SNIPPET_CHARS:
+            snippet = snippet[:OUTLINE_SNIPPET_CHARS].rsplit(" ", 1)[0] + " ..."
+        parts.append(f"  {i}. [{sec['id']}] {snippet}\n")
+    return "".join(parts)
+
+
+def _format_reports(label: str, reactions: List[Dict[str, Any]]) -> str:
+    """Near-duplicate comments are listed once with the number of students."""
+    parts = [f"  {label} ({len(reactions)}):\n"]
+    clusters = [c for c in cluster_comments(reactions) if c["representative"]]
+    for j, cluster in enumerate(clusters, 1):
+        times = f" ({cluster['count']} students)" if cluster["count"] > 1 else ""
+        parts.append(f"    {j}. {cluster['representative']}{times}\n")
+    return "".join(parts)
+
+
+def format_section_feedback(index: int, item: Dict[str, Any]) -> str:
+    section = item['section']
+    reactions = item['reactions']
+    if len(reactions) == 0:
+        return ""
+
+    parts = [f"SECTION {index} (ID: {section['id']}) FEEDBACK:\n"]
+    typos = [r for r in reactions if r['type'] == 'typo']
+    confusions = [r for r in reactions if r['type'] == 'confused']
+    calc_errors = [r for r in reactions if r['type'] == 'calculation_error']
+    if typos:
+        parts.append(_format_reports("Typo Reports", typos))
+    if confusions:
+        parts.append(_format_reports("Confusion Reports", confusions))
+    if calc_errors:
+        parts.append(_format_reports("Calculation Error Reports", calc_errors))
+    parts.append("\n")
+    return "".join(parts)
+
+
+def _section_numbers(lecture: Dict[str, Any]) -> Dict[str, int]:
+    return {sec["id"]: i for i, sec in enumerate(lecture["sections"], 1)}
+
+
+def build_full_prompt(lecture: Dict[str, Any],
+                      sections_with_reactions: List[Dict[str, Any]]) -> Prompt:
+    """Single prompt: instructions and the lecture once (the cached prefix),
+    then the IDs to revise and the feedback."""
+    numbers = _section_numbers(lecture)
+    to_revise = ", ".join(item['section']['id'] for item in sections_with_reactions)
+    prefix = "".join([
+        INTRO,
+        TASK_INSTRUCTIONS,
+        DIVIDER,
+        f"LECTURE TITLE: {lecture['title']}\n\n",
+        format_lecture_content(lecture),
+    ])
+    parts = [
+        DIVIDER,
+        f"SECTIONS THAT NEED TO BE REVISED (by ID): {to_revise}\n",
+        DIVIDER,
+        "STUDENT FEEDBACK BY SECTION:\n\n",
+    ]
+    for item in sections_with_reactions:
+        parts.append(format_section_feedback(numbers.get(item['section']['id'], 0), item))
+    parts.append(RESPONSE_REMINDER)
+    return Prompt(prefix, "".join(parts))
+
+
+def _format_group_section(number: int, section: Dict[str, Any]) -> str:
+    return f"\n--- Section {number} (ID: {section['id']}) ---\n{section['text']}\n"
+
+
+def build_group_prompt(lecture: Dict[str, Any],
+                       group: List[Dict[str, Any]],
+                       outline: str) -> Prompt:
+    """Prompt for one group: the lecture outline (the prefix, shared by every
+    group) plus the full text and feedback of the group only."""
+    numbers = _section_numbers(lecture)
+    prefix = "".join([
+        INTRO,
+        TASK_INSTRUCTIONS,
+        DIVIDER,
+        f"LECTURE TITLE: {lecture['title']}\n\n",
+        outline,
+    ])
+    parts = [
+        DIVIDER,
+        "SECTIONS TO REVISE IN THIS PART (full text):\n",
+    ]
+    for item in group:
+        section = item['section']
+        parts.append(_format_group_section(numbers.get(section['id'], 0), section))
+    parts.append(DIVIDER)
+    parts.append("STUDENT FEEDBACK BY SECTION:\n\n")
+    for item in group:
+        parts.append(format_section_feedback(numbers.get(item['section']['id'], 0), item))
+    parts.append(RESPONSE_REMINDER)
+    return Prompt(prefix, "".join(parts))
+
+
+@timed("plan_prompts")
+def plan_prompts(lecture: Dict[str, Any],
+                 sections_with_reactions: List[Dict[str, Any]],
+                 token_budget: int = None) -> List[Prompt]:
+    """One prompt if the whole lecture fits the budget, otherwise one prompt
+    per group of sections, each group packed up to the budget. A single
+    section with feedback still gets a group prompt (outline plus that
+    section) rather than the whole lecture."""
+    token_budget = token_budget or prompt_token_budget
+    full = build_full_prompt(lecture, sections_with_reactions)
+    if estimate_tokens(full.text) <= token_budget or not sections_with_reactions:
+        return [full]
+
+    outline = format_lecture_outline(lecture)
+    numbers = _section_numbers(lecture)
+    # Everything a group prompt carries besides its sections
+    overhead = estimate_tokens(build_group_prompt(lecture, [], outline).text)
+    capacity = max(token_budget - overhead, 1)
+
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for item in sections_with_reactions:
+        number = numbers.get(item['section']['id'], 0)
+        cost = estimate_tokens(
+            _format_group_section(number, item['section'])
+            + format_section_feedback(number, item)
+        )
+        if current and used + cost > capacity:
+            groups.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        groups.append(current)
+    return [build_group_prompt(lecture, group, outline) for group in groups]
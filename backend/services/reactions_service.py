@@ -1,10 +1,49 @@
-from typing import List, Dict, Any
+import hashlib
+import itertools
+import json
+import time
+from typing import List, Dict, Any, Optional, Tuple
 
-from models.data_store import reactions, sections
+from models import data_store
+from models.reaction_counters import REACTION_TYPES, ReactionCounters
+from models.reaction_timeline import RESOLUTIONS
+from services.changes_service import record_reaction_change
+from services.lectures_service import get_lecture
+from services.pregeneration_service import note_reaction
 from utils.id_utils import new_uuid
-from utils.time_utils import now_iso
+from utils.locks import KeyedLocks
+from utils.metrics import timed
+from utils.ttl_cache import TTLCache
+from utils.time_utils import epoch_seconds, iso_from_epoch, now_iso, parse_iso, to_iso
 
+# Batched ingestion: items per request, and replayable results per idempotency key
+BATCH_MAX_ITEMS = 500
+batch_results = TTLCache(max_entries=10000, ttl=24 * 3600)
+batch_locks = KeyedLocks()
 
+
+class IdempotencyKeyReused(Exception):
+    """An idempotency key was sent again with a different batch."""
+
+
+def configure_reaction_batches(max_items: int = 500,
+                               idempotency_max_keys: int = 10000,
+                               idempotency_ttl: float = 24 * 3600) -> None:
+    global BATCH_MAX_ITEMS, batch_results
+    BATCH_MAX_ITEMS = max_items
+    batch_results = TTLCache(max_entries=idempotency_max_keys, ttl=idempotency_ttl)
+
+
+def _store_reactions(rows: List[Dict[str, Any]]) -> None:
+    data_store.reactions_repo.insert_many(rows)
+    for reaction in rows:
+        data_store.reaction_counters.record_created(reaction)
+        data_store.reaction_timeline.record_created(reaction)
+        record_reaction_change(reaction)
+        note_reaction(reaction)
+
+
+@timed("create_reaction")
 def create_reaction(user_id: str,
                     lecture_id: str,
                     section_id: str,
@@ -20,30 +59,259 @@ def create_reaction(user_id: str,
         "comment": comment or "",
         "createdAt": now_iso(),
     }
-    reactions.append(reaction)
+    data_store.reactions_repo.insert(reaction)
+    data_store.reaction_counters.record_created(reaction)
+    data_store.reaction_timeline.record_created(reaction)
+    record_reaction_change(reaction)
+    note_reaction(reaction)
     return reaction
 
 
+def _validate_batch(items: List[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Reaction rows for the valid items and {"index", "error"} for the rest.
+
+    Each distinct lecture is loaded once and its section ids kept as a set.
+    An item may carry the client-side "createdAt" of the click; it is
+    normalised, and timestamps in the future are clamped to now.
+    """
+    now = now_iso()
+    section_ids: Dict[str, Optional[set]] = {}
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Reaction must be an object"})
+            continue
+        lecture_id = item.get("lectureId")
+        if item.get("type") not in REACTION_TYPES:
+            errors.append({"index": index, "error": "Invalid reaction type"})
+            continue
+        # Checked before the lookups below, which need hashable ids
+        if not isinstance(lecture_id, str) or not isinstance(item.get("sectionId"), str):
+            errors.append({"index": index, "error": "lectureId and sectionId must be strings"})
+            continue
+        if lecture_id not in section_ids:
+            lecture = get_lecture(lecture_id)
+            section_ids[lecture_id] = (
+                {s["id"] for s in lecture["sections"]} if lecture else None
+            )
+        sections = section_ids[lecture_id]
+        if sections is None:
+            errors.append({"index": index, "error": "Lecture not found"})
+            continue
+        if item.get("sectionId") not in sections:
+            errors.append({"index": index, "error": "Section not found"})
+            continue
+        created_at = now
+        if item.get("createdAt"):
+            try:
+                created_at = to_iso(min(parse_iso(item["createdAt"]), parse_iso(now)))
+            except ValueError:
+                errors.append({"index": index, "error": "Invalid createdAt"})
+                continue
+        rows.append({
+            "id": new_uuid(),
+            "lectureId": lecture_id,
+            "sectionId": item["sectionId"],
+            "userId": item.get("userId"),
+            "addressed": False,
+            "type": item["type"],
+            "comment": item.get("comment") or "",
+            "createdAt": created_at,
+        })
+    return rows, errors
+
+
+@timed("create_reactions_batch")
+def create_reactions_batch(items: List[Any],
+                           idempotency_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """Validate a batch of reactions in one pass and store the valid ones
+    together.
+
+    Returns ({"created": [...], "errors": [...]}, replayed). With an
+    idempotency key, the first result is remembered and a retry of the same
+    batch gets it back (replayed=True) instead of creating duplicates;
+    reusing the key for a different batch raises IdempotencyKeyReused.
+    """
+    if idempotency_key is None:
+        rows, errors = _validate_batch(items)
+        _store_reactions(rows)
+        return {"created": rows, "errors": errors}, False
+
+    fingerprint = hashlib.sha1(
+        json.dumps(items, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    # Concurrent retries of one key wait for the first attempt's result
+    with batch_locks.get(idempotency_key):
+        cached = batch_results.get(idempotency_key)
+        if cached is not None:
+            if cached[0] != fingerprint:
+                raise IdempotencyKeyReused(idempotency_key)
+            return cached[1], True
+        rows, errors = _validate_batch(items)
+        _store_reactions(rows)
+        result = {"created": rows, "errors": errors}
+        batch_results.set(idempotency_key, (fingerprint, result))
+        return result, False
+
+
+def _archived_reactions(lecture_id: str,
+                        hot: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Addressed reactions of a lecture paged in from the cold store,
+    minus any still in hot (mid-compaction) or archived twice (seed rows
+    archived again after a restart)."""
+    cold = data_store.cold_store
+    key = f"reactions:{lecture_id}"
+    if cold is None or key not in cold:
+        return []
+    seen = {r["id"] for r in hot}
+    archived = []
+    for r in cold.get(key):
+        if r["id"] not in seen:
+            seen.add(r["id"])
+            archived.append(r)
+    return archived
+
+
 def get_reactions_by_user_and_lecture(user_id: str,
                                       lecture_id: str) -> List[Dict[str, Any]]:
-    return [
-        r for r in reactions
-        if r["lectureId"] == lecture_id and r["userId"] == user_id
-    ]
+    hot = data_store.reactions_repo.find(lectureId=lecture_id, userId=user_id)
+    archived = _archived_reactions(lecture_id, hot)
+    return [r for r in archived if r["userId"] == user_id] + hot
 
 
-def get_reactions_for_lecture(lecture_id: str) -> List[Dict[str, Any]]:
-    return [r for r in reactions if r["lectureId"] == lecture_id]
+def get_reactions_for_lecture(lecture_id: str,
+                              include_archived: bool = True) -> List[Dict[str, Any]]:
+    """Reactions of a lecture; archived (addressed) ones first unless
+    include_archived is off."""
+    hot = data_store.reactions_repo.find(lectureId=lecture_id)
+    if not include_archived:
+        return hot
+    return _archived_reactions(lecture_id, hot) + hot
 
 
 def get_reactions_for_section(section_id: str) -> List[Dict[str, Any]]:
+    """Reactions of a section still in memory (not the archived ones)."""
+    return data_store.reactions_repo.find(sectionId=section_id)
+
+
+def get_unaddressed_reactions_for_section(lecture_id: str,
+                                          section_id: str) -> List[Dict[str, Any]]:
+    return data_store.reactions_repo.find(
+        lectureId=lecture_id, sectionId=section_id, addressed=False
+    )
+
+
+def mark_reactions_addressed_for_section(lecture_id: str, section_id: str) -> None:
+    for r in data_store.reactions_repo.find(lectureId=lecture_id, sectionId=section_id):
+        if not r["addressed"]:
+            data_store.reactions_repo.update(r, addressed=True)
+            data_store.reaction_counters.record_addressed(r)
+            record_reaction_change(r)
+
+
+def get_reaction_counts_for_lecture(lecture_id: str) -> Dict[str, Any]:
+    """Lecture totals plus per-section counts, read from the aggregate store."""
+    counters = data_store.reaction_counters
+    return {
+        "lectureId": lecture_id,
+        "totals": counters.lecture_counts(lecture_id),
+        "sections": counters.section_counts(lecture_id),
+    }
+
+
+def get_feedback_timeline(lecture_id: str,
+                          start: Optional[str] = None,
+                          end: Optional[str] = None,
+                          resolution: Optional[str] = None,
+                          top: int = 5,
+                          rank_type: str = "confused") -> Dict[str, Any]:
+    """Heatmap of reactions per time bucket and section for [start, end).
+
+    The window defaults to the last hour. Without a resolution, per-minute
+    buckets are used while the window still lies within the minute ring
+    and per-hour buckets otherwise. "topSections" ranks sections by their
+    rank_type reactions in the window (total as tie-breaker). Raises
+    ValueError for bad timestamps, resolutions or reaction types.
+    """
+    now = int(time.time())
+    end_s = epoch_seconds(parse_iso(end)) if end else now
+    start_s = epoch_seconds(parse_iso(start)) if start else end_s - 3600
+    if start_s >= end_s:
+        raise ValueError("start must be before end")
+    if rank_type not in REACTION_TYPES:
+        raise ValueError(f"Unknown reaction type: {rank_type}")
+    if resolution is None:
+        width, size = RESOLUTIONS["minute"]
+        resolution = "minute" if max(now, end_s) - start_s <= width * size else "hour"
+    elif resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    buckets = data_store.reaction_timeline.buckets(lecture_id, resolution, start_s, end_s)
+    sections: Dict[str, Dict[str, Any]] = {}
+    for _, bucket in buckets:
+        for section_id, counts in bucket.items():
+            totals = sections.setdefault(
+                section_id, {"total": 0, "byType": {t: 0 for t in REACTION_TYPES}}
+            )
+            for rtype, n in counts.items():
+                totals["total"] += n
+                totals["byType"][rtype] = totals["byType"].get(rtype, 0) + n
+    ranked = sorted(
+        sections.items(),
+        key=lambda item: (item[1]["byType"].get(rank_type, 0), item[1]["total"]),
+        reverse=True,
+    )
+    return {
+        "lectureId": lecture_id,
+        "resolution": resolution,
+        "from": iso_from_epoch(start_s),
+        "to": iso_from_epoch(end_s),
+        "buckets": [
+            {"start": iso_from_epoch(bucket_start), "sections": bucket}
+            for bucket_start, bucket in buckets
+        ],
+        "sections": sections,
+        "topSections": [
+            {"sectionId": section_id, "count": totals["byType"].get(rank_type, 0),
+             "total": totals["total"]}
+            for section_id, totals in ranked[:max(top, 0)]
+            if totals["byType"].get(rank_type, 0) > 0
+        ],
+    }
+
+
+def get_section_ids_with_unaddressed_reactions(lecture_id: str) -> List[str]:
     return [
-        r for r in reactions
-        if r["sectionId"] == section_id
+        section_id
+        for section_id, counts in data_store.reaction_counters.section_counts(lecture_id).items()
+        if counts["unaddressed"] > 0
     ]
 
 
-def mark_reactions_addressed_for_section(lecture_id: str, section_id: str) -> None:
-    for r in reactions:
-        if r["lectureId"] == lecture_id and r["sectionId"] == section_id:
-            r["addressed"] = True
+def verify_reaction_counters(repair: bool = True) -> bool:
+    """Rebuild counters from the raw reactions and compare with the live ones.
+
+    Returns True when they match. On mismatch the rebuilt counters replace
+    the live ones if repair is set.
+    """
+    reactions = data_store.reactions_repo.all()
+    if data_store.cold_store is not None:
+        # Archived reactions of versions a restart lost aren't counted
+        known: Dict[str, bool] = {}
+
+        def lecture_exists(lecture_id: str) -> bool:
+            if lecture_id not in known:
+                known[lecture_id] = data_store.lecture_store.get_metadata(lecture_id) is not None
+            return known[lecture_id]
+
+        archived = (
+            r for r in data_store.cold_store.scan("reactions:") if lecture_exists(r["lectureId"])
+        )
+        # Hot rows first: one archived in between shows up twice, not never
+        chained = itertools.chain(reactions, archived)
+        reactions = {r["id"]: r for r in chained}.values()
+    rebuilt = ReactionCounters.rebuild(reactions)
+    consistent = rebuilt.snapshot() == data_store.reaction_counters.snapshot()
+    if not consistent and repair:
+        data_store.reaction_counters = rebuilt
+    return consistent
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from models import data_store
+from services.reactions_service import verify_reaction_counters
+from utils.memory import deep_sizeof
+from utils.metrics import timed
+from utils.time_utils import epoch_seconds, parse_iso
+
+logger = logging.getLogger(__name__)
+
+# Settings for compact() (see configure_retention)
+_settings: Dict[str, Any] = {
+    "reaction_min_age_seconds": 3600.0,
+    "keep_versions": 1,
+    "measure": True,
+}
+_compact_lock = threading.Lock()
+_stop: Optional[threading.Event] = None
+last_report: Optional[Dict[str, Any]] = None
+
+
+def hot_set_bytes() -> Dict[str, int]:
+    """Approximate memory of the tiers compaction shrinks."""
+    store = data_store.lecture_store
+    sizes = {
+        "reactions": deep_sizeof(data_store.reactions_repo),
+        "lectureVersions": deep_sizeof(store.lectures_repo),
+        "sectionBlobs": deep_sizeof(store.blobs_repo),
+        "archivedVersionIndex": deep_sizeof(store.archived_repo),
+    }
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+def _compact_reactions(cutoff: float) -> int:
+    cold = data_store.cold_store
+    repo = data_store.reactions_repo
+    moved = 0
+    for lecture_id in repo.values("lectureId"):
+        rows = [
+            r for r in repo.find(lectureId=lecture_id, addressed=True)
+            if epoch_seconds(parse_iso(r["createdAt"])) <= cutoff
+        ]
+        if not rows:
+            continue
+        # Addressed reactions never change again, so the cold copy is final
+        cold.append(f"reactions:{lecture_id}", rows)
+        for r in rows:
+            repo.delete(r)
+        moved += len(rows)
+    return moved
+
+
+def _compact_versions(keep_versions: int) -> Dict[str, int]:
+    store = data_store.lecture_store
+    old_ids = []
+    for base_id in store.lectures_repo.values("baseLectureId"):
+        versions = sorted(
+            store.lectures_repo.find(baseLectureId=base_id, isCurrent=False),
+            key=lambda row: row["version"], reverse=True,
+        )
+        old_ids.extend(row["id"] for row in versions[keep_versions:])
+    return store.archive(old_ids)
+
+
+@timed("compact_hot_set")
+def compact() -> Dict[str, Any]:
+    """Move addressed reactions older than reaction_min_age_seconds and all
+    but the newest keep_versions non-current versions of each lecture to
+    the cold store.
+
+    Returns a report with what was moved and, when measuring, the hot-set
+    memory before and after. Does nothing without a cold store.
+    """
+    global last_report
+    if data_store.cold_store is None:
+        return {"enabled": False}
+    with _compact_lock:
+        start = time.perf_counter()
+        before = hot_set_bytes() if _settings["measure"] else None
+        cutoff = time.time() - _settings["reaction_min_age_seconds"]
+        reactions = _compact_reactions(cutoff)
+        # Deleted columnar rows keep their slots until the store is rebuilt
+        rebuilt = data_store.compact_reactions()
+        versions = _compact_versions(_settings["keep_versions"])
+        report = {
+            "enabled": True,
+            "reactionsArchived": reactions,
+            "reactionStoreRebuilt": rebuilt,
+            "versionsArchived": versions["versions"],
+            "blobsDropped": versions["blobs"],
+            "hotBytesBefore": before,
+            "hotBytesAfter": hot_set_bytes() if _settings["measure"] else None,
+            "coldStore": data_store.cold_store.stats(),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        last_report = report
+    return report
+
+
+def _run_periodically(interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            compact()
+        except Exception:
+            logger.exception("Error compacting the hot set")
+
+
+def configure_retention(enabled: bool = False,
+                        path: str = "cold_store.bin",
+                        interval_seconds: Optional[float] = 600.0,
+                        reaction_min_age_seconds: float = 3600.0,
+                        keep_versions: int = 1,
+                        frame_cache_size: int = 64,
+                        measure: bool = True,
+                        reset: bool = False) -> None:
+    """Set up the cold store at path and compact every interval_seconds.
+
+    An existing cold store is reopened, so what earlier runs archived stays
+    readable and counted; reset=True empties it instead.
+    interval_seconds=None only compacts on explicit compact() calls.
+    measure=False skips the hot-set memory walk (it visits every row).
+    Call after configure_storage; only the memory backend keeps these rows
+    in memory.
+    """
+    global _stop
+    if _stop is not None:
+        _stop.set()
+        _stop = None
+    _settings.update(
+        reaction_min_age_seconds=reaction_min_age_seconds,
+        keep_versions=keep_versions,
+        measure=measure,
+    )
+    data_store.configure_cold_store(
+        path if enabled else None, cache_size=frame_cache_size, reset=reset
+    )
+    if enabled and not reset:
+        # Counters are built from the hot rows; add the archived reactions
+        verify_reaction_counters(repair=True)
+    if enabled and interval_seconds:
+        _stop = threading.Event()
+        threading.Thread(
+            target=_run_periodically, args=(interval_seconds, _stop),
+            name="retention-compact", daemon=True,
+        ).start()
+
+
+def get_retention_stats() -> Dict[str, Any]:
+    cold = data_store.cold_store
+    return {
+        "enabled": cold is not None,
+        "coldStore": cold.stats() if cold is not None else None,
+        "lastCompaction": last_report,
+    }
@@ -1,165 +1,369 @@
-from typing import Optional, List, Dict, Any
-import anthropic
-import re, json, os
-from dotenv import load_dotenv
-from models.data_store import suggestions, lectures, sections, reactions
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+import re, json
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models import data_store
 from utils.id_utils import new_uuid
 from utils.time_utils import now_iso
 from services.lectures_service import get_lecture, get_section
-from services.reactions_service import get_reactions_for_section
+from services.reactions_service import get_unaddressed_reactions_for_section
+from services.changes_service import record_suggestion_change
+from services.ai_client import get_client
+from services.ai_gateway import GatewaySaturated, get_gateway, is_api_error
+from utils.ttl_cache import TTLCache
+from utils.json_stream import RevisionStreamParser
+from utils.metrics import timed, record_anthropic_call, record_parse_failure
+from services import prompt_planner
+from services.prompt_planner import Prompt, build_full_prompt, plan_prompts
+
+logger = logging.getLogger(__name__)
+
+# Model revisions keyed by a hash of the exact prompt inputs
+revisions_cache = TTLCache(max_entries=256, ttl=3600)
+
+
+def configure_revisions_cache(max_entries: int = 256, ttl: Optional[float] = 3600) -> None:
+    global revisions_cache
+    revisions_cache = TTLCache(max_entries=max_entries, ttl=ttl)
 
-load_dotenv()
-MY_KEY = os.getenv('API_KEY')
-client = anthropic.Anthropic(api_key=MY_KEY)
 
 def get_suggestion_by_id(suggestion_id: str) -> Optional[Dict[str, Any]]:
-    return next((s for s in suggestions if s["id"] == suggestion_id), None)
+    return data_store.suggestions_repo.get(suggestion_id)
 
 
-def build_prompt(lecture: Any, sections_with_reactions: List[Dict[str, Any]]):
-    prompt_parts = [
-        "You are helping a professor improve their lecture content based on student feedback.\n\n",
-        f"LECTURE TITLE: {lecture['title']}\n\n",
-        "FULL LECTURE CONTENT:\n"
-    ]
+def get_suggestions_for_lecture(lecture_id: str) -> List[Dict[str, Any]]:
+    return data_store.suggestions_repo.find(lectureId=lecture_id)
 
-    for sec_id in lecture["sections"]:
-        sec = get_section(sec_id)
-        prompt_parts.append(f"{sec['text']}\n")
-    
-    prompt_parts.append("\n" + "="*80 + "\n\n")
-    prompt_parts.append("HERE ARE ALL THE SECTIONS FROM THE FULL LECTURE CONTENT THAT NEED TO BE REVISED:\n\n")
-
-    # Add all section texts for context
-    for i, item in enumerate(sections_with_reactions, 1):
-        section = item['section']
-        prompt_parts.append(f"\n--- Section {i} (ID: {section['id']}) ---\n")
-        prompt_parts.append(f"{section['text']}\n")
-
-    prompt_parts.append("\n" + "="*80 + "\n\n")
-    prompt_parts.append("STUDENT FEEDBACK BY SECTION:\n\n")
-
-    for i, item in enumerate(sections_with_reactions, 1):
-        section = item['section']
-        reactions = item['reactions']
-        
-        if len(reactions) == 0:
-            continue
-            
-        prompt_parts.append(f"SECTION {i} (ID: {section['id']}) FEEDBACK:\n")
-        
-        typos = [r for r in reactions if r['type'] == 'typo']
-        confusions = [r for r in reactions if r['type'] == 'confused']
-        calc_errors = [r for r in reactions if r['type'] == 'calculation_error']
-        
-        if typos:
-            prompt_parts.append(f"  Typo Reports ({len(typos)}):\n")
-            for j, r in enumerate(typos, 1):
-                if r.get('comment'):
-                    prompt_parts.append(f"    {j}. {r['comment']}\n")
-        
-        if confusions:
-            prompt_parts.append(f"  Confusion Reports ({len(confusions)}):\n")
-            for j, r in enumerate(confusions, 1):
-                if r.get('comment'):
-                    prompt_parts.append(f"    {j}. {r['comment']}\n")
-        
-        if calc_errors:
-            prompt_parts.append(f"  Calculation Error Reports ({len(calc_errors)}):\n")
-            for j, r in enumerate(calc_errors, 1):
-                if r.get('comment'):
-                    prompt_parts.append(f"    {j}. {r['comment']}\n")
-        
-        prompt_parts.append("\n")
-    
-    prompt_parts.append("""
-        TASK:
-        For each section that has feedback, provide a revised version. Return your response as a JSON array with this structure:
-
-        {
-        "revisions": [
-            {
-            "sectionId": "sec-1",
-            "revisedText": "The complete revised text for this section"
-            },
-            {
-            "sectionId": "sec-2",
-            "revisedText": "The complete revised text for this section"
-            }
-        ]
-        }
 
-        Guidelines:
-        1. Only revise sections that have student feedback
-        2. Fix typos and calculation errors mentioned
-        3. Add clarification where students are confused
-        4. Maintain consistency across all sections
-        5. Keep the same general structure and flow
-        6. Preserve technical accuracy
+def update_suggestion(suggestion: Dict[str, Any], **changes: Any) -> Dict[str, Any]:
+    previous_lecture_id = suggestion["lectureId"]
+    suggestion = data_store.suggestions_repo.update(suggestion, **changes)
+    record_suggestion_change(suggestion, previous_lecture_id)
+    return suggestion
 
-        Return ONLY valid JSON, no other text.
-    """)
-    
-    return "".join(prompt_parts)
 
-def generate_suggestions_for_lecture(lecture: Any,
-                                     sections: List[Any]
-                                     ) -> List[Dict[str, Any]]:
-    """Simple heuristic: if a section has >= min_reactions, create a suggestion."""
-    if not lecture:
-        return []
+def transition_suggestion(suggestion: Dict[str, Any],
+                          from_statuses: Tuple[str, ...],
+                          **changes: Any) -> bool:
+    """Apply changes only if the suggestion's stored status is one of
+    from_statuses; False means someone else already moved it on."""
+    for status in from_statuses:
+        if data_store.suggestions_repo.compare_and_update(
+            suggestion, {"status": status}, **changes
+        ):
+            record_suggestion_change(suggestion)
+            return True
+    return False
 
-    suggestions = []
-    sections_with_reactions = []
 
+def queue_approved_update(suggestion: Dict[str, Any]) -> Dict[str, Any]:
+    approved_update = {
+        "lectureId": suggestion["lectureId"],
+        "sectionId": suggestion["sectionId"],
+        "suggestedText": suggestion["suggestedText"],
+        "suggestionId": suggestion["id"],
+    }
+    return data_store.approved_updates_repo.insert(approved_update)
+
+
+def get_approved_updates_for_lecture(lecture_id: str) -> List[Dict[str, Any]]:
+    return data_store.approved_updates_repo.find(lectureId=lecture_id)
+
+
+def clear_approved_updates_for_lecture(lecture_id: str) -> None:
+    remove_approved_updates(data_store.approved_updates_repo.find(lectureId=lecture_id))
+
+
+def remove_approved_updates(updates: List[Dict[str, Any]]) -> None:
+    for update in updates:
+        data_store.approved_updates_repo.delete(update)
+
+
+def has_approved_update(suggestion_id: str) -> bool:
+    """True while an approved suggestion is queued and not yet published."""
+    return bool(data_store.approved_updates_repo.find(suggestionId=suggestion_id))
+
+
+def remove_approved_update_for_suggestion(suggestion_id: str) -> None:
+    remove_approved_updates(data_store.approved_updates_repo.find(suggestionId=suggestion_id))
+
+
+@timed("build_prompt")
+def build_prompt(lecture: Any, sections_with_reactions: List[Dict[str, Any]]) -> Prompt:
+    """Whole-lecture prompt as a cacheable prefix and a feedback suffix;
+    see prompt_planner for the split version."""
+    return build_full_prompt(lecture, sections_with_reactions)
+
+
+def request_revisions(model_client: Any,
+                      prompt: Prompt,
+                      teacher_id: Optional[str] = None,
+                      admitted: bool = False) -> List[Dict[str, Any]]:
+    """One model call through the AI gateway (admission, limits, retries).
+    admitted: the caller holds a teacher slot from gateway.teacher_slots()."""
+    def create():
+        start = time.perf_counter()
+        message = model_client.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=8096,
+            messages=prompt.messages()
+        )
+        record_anthropic_call("create", time.perf_counter() - start, getattr(message, "usage", None))
+        return message
+
+    message = get_gateway().call(teacher_id, "create", create, admitted)
+    try:
+        return parse_revisions(message.content[0].text)
+    except (json.JSONDecodeError, KeyError):
+        record_parse_failure("create")
+        raise
+
+
+def request_revisions_for_prompts(model_client: Any,
+                                  prompts: List[Prompt],
+                                  teacher_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run one request per prompt and merge the revisions in prompt order,
+    keeping one per section.
+
+    The generation is admitted by the gateway once; it then runs at most
+    fanout_concurrency calls at a time, and no more than the teacher slots
+    it got, so no group can be turned away after others were paid for.
+    """
+    if len(prompts) == 1:
+        return request_revisions(model_client, prompts[0], teacher_id)
+
+    gateway = get_gateway()
+    wanted = min(prompt_planner.fanout_concurrency, len(prompts))
+    with gateway.teacher_slots(teacher_id, wanted) as workers:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-fanout") as pool:
+            results = list(pool.map(
+                lambda p: request_revisions(model_client, p, teacher_id, admitted=True),
+                prompts,
+            ))
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for revisions in results:
+        for rev in revisions:
+            merged.setdefault(rev["sectionId"], rev)
+    return list(merged.values())
+
+def collect_sections_with_reactions(lecture: Dict[str, Any],
+                                    sections: List[Any]) -> List[Dict[str, Any]]:
+    """Pair each section with its unaddressed reactions, skipping quiet sections."""
+    sections_with_reactions = []
     for sec in sections:
-        sec_reactions = get_reactions_for_section(sec["id"])
+        sec_reactions = get_unaddressed_reactions_for_section(lecture["id"], sec["id"])
         if len(sec_reactions) == 0:
             continue
         sections_with_reactions.append({
             'section': sec,
             'reactions': sec_reactions
         })
-    
-    prompt = build_prompt(lecture, sections_with_reactions)
-    
-    try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=8096,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+    return sections_with_reactions
+
+
+def revisions_cache_key(lecture: Dict[str, Any],
+                        sections_with_reactions: List[Dict[str, Any]]) -> str:
+    """Hash of everything build_prompt sees: title, section texts and the
+    exact set of reactions. Any new reaction or edited section changes it."""
+    payload = {
+        "title": lecture["title"],
+        "sections": [[s["id"], s.get("text")] for s in lecture["sections"]],
+        "feedback": [
+            [item["section"]["id"],
+             sorted([r["id"], r["type"], r.get("comment", "")] for r in item["reactions"])]
+            for item in sections_with_reactions
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def parse_revisions(response: str) -> List[Dict[str, Any]]:
+    cleaned = re.sub(r'```json\n?', '', response)
+    cleaned = re.sub(r'```\n?', '', cleaned).strip()
+    result = json.loads(cleaned)
+    return [
+        {"sectionId": rev['sectionId'], "revisedText": rev['revisedText']}
+        for rev in result.get('revisions', [])
+    ]
+
+
+def store_suggestions(lecture: Dict[str, Any],
+                      revisions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Save revisions as pending suggestions, reusing an identical pending one."""
+    suggestions = []
+    for rev in revisions:
+        section_id = rev['sectionId']
+        section = get_section(lecture, section_id)
+        if not section:
+            continue
+        revised_text = rev['revisedText']
+        existing = next(
+            (s for s in data_store.suggestions_repo.find(
+                lectureId=lecture["id"], sectionId=section_id, status="pending")
+             if s["suggestedText"] == revised_text),
+            None,
         )
-        
-        response = message.content[0].text
-        cleaned = re.sub(r'```json\n?', '', response)
-        cleaned = re.sub(r'```\n?', '', cleaned).strip()
-        result = json.loads(cleaned)
-        revisions = result.get('revisions', [])
+        if existing:
+            suggestions.append(existing)
+            continue
+        suggestion = {
+            "id": new_uuid(),
+            "lectureId": lecture["id"],
+            "sectionId": section_id,
+            "originalText": section["text"],
+            "suggestedText": revised_text,
+            "status": "pending",
+            "createdAt": now_iso()
+        }
+        data_store.suggestions_repo.insert(suggestion)
+        record_suggestion_change(suggestion)
+        suggestions.append(suggestion)
+    return suggestions
 
-        for rev in revisions:
-            section_id = rev['sectionId']
-            section = get_section(section_id)
-            revised_text = rev['revisedText']
-            suggestion = {
-                "id": new_uuid(),
-                "lectureId": lecture["id"],
-                "sectionId": section_id,
-                "originalText": section["text"],
-                "suggestedText": revised_text,
-                "status": "pending",
-                "createdAt": now_iso()
-            }
-            suggestions.append(suggestion)
-        return suggestions
-    except(json.JSONDecodeError, KeyError) as e:
-        print(f"Error generating suggestion: {e}")
+
+def undecided_revisions(lecture: Dict[str, Any],
+                        revisions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cached revisions minus those whose suggestion the teacher already
+    accepted or rejected (the cache outlives those decisions)."""
+    decided = {
+        (s["sectionId"], s["suggestedText"])
+        for s in data_store.suggestions_repo.find(lectureId=lecture["id"])
+        if s["status"] in ("accepted", "rejected")
+    }
+    return [rev for rev in revisions if (rev["sectionId"], rev["revisedText"]) not in decided]
+
+
+@timed("generate_suggestions_for_lecture")
+def generate_suggestions_for_lecture(lecture: Any,
+                                     sections: List[Any],
+                                     model_client: Any = None,
+                                     cancel_event: Optional[threading.Event] = None
+                                     ) -> List[Dict[str, Any]]:
+    """Ask Claude to revise the sections with feedback and store the results
+    as pending suggestions.
+
+    Revisions are cached by revisions_cache_key, so asking again with the
+    same sections and feedback does not call the model.
+    model_client overrides the shared Anthropic client (e.g. a stub).
+    If cancel_event is set by the time the model answers, nothing is stored.
+    Model calls go through the AI gateway, which raises GatewaySaturated when
+    too many calls are waiting and ModelUnavailable when retries run out.
+    """
+    if not lecture:
+        return []
+    model_client = model_client or get_client()
+
+    sections_with_reactions = collect_sections_with_reactions(lecture, sections)
+    cache_key = revisions_cache_key(lecture, sections_with_reactions)
+    revisions = revisions_cache.get(cache_key)
+    if revisions is not None:
+        return store_suggestions(lecture, undecided_revisions(lecture, revisions))
+
+    prompts = plan_prompts(lecture, sections_with_reactions)
+
+    try:
+        revisions = request_revisions_for_prompts(model_client, prompts, lecture.get("teacherId"))
+        revisions_cache.set(cache_key, revisions)
+
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+
+        return store_suggestions(lecture, revisions)
+    except(json.JSONDecodeError, KeyError):
+        logger.exception("Error generating suggestions for %s", lecture["id"])
         return None
 
+def stream_suggestions_for_lecture(lecture: Dict[str, Any],
+                                   sections: List[Any],
+                                   model_client: Any = None
+                                   ) -> Iterator[Tuple[str, Any]]:
+    """Streaming variant of generate_suggestions_for_lecture.
+
+    Yields ("suggestion", suggestion) as soon as each revision object is
+    complete in the model output (it is stored as pending right away), then
+    ("done", summary) or ("error", message).
+    """
+    model_client = model_client or get_client()
+
+    sections_with_reactions = collect_sections_with_reactions(lecture, sections)
+    cache_key = revisions_cache_key(lecture, sections_with_reactions)
+    revisions = revisions_cache.get(cache_key)
+    if revisions is not None:
+        created = store_suggestions(lecture, undecided_revisions(lecture, revisions))
+        for suggestion in created:
+            yield "suggestion", suggestion
+        yield "done", {"count": len(created), "cached": True}
+        return
+
+    revisions = []
+    created = []
+    gateway = get_gateway()
+    # Large lectures are planned into several prompts; they are streamed
+    # one after the other so suggestions keep arriving in section order.
+    for prompt in plan_prompts(lecture, sections_with_reactions):
+        try:
+            with gateway.slot(lecture.get("teacherId")):
+                attempt = 0
+                while True:
+                    attempt += 1
+                    gateway.throttle()
+                    parser = RevisionStreamParser()
+                    emitted = len(created)
+                    start = time.perf_counter()
+                    try:
+                        with model_client.messages.stream(
+                            model="claude-sonnet-4-20250514",
+                            max_tokens=8096,
+                            messages=prompt.messages(),
+                        ) as stream:
+                            for text in stream.text_stream:
+                                for rev in parser.feed(text):
+                                    rev = {"sectionId": rev['sectionId'], "revisedText": rev['revisedText']}
+                                    revisions.append(rev)
+                                    for suggestion in store_suggestions(lecture, [rev]):
+                                        created.append(suggestion)
+                                        yield "suggestion", suggestion
+                            final_message = getattr(stream, "get_final_message", None)
+                            record_anthropic_call(
+                                "stream", time.perf_counter() - start,
+                                final_message().usage if final_message else None,
+                            )
+                        break
+                    except Exception as e:
+                        # Only a stream that failed before sending anything can be replayed
+                        delay = gateway.next_delay(attempt, e, "stream") if len(created) == emitted else None
+                        if delay is None:
+                            raise
+                        gateway.sleep(delay)
+        except (json.JSONDecodeError, KeyError):
+            record_parse_failure("stream")
+            logger.exception("Error streaming suggestions for %s", lecture["id"])
+            yield "error", {"error": "Could not parse model response", "count": len(created)}
+            return
+        except GatewaySaturated as e:
+            yield "error", {"error": "Too many suggestion requests, try again later",
+                            "queuePosition": e.queue_position, "retryAfter": e.retry_after,
+                            "count": len(created)}
+            return
+        except Exception as e:
+            if not is_api_error(e):
+                raise
+            logger.error("Error streaming suggestions for %s: %s", lecture["id"], e)
+            yield "error", {"error": "The model is unavailable, try again later", "count": len(created)}
+            return
+
+        if not parser.done:
+            yield "error", {"error": "Model response ended early", "count": len(created)}
+            return
+    revisions_cache.set(cache_key, revisions)
+    yield "done", {"count": len(created), "cached": False}
+
+
 def count_comments_by_lecture_and_section() -> Dict[str, Dict[str, int]]:
    """
    Creates a map of lectureId to a map of sectionId to the number of comments
@@ -168,24 +372,15 @@ def count_comments_by_lecture_and_section() -> Dict[str, Dict[str, int]]:
    Returns:
        Dict[str, Dict[str, int]]: A nested dictionary mapping lectureId -> sectionId -> count
    """
-   result: Dict[str, Dict[str, int]] = {}
-  
-   for reaction in reactions:
-       lecture_id = reaction.get("lectureId")
-       section_id = reaction.get("sectionId")
-      
-       # Skip reactions without both lectureId and sectionId
-       if not lecture_id or not section_id:
-           continue
-      
-       # Initialize the lecture map if it doesn't exist
-       if lecture_id not in result:
-           result[lecture_id] = {}
-      
-       # Initialize the section count if it doesn't exist, then increment
-       if section_id not in result[lecture_id]:
-           result[lecture_id][section_id] = 0
-      
-       result[lecture_id][section_id] += 1
-  
-   return result
+   return {
+       lecture_id: count_comments_by_section(lecture_id)
+       for lecture_id in data_store.reaction_counters.lecture_ids()
+   }
+
+
+def count_comments_by_section(lecture_id: str) -> Dict[str, int]:
+   """Map of sectionId -> number of comments for one lecture."""
+   return {
+       section_id: counts["total"]
+       for section_id, counts in data_store.reaction_counters.section_counts(lecture_id).items()
+   }
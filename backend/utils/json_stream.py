@@ -0,0 +1,82 @@
+import json
+import re
+from typing import Any, Dict, List
+
+_ARRAY_START_RE = re.compile(r'"revisions"\s*:\s*\[')
+
+
+class RevisionStreamParser:
+    """Incrementally extract objects from the "revisions" array of a JSON
+    document that arrives in arbitrary text chunks.
+
+    feed() returns every revision object completed by the new chunk, so a
+    caller can act on each one before the rest of the response exists.
+    Text before the array (code fences, the opening brace) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buffer += chunk
+        completed: List[Dict[str, Any]] = []
+        if self._done:
+            return completed
+
+        if not self._in_array:
+            match = _ARRAY_START_RE.search(self._buffer)
+            if not match:
+                # Keep only a tail long enough to still match across chunks
+                self._buffer = self._buffer[-64:]
+                return completed
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+            self._pos = 0
+
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._start is None:
+                if ch == "{":
+                    self._start = i
+                    self._depth = 1
+                elif ch == "]":
+                    self._done = True
+                    break
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads(buf[self._start:i + 1]))
+                    self._start = None
+            i += 1
+
+        # Drop everything that has been fully consumed
+        cut = self._start if self._start is not None else i
+        self._buffer = buf[cut:]
+        self._pos = i - cut
+        if self._start is not None:
+            self._start = 0
+        return completed
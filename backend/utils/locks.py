@@ -0,0 +1,17 @@
+import threading
+import zlib
+from typing import List
+
+
+class KeyedLocks:
+    """A fixed pool of locks picked by key (lock striping).
+
+    Two different keys may share a lock, which only costs a little extra
+    contention; the pool never grows no matter how many keys are used.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(stripes)]
+
+    def get(self, key: str) -> threading.RLock:
+        return self._locks[zlib.crc32(key.encode("utf-8")) % len(self._locks)]
@@ -0,0 +1,43 @@
+import sys
+import types
+from array import array
+from collections import deque
+from typing import Any
+
+# Shared by every object that has them; never part of a data structure's size
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+               types.MethodType)
+_LEAF_TYPES = (str, bytes, bytearray, int, float, bool, type(None), array)
+
+
+def deep_sizeof(*objects: Any) -> int:
+    """Approximate bytes held by objects and everything they reference.
+
+    Follows dict, list, tuple, set and deque items and instance attributes
+    (__dict__ and __slots__); every object is counted once, so rows shared
+    by several indexes are not double counted. Walks the whole graph, so
+    it costs time proportional to its size.
+    """
+    seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, _LEAF_TYPES):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
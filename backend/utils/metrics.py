@@ -0,0 +1,206 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Off by default; create_app turns it on with METRICS_ENABLED. While off,
+# timed() functions only pay for one global lookup and the request hooks
+# are never installed.
+enabled = False
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...],
+                   extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect plus a few adds."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                bucket_labels = _format_labels(self.labelnames, labels, le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status.",
+    ("route", "method", "status"),
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to produce the response (streamed bodies are not included).",
+    ("route", "method"),
+)
+service_latency = registry.histogram(
+    "service_call_duration_seconds", "Time spent in instrumented service functions.",
+    ("function",),
+)
+anthropic_latency = registry.histogram(
+    "anthropic_request_duration_seconds", "Anthropic API call latency.",
+    ("operation",),
+)
+anthropic_tokens = registry.counter(
+    "anthropic_tokens_total", "Tokens reported by the Anthropic API.",
+    ("operation", "kind"),
+)
+anthropic_parse_failures = registry.counter(
+    "anthropic_parse_failures_total", "Model responses that could not be parsed.",
+    ("operation",),
+)
+
+ai_gateway_events = registry.counter(
+    "ai_gateway_events_total",
+    "Model calls rejected by admission control, retried, or out of retries.",
+    ("event", "operation"),
+)
+
+
+def configure_metrics(is_enabled: bool = False) -> None:
+    global enabled
+    enabled = is_enabled
+
+
+def timed(name: str) -> Callable:
+    """Record the duration of every call in service_call_duration_seconds."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                service_latency.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorator
+
+
+def record_anthropic_call(operation: str, seconds: float, usage: Any = None) -> None:
+    """Latency and token usage (message.usage) of one Anthropic call."""
+    if not enabled:
+        return
+    anthropic_latency.observe(seconds, operation)
+    if usage is not None:
+        for kind in ("input_tokens", "output_tokens",
+                     "cache_creation_input_tokens", "cache_read_input_tokens"):
+            value = getattr(usage, kind, None)
+            if value:
+                anthropic_tokens.inc(operation, kind, amount=value)
+
+
+def record_gateway_event(event: str, operation: str = "") -> None:
+    if enabled:
+        ai_gateway_events.inc(event, operation)
+
+
+def record_parse_failure(operation: str) -> None:
+    if enabled:
+        anthropic_parse_failures.inc(operation)
+
+
+def init_app(app) -> None:
+    """Install request hooks recording latency and status per route."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start: Optional[float] = g.pop("metrics_start", None)
+        if start is not None and enabled:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            http_latency.observe(time.perf_counter() - start, route, request.method)
+            http_requests.inc(route, request.method, str(response.status_code))
+        return response
@@ -0,0 +1,36 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: rate tokens per second, up to burst saved.
+
+    acquire() takes a token, sleeping until one is available; a rate of
+    None (or <= 0) disables the limit.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (possibly going into debt) and return the wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """Take a token; returns the seconds spent waiting for it."""
+        if not self.rate or self.rate <= 0:
+            return 0.0
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.ttl_cache import TTLCache
+
+
+class EncodedBody:
+    """A JSON body encoded once, with its strong ETag and a gzip copy that is
+    compressed on first use."""
+
+    __slots__ = ("body", "etag", "_gzipped", "_gzip_min_bytes", "_lock")
+
+    def __init__(self, payload: Any, gzip_min_bytes: int):
+        self.body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self._gzipped: Optional[bytes] = None
+        self._gzip_min_bytes = gzip_min_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def compressible(self) -> bool:
+        return 0 <= self._gzip_min_bytes <= len(self.body)
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            with self._lock:
+                if self._gzipped is None:
+                    # mtime=0 keeps the bytes (and so the ETag) deterministic
+                    self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+class ResponseCache:
+    """LRU of EncodedBody by key, for responses whose content never changes.
+
+    gzip_min_bytes < 0 disables compression; smaller bodies are always
+    sent uncompressed.
+    """
+
+    def __init__(self, max_entries: int = 512, gzip_min_bytes: int = 1024):
+        self.gzip_min_bytes = gzip_min_bytes
+        self._entries = TTLCache(max_entries=max_entries, ttl=None)
+
+    def get_or_encode(self,
+                      key: Hashable,
+                      build: Callable[[], Optional[Any]]) -> Optional[EncodedBody]:
+        """Cached body for key; build() is called on a miss and may return
+        None (not found), which is not cached."""
+        encoded = self._entries.get(key)
+        if encoded is None:
+            payload = build()
+            if payload is None:
+                return None
+            encoded = EncodedBody(payload, self.gzip_min_bytes)
+            self._entries.set(key, encoded)
+        return encoded
+
+    def stats(self) -> Dict[str, Any]:
+        return self._entries.stats()
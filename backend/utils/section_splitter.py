@@ -0,0 +1,96 @@
+import codecs
+import re
+from typing import List
+
+# Markdown headings start a new section; rules and page breaks end one
+_HEADING_RE = re.compile(r"#{1,6}\s")
+_BREAK_RE = re.compile(r"(-{3,}|\*{3,}|_{3,}|\f)\s*")
+
+
+class SectionSplitter:
+    """Split a markdown or plain-text document into section texts as it
+    arrives in byte chunks.
+
+    A section ends before each markdown heading, at horizontal rules and
+    page breaks (slide separators), and whenever it would grow past
+    max_chars, in which case it is cut at the last paragraph break, or
+    at the last line or word if there is none. Only the section being
+    built and one partial line are held in memory.
+    """
+
+    def __init__(self, max_chars: int = 4000, encoding: str = "utf-8"):
+        self.max_chars = max_chars
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._partial = ""
+        self._lines: List[str] = []
+        self._size = 0
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Sections completed by chunk."""
+        completed: List[str] = []
+        self._add_text(self._decoder.decode(chunk), completed)
+        return completed
+
+    def close(self) -> List[str]:
+        """Flush the last section once the document has been read."""
+        completed: List[str] = []
+        self._add_text(self._decoder.decode(b"", final=True), completed)
+        if self._partial:
+            self._add_line(self._partial, completed)
+            self._partial = ""
+        self._flush(completed)
+        return completed
+
+    def _add_text(self, text: str, completed: List[str]) -> None:
+        # Page breaks get lines of their own so they can end a section
+        lines = (self._partial + text.replace("\f", "\n\f\n")).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line + "\n", completed)
+        # A line with no end in sight is cut like any other overlong text
+        while len(self._partial) > self.max_chars:
+            head, self._partial = self._cut_words(self._partial)
+            self._add_line(head, completed)
+
+    def _add_line(self, line: str, completed: List[str]) -> None:
+        if _BREAK_RE.fullmatch(line.rstrip("\r\n")):
+            self._flush(completed)
+            return
+        if _HEADING_RE.match(line):
+            self._flush(completed)
+        while len(line) > self.max_chars:
+            self._flush(completed)
+            head, line = self._cut_words(line)
+            completed.append(head.strip())
+        if self._size + len(line) > self.max_chars:
+            self._cut(completed)
+        if self._size + len(line) > self.max_chars:
+            self._flush(completed)
+        self._lines.append(line)
+        self._size += len(line)
+
+    def _cut(self, completed: List[str]) -> None:
+        """Emit the current section up to its last paragraph break (or all of
+        it) to make room for the next line."""
+        for i in range(len(self._lines) - 1, 0, -1):
+            if not self._lines[i].strip():
+                rest = self._lines[i + 1:]
+                self._lines = self._lines[:i]
+                self._flush(completed)
+                self._lines = rest
+                self._size = sum(len(line) for line in rest)
+                return
+        self._flush(completed)
+
+    def _cut_words(self, text: str):
+        split = text.rfind(" ", 0, self.max_chars)
+        if split <= 0:
+            split = self.max_chars
+        return text[:split], text[split:].lstrip(" ")
+
+    def _flush(self, completed: List[str]) -> None:
+        section = "".join(self._lines).strip()
+        if section:
+            completed.append(section)
+        self._lines = []
+        self._size = 0
@@ -1,5 +1,31 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 def now_iso() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    return to_iso(datetime.utcnow())
+
+
+def to_iso(value: datetime) -> str:
+    """Naive UTC datetime in the now_iso() format."""
+    return value.isoformat() + "Z"
+
+
+def parse_iso(value: str) -> datetime:
+    """Parse a now_iso()-style timestamp (or one with an offset) as naive UTC.
+
+    Raises ValueError for anything that isn't an ISO 8601 timestamp.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Not a timestamp: {value!r}")
+    parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def epoch_seconds(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def iso_from_epoch(seconds: int) -> str:
+    return datetime.utcfromtimestamp(seconds).isoformat() + "Z"